@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_spectacular',
@@ -49,6 +50,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PasswordHashingTimingMiddleware',
+    'core.middleware.CatalogSnapshotMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -110,6 +113,19 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The default hashers, with PBKDF2 recording the CPU time it takes.
+PASSWORD_HASHERS = [
+    'core.hashers.TimedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Threads hashing the passwords of the async user endpoints, which is
+# how many cores a burst of logins can take from the rest of the API.
+PASSWORD_HASHING_THREADS = int(os.environ.get('PASSWORD_HASHING_THREADS', 2))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
@@ -135,10 +151,60 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# Authentication used by every API, picked by the AUTH_PROFILE
+# environment variable. Basic credentials are only hashed once per
+# worker and TTL; production also leaves out session authentication,
+# which only the browsable API needs.
+AUTH_PROFILES = {
+    'development': [
+        'rest_framework.authentication.SessionAuthentication',
+        'core.authentication.CachedBasicAuthentication',
+        'core.authentication.CachedTokenAuthentication',
+        'core.authentication.AccessTokenAuthentication',
+    ],
+    'production': [
+        'core.authentication.CachedTokenAuthentication',
+        'core.authentication.AccessTokenAuthentication',
+        'core.authentication.CachedBasicAuthentication',
+    ],
+}
+AUTH_PROFILE = os.environ.get('AUTH_PROFILE', 'development')
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': AUTH_PROFILES[AUTH_PROFILE],
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.IdCursorPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# The default cache is local to each worker process. State the workers
+# must agree on, like the versions invalidating their own caches, is
+# kept in the cache named by SHARED_CACHE, configured from the
+# environment, e.g. SHARED_CACHE_BACKEND=
+# django.core.cache.backends.redis.RedisCache and SHARED_CACHE_LOCATION=
+# redis://redis:6379. Without one, each worker keeps that state in its
+# default cache for a short TTL, which bounds how long it misses changes
+# made by the other workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+if os.environ.get('SHARED_CACHE_BACKEND'):
+    CACHES['shared'] = {
+        'BACKEND': os.environ['SHARED_CACHE_BACKEND'],
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', ''),
+    }
+SHARED_CACHE = 'shared' if 'shared' in CACHES else None
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
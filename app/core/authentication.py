@@ -0,0 +1,271 @@
+"""
+Token authentication with cached token lookups.
+"""
+import copy
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.utils.crypto import salted_hmac
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, \
+    BasicAuthentication, TokenAuthentication, get_authorization_header
+
+from core.caches import get_shared_cache, get_shared_or_default_cache
+from core.tokens import InvalidToken, read_access_token
+
+TOKEN_VERSION_KEY = 'core:auth_version:token:{}'
+CREDENTIAL_VERSION_KEY = 'core:auth_version:user:{}'
+TOKEN_CACHE_PREFIX = 'core:auth_token:'
+TOKEN_CACHE_SIZE = 4096
+TOKEN_CACHE_TIMEOUT = 60
+SHARED_TOKEN_CACHE_TIMEOUT = 60 * 5
+# Versions only need to outlive the entries checked against them.
+AUTH_VERSION_TIMEOUT = SHARED_TOKEN_CACHE_TIMEOUT
+CREDENTIAL_CACHE_SIZE = 1024
+CREDENTIAL_CACHE_TIMEOUT = 30
+CREDENTIAL_DIGEST_SALT = 'core.authentication.credentials'
+# Generated per process, so the digests are of no use outside of it.
+CREDENTIAL_DIGEST_SECRET = secrets.token_bytes(32)
+
+
+def get_auth_version(key):
+    """Return the version of the cached authentications under `key`.
+
+    It is an opaque token kept for AUTH_VERSION_TIMEOUT, and a new one
+    is created once it has expired or been evicted, which leaves the
+    entries read at the old one behind. It is kept in the shared cache,
+    so every worker sees the same one, or without one in this worker's
+    cache, where only changes made by this worker are seen before the
+    entries expire.
+    """
+    version_cache = get_shared_or_default_cache()
+    version = version_cache.get(key)
+    if version is None:
+        version_cache.add(key, uuid.uuid4().hex, AUTH_VERSION_TIMEOUT)
+        version = version_cache.get(key)
+    return version
+
+
+def invalidate_auth(token_keys=(), usernames=()):
+    """Forget the cached authentications of token keys and usernames.
+
+    Gives each a new version, which cached entries are checked against
+    (see `get_auth_version`). This is done right away and again once
+    the transaction commits, as a request reading the rows in between
+    would cache them again.
+    """
+    keys = [TOKEN_VERSION_KEY.format(key) for key in token_keys] + [
+        CREDENTIAL_VERSION_KEY.format(name) for name in usernames]
+
+    def invalidate():
+        if keys:
+            get_shared_or_default_cache().set_many(
+                {key: uuid.uuid4().hex for key in keys},
+                AUTH_VERSION_TIMEOUT)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+class TokenUserCache:
+    """Per-worker LRU of token keys, or credentials, to their user.
+
+    Entries expire `timeout` seconds after they are cached. They are
+    stored along with the version of the user they were read at, which
+    callers check against the shared version before using them.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, timeout=TOKEN_CACHE_TIMEOUT,
+                 clock=time.monotonic):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the entry cached for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Cache an entry, evicting the oldest."""
+        with self._lock:
+            self._entries[key] = (self.clock() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_users = TokenUserCache()
+verified_credentials = TokenUserCache(maxsize=CREDENTIAL_CACHE_SIZE,
+                                      timeout=CREDENTIAL_CACHE_TIMEOUT)
+
+
+def get_credential_digest(userid, password):
+    """Return the digest verified credentials are cached under."""
+    return salted_hmac(
+        CREDENTIAL_DIGEST_SALT, f'{userid}\0{password}',
+        secret=CREDENTIAL_DIGEST_SECRET, algorithm='sha256').hexdigest()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`TokenAuthentication` that caches the user of each token.
+
+    Tokens are resolved from this worker's `TokenUserCache`, and a
+    cached entry is used only if it was read at the token's current
+    version. Deleting a token or saving its user, which covers
+    deactivating them and changing their password, gives the token a
+    new version (see `core.signals`). With a SHARED_CACHE, every worker
+    sees the new version right away, and the shared cache also maps
+    tokens to their user's id, so only the user is loaded. Without one,
+    other workers keep using their entries for up to
+    TOKEN_CACHE_TIMEOUT. Each request gets its own copy of the cached
+    user.
+    """
+    token_cache = token_users
+    shared_timeout = SHARED_TOKEN_CACHE_TIMEOUT
+
+    def authenticate_credentials(self, key):
+        # Read before the database, so a change committed in between
+        # leaves the entry at an outdated version.
+        version = get_auth_version(TOKEN_VERSION_KEY.format(key))
+        entry = self.token_cache.get(key)
+        if entry is None or entry[0] != version:
+            entry = (version, *self.load_credentials(key, version))
+            self.token_cache.set(key, entry)
+
+        _, user, token = entry
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'User inactive or deleted.')
+        return copy.copy(user), token
+
+    def load_credentials(self, key, version):
+        """Return the user and token of `key`, read at `version`.
+
+        The shared cache only holds the id of the token's user, so no
+        user row, with its password hash, is stored outside the
+        database.
+        """
+        shared_cache = get_shared_cache()
+        if shared_cache is None:
+            return super().authenticate_credentials(key)
+
+        entry = shared_cache.get(TOKEN_CACHE_PREFIX + key)
+        if entry is not None and entry[0] == version:
+            user = get_user_model()._default_manager \
+                .filter(pk=entry[1]).first()
+            if user is not None:
+                return user, self.get_model()(key=key, user=user)
+
+        user, token = super().authenticate_credentials(key)
+        shared_cache.set(TOKEN_CACHE_PREFIX + key, (version, user.pk),
+                         self.shared_timeout)
+        return user, token
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """`BasicAuthentication` that hashes each password only once.
+
+    Credentials that were verified are cached in this worker for
+    CREDENTIAL_CACHE_TIMEOUT seconds, under a keyed digest of the email
+    and password, so a client sending them with every request does not
+    run the password hasher every time. Entries are checked against the
+    version of the email, which changes whenever its user is saved,
+    covering changing their password and deactivating them. Without a
+    SHARED_CACHE, other workers only see that change once their entries
+    expire. Wrong credentials are never cached.
+    """
+    credential_cache = verified_credentials
+
+    def authenticate_credentials(self, userid, password, request=None):
+        version = get_auth_version(CREDENTIAL_VERSION_KEY.format(userid))
+        key = get_credential_digest(userid, password)
+        entry = self.credential_cache.get(key)
+        if entry is None or entry[0] != version:
+            user, _ = super().authenticate_credentials(
+                userid, password, request)
+            entry = (version, user)
+            self.credential_cache.set(key, entry)
+        return copy.copy(entry[1]), None
+
+
+class AccessTokenAuthentication(BaseAuthentication):
+    """Authenticate `Authorization: Bearer <token>` signed access tokens.
+
+    Tokens are verified against their signature and the user's token
+    version, which is cached, so no query is made. The user is built
+    from the claims with its other fields deferred: they are loaded
+    from the database only if a view reads them.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        return self.authenticate_credentials(token)
+
+    def authenticate_credentials(self, token):
+        try:
+            claims = read_access_token(token)
+        except InvalidToken as exc:
+            raise exceptions.AuthenticationFailed(str(exc))
+        user_model = get_user_model()
+        user = user_model.from_db(
+            router.db_for_read(user_model),
+            ['id', 'token_version', 'is_active', 'is_staff', 'is_superuser'],
+            [claims['uid'], claims['ver'], True, claims['staff'],
+             claims['su']])
+        return user, claims
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+class CachedBasicScheme(OpenApiAuthenticationExtension):
+    """Document `CachedBasicAuthentication` as HTTP basic authentication."""
+    target_class = CachedBasicAuthentication
+    name = 'basicAuth'
+
+    def get_security_definition(self, auto_schema):
+        return {'type': 'http', 'scheme': 'basic'}
+
+
+class AccessTokenScheme(OpenApiAuthenticationExtension):
+    """Document `AccessTokenAuthentication` as bearer authentication."""
+    target_class = AccessTokenAuthentication
+    name = 'bearerAuth'
+
+    def get_security_definition(self, auto_schema):
+        return {
+            'type': 'http',
+            'scheme': 'bearer',
+            'description': 'Signed access token, renewed with a refresh '
+                           'token',
+        }
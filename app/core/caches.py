@@ -0,0 +1,42 @@
+"""
+Access to the cache shared by every worker.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+
+def get_shared_cache():
+    """Return the cache named by the SHARED_CACHE setting, or None.
+
+    The default cache lives in each worker process, so anything the
+    workers must agree on, such as the versions that invalidate their
+    own caches, is kept in the shared cache, and is not cached at all
+    when none is configured.
+    """
+    alias = getattr(settings, 'SHARED_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def get_shared_or_default_cache():
+    """Return the shared cache, or this worker's default cache without one."""
+    shared_cache = get_shared_cache()
+    return caches['default'] if shared_cache is None else shared_cache
+
+
+def get_single_process_cache_settings():
+    """Return settings overrides giving a single process a shared cache.
+
+    A process shares its local memory with itself, so commands such as
+    benchmarks use a large local memory cache when no shared cache is
+    configured.
+    """
+    if getattr(settings, 'SHARED_CACHE', None):
+        return {}
+    return {
+        'CACHES': {**settings.CACHES, 'shared': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'single-process',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }},
+        'SHARED_CACHE': 'shared',
+    }
@@ -0,0 +1,95 @@
+"""
+Version of the exercise catalog shared by all workers, and the
+per-worker cache of catalog responses built on it.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.db import transaction
+
+from core.caches import get_shared_or_default_cache
+
+CATALOG_VERSION_KEY = 'core:catalog_version'
+CATALOG_PAGE_CACHE_SIZE = 256
+# How long pages are served for, bounding how long a worker serves a
+# catalog changed by another one when there is no shared cache.
+CATALOG_PAGE_TIMEOUT = 60
+
+
+def get_catalog_version():
+    """Return the current catalog version.
+
+    The version is an opaque token kept without expiry in the shared
+    cache, so every worker sees a change as soon as it commits. If it
+    has been evicted a new one is created, so anything built for an
+    earlier version is treated as stale rather than current. Without a
+    shared cache, only the worker making a change sees the new version,
+    and the others rebuild their pages as they expire.
+    """
+    version_cache = get_shared_or_default_cache()
+    version = version_cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version_cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex,
+                          timeout=None)
+        version = version_cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Give the catalog a new version once the transaction commits."""
+    transaction.on_commit(lambda: get_shared_or_default_cache().set(
+        CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None))
+
+
+class CatalogPageCache:
+    """Per-worker LRU of serialized catalog responses.
+
+    Entries expire `timeout` seconds after they are cached, and are only
+    valid for the catalog version they were built for; the whole cache
+    is dropped as soon as a newer version is seen.
+    """
+
+    def __init__(self, maxsize=CATALOG_PAGE_CACHE_SIZE,
+                 timeout=CATALOG_PAGE_TIMEOUT, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.clock = clock
+        self.version = None
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, key):
+        """Return the page cached for `key` at `version`, or None."""
+        with self._lock:
+            if version != self.version:
+                return None
+            entry = self._pages.get(key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires <= self.clock():
+                del self._pages[key]
+                return None
+            self._pages.move_to_end(key)
+            return data
+
+    def set(self, version, key, data):
+        """Cache a page built for `version`, evicting the oldest."""
+        with self._lock:
+            if version != self.version:
+                self._pages.clear()
+                self.version = version
+            self._pages[key] = (self.clock() + self.timeout, data)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self.version = None
+
+
+catalog_pages = CatalogPageCache()
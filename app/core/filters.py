@@ -0,0 +1,70 @@
+"""
+Filter backends shared by the APIs.
+"""
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db.models import BigIntegerField, F
+from django.db.models.functions import Cast
+from rest_framework.filters import BaseFilterBackend
+
+SEARCH_RANK_SCALE = 1000000
+
+
+class ExerciseSearchFilter(BaseFilterBackend):
+    """Full-text search over the exercise catalog with `?q=`.
+
+    Matches the stored, weighted search vector of the exercise, or with
+    the view's `search_fallback` set, trigram similarity on the name,
+    so misspelled words still find the exercise. Both are served by GIN
+    indexes. `ExerciseCursorPagination` sets the fallback when a search
+    has no matches. Results are annotated with a `search_rank`, scaled
+    to an integer so cursor pagination can page through it exactly.
+    """
+    search_param = 'q'
+    search_config = 'english'
+
+    def get_search_term(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        term = self.get_search_term(request)
+        if not term:
+            return queryset
+        if getattr(view, 'search_fallback', False):
+            return self.search_similar(queryset, term)
+        return self.search(queryset, term)
+
+    def search(self, queryset, term):
+        """Filter the exercises matching the words of `term` by rank."""
+        query = SearchQuery(term, config=self.search_config,
+                            search_type='websearch')
+        return self.annotate_rank(
+            queryset.filter(search_vector=query),
+            SearchRank(F('search_vector'), query))
+
+    def search_similar(self, queryset, term):
+        """Filter the exercises whose name is similar to `term` by rank.
+
+        Far more expensive to rank, so only used when `search` finds
+        nothing.
+        """
+        return self.annotate_rank(
+            queryset.filter(name__trigram_word_similar=term),
+            TrigramWordSimilarity(term, 'name'))
+
+    def annotate_rank(self, queryset, rank):
+        return queryset.annotate(
+            search_rank=Cast(rank * SEARCH_RANK_SCALE, BigIntegerField()))
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Search exercises by name, description and '
+                           'instructions, most relevant first.',
+            'schema': {'type': 'string'},
+        }]
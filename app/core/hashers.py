@@ -0,0 +1,128 @@
+"""
+Password hashing, timed and run off the event loop.
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, \
+    check_password, make_password
+
+
+class PasswordHashingStats:
+    """CPU time spent hashing passwords in this process.
+
+    Hashing a password for a login and checking one both count, as
+    both run the full key derivation. The time spent within a block of
+    code, such as a request, is collected with `measure`.
+    """
+
+    def __init__(self):
+        self.hashes = 0
+        self.cpu_seconds = 0.0
+        self._timings = contextvars.ContextVar('password_hashing_timings')
+        self._lock = threading.Lock()
+
+    def record(self, cpu_seconds):
+        with self._lock:
+            self.hashes += 1
+            self.cpu_seconds += cpu_seconds
+        timings = self._timings.get(None)
+        if timings is not None:
+            timings.append(cpu_seconds)
+
+    @contextlib.contextmanager
+    def measure(self):
+        """Collect the CPU time of each hash made within the block.
+
+        Hashes made in other threads count too, as long as the context
+        is carried over to them, as `sync_to_async` and `run_hashing` do.
+        """
+        timings = []
+        token = self._timings.set(timings)
+        try:
+            yield timings
+        finally:
+            self._timings.reset(token)
+
+    def snapshot(self):
+        """Return the totals with their share of the process CPU time."""
+        with self._lock:
+            hashes, cpu_seconds = self.hashes, self.cpu_seconds
+        process_cpu_seconds = time.process_time()
+        return {
+            'hashes': hashes,
+            'cpu_seconds': cpu_seconds,
+            'process_cpu_seconds': process_cpu_seconds,
+            'share': cpu_seconds / process_cpu_seconds
+            if process_cpu_seconds else 0.0,
+        }
+
+
+password_hashing = PasswordHashingStats()
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """`PBKDF2PasswordHasher` recording its CPU time in `password_hashing`.
+
+    It keeps the algorithm name of the hasher it extends, so it checks
+    the passwords already stored and must replace it in PASSWORD_HASHERS.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        start = time.thread_time()
+        try:
+            return super().encode(password, salt, iterations)
+        finally:
+            password_hashing.record(time.thread_time() - start)
+
+
+@functools.cache
+def get_hashing_executor():
+    """Return the pool of PASSWORD_HASHING_THREADS threads hashing runs in."""
+    return ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHING_THREADS,
+                              thread_name_prefix='password-hashing')
+
+
+async def run_hashing(func, *args):
+    """Run `func(*args)` in the hashing pool and return its result.
+
+    At most PASSWORD_HASHING_THREADS passwords are hashed at once, and
+    further calls wait for a free thread without holding up the event
+    loop or the threads serving other requests.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        get_hashing_executor(), functools.partial(context.run, func, *args))
+
+
+async def check_credentials(email, password):
+    """Return the active user with the email and password, or None.
+
+    Does what `ModelBackend.authenticate` does, including upgrading
+    the stored hash, with the password checked in the hashing pool.
+    """
+    user_model = get_user_model()
+    try:
+        user = await sync_to_async(
+            user_model._default_manager.get_by_natural_key)(email)
+    except user_model.DoesNotExist:
+        # Hashed anyway, so unknown emails are as slow as wrong passwords.
+        await run_hashing(make_password, password)
+        return None
+
+    outdated = []
+    if not await run_hashing(check_password, password, user.password,
+                             outdated.append) or not user.is_active:
+        return None
+    if outdated:
+        user.password = await run_hashing(make_password, password)
+        await sync_to_async(user.save)(update_fields=['password'])
+    return user
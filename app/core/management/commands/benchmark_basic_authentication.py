@@ -0,0 +1,86 @@
+"""
+Django command to benchmark basic authentication.
+"""
+import base64
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from rest_framework.authentication import BasicAuthentication
+
+from core.authentication import CachedBasicAuthentication, \
+    verified_credentials
+from core.caches import get_single_process_cache_settings
+from core.hashers import password_hashing
+
+AUTHENTICATION_CLASSES = [BasicAuthentication, CachedBasicAuthentication]
+PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    """Django command comparing basic authentication costs.
+
+    Authenticates requests for credentials picked at random among
+    synthetic users, created in a transaction that is rolled back
+    afterwards, and reports the median and 99th percentile time per
+    request and the share of CPU time spent hashing passwords.
+    """
+    help = 'Benchmark BasicAuthentication against its cached version.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        rng = random.Random(options['seed'])
+        with transaction.atomic(), override_settings(
+                **get_single_process_cache_settings()):
+            emails = self.create_users(options['users'])
+            factory = RequestFactory()
+            requests = [
+                factory.get('/', HTTP_AUTHORIZATION='Basic ' + (
+                    base64.b64encode(f'{email}:{PASSWORD}'.encode())
+                    .decode()))
+                for email in rng.choices(emails, k=options['requests'])
+            ]
+            for authentication_class in AUTHENTICATION_CLASSES:
+                verified_credentials.clear()
+                authentication = authentication_class()
+                timings = []
+                hashing = password_hashing.snapshot()
+                for request in requests:
+                    start = time.perf_counter()
+                    authentication.authenticate(request)
+                    timings.append((time.perf_counter() - start) * 1000)
+                after = password_hashing.snapshot()
+                hashes = after['hashes'] - hashing['hashes']
+                cpu_seconds = after['process_cpu_seconds'] \
+                    - hashing['process_cpu_seconds']
+                hashing_seconds = after['cpu_seconds'] \
+                    - hashing['cpu_seconds']
+                share = hashing_seconds / cpu_seconds if cpu_seconds else 0
+                percentiles = statistics.quantiles(timings, n=100)
+                self.stdout.write(
+                    f'{authentication_class.__name__}: '
+                    f'{len(requests)} requests, '
+                    f'p50 {percentiles[49]:.2f}ms, '
+                    f'p99 {percentiles[98]:.2f}ms, '
+                    f'{hashes} hashes taking {hashing_seconds:.2f}s of CPU '
+                    f'time ({share:.0%}).')
+            transaction.set_rollback(True)
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        users = get_user_model().objects.bulk_create([
+            get_user_model()(email=f'benchmark-{number}@example.com',
+                             password=password)
+            for number in range(count)
+        ])
+        return [user.email for user in users]
@@ -0,0 +1,120 @@
+"""
+Django command to benchmark exercise catalog search.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.filters import ExerciseSearchFilter
+from core.models import Exercise
+from core.pagination import ExerciseCursorPagination
+
+MOVEMENTS = ['Squat', 'Deadlift', 'Bench Press', 'Overhead Press', 'Row',
+             'Curl', 'Lunge', 'Triceps Extension', 'Lateral Raise', 'Fly',
+             'Pulldown', 'Hip Thrust', 'Crunch', 'Pullover', 'Shrug',
+             'Step Up', 'Split Squat', 'Good Morning', 'Calf Raise',
+             'Leg Press', 'Face Pull', 'Kickback', 'Skull Crusher',
+             'Glute Bridge', 'Swing', 'Snatch', 'Clean', 'Jerk', 'Dip',
+             'Chin Up', 'Pull Up', 'Push Up', 'Plank', 'Rollout',
+             'Woodchop', 'Carry', 'Hyperextension', 'Leg Curl',
+             'Reverse Fly', 'Upright Row']
+VARIATIONS = ['Barbell', 'Dumbbell', 'Kettlebell', 'Cable', 'Machine',
+              'Band', 'Bodyweight', 'Smith', 'Landmine', 'Trap Bar',
+              'EZ Bar', 'Medicine Ball', 'Sandbag', 'Suspension',
+              'Plate', 'Safety Bar', 'Sled', 'Stability Ball',
+              'Weighted Vest', 'Chain']
+POSITIONS = ['Seated', 'Standing', 'Incline', 'Decline', 'Single Arm',
+             'Single Leg', 'Kneeling', 'Lying', 'Sumo', 'Wide Grip',
+             'Close Grip', 'Reverse Grip', 'Neutral Grip', 'Paused',
+             'Tempo', 'Deficit', 'Half Kneeling', 'Bent Over',
+             'Alternating', 'Isometric']
+MUSCLES = ['chest', 'back', 'shoulders', 'biceps', 'triceps', 'quads',
+           'hamstrings', 'glutes', 'calves', 'core', 'forearms', 'traps',
+           'lats', 'obliques', 'adductors', 'abductors']
+SEARCH_TERMS = ['squat', 'dumbbell press', 'incline bench', 'glutes',
+                'single leg', 'cable row', 'biceps curl', 'hamstrings',
+                'squatt', 'dumbell', 'dedlift', 'kettlebel swing']
+
+
+class Command(BaseCommand):
+    """Django command timing catalog search on synthetic exercises.
+
+    Each search fetches the first page as the API does: ranked by the
+    full-text match, and by trigram similarity only when that page is
+    empty. Timings are reported per search term. The exercises are
+    inserted in a transaction that is rolled back once the searches
+    have been timed.
+    """
+    help = 'Benchmark exercise search against a synthetic catalog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exercises', type=int, default=100000)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            start = time.perf_counter()
+            Exercise.objects.bulk_create(
+                (self.make_exercise(rng, i)
+                 for i in range(options['exercises'])),
+                batch_size=5000)
+            table = connection.ops.quote_name(Exercise._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {table}')
+            load_seconds = time.perf_counter() - start
+
+            timings = {term: [] for term in SEARCH_TERMS}
+            for _ in range(options['iterations']):
+                term = rng.choice(SEARCH_TERMS)
+                start = time.perf_counter()
+                self.search(term)
+                timings[term].append((time.perf_counter() - start) * 1000)
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Inserted {options['exercises']} exercises "
+            f"in {load_seconds:.1f}s.")
+        for term, term_timings in timings.items():
+            if term_timings:
+                self.stdout.write(
+                    f"{term!r}: {len(term_timings)} searches, "
+                    f"p50 {statistics.median(term_timings):.2f}ms, "
+                    f"max {max(term_timings):.2f}ms.")
+        everything = sorted(sum(timings.values(), []))
+        p99 = everything[min(len(everything) - 1,
+                             int(len(everything) * 0.99))]
+        self.stdout.write(self.style.SUCCESS(
+            f"Ran {options['iterations']} searches: "
+            f"mean {statistics.mean(everything):.2f}ms, "
+            f"p50 {statistics.median(everything):.2f}ms, "
+            f"p99 {p99:.2f}ms."))
+
+    def search(self, term):
+        """Fetch the first page of results, as the API does."""
+        search = ExerciseSearchFilter()
+        ordering = ExerciseCursorPagination.search_ordering
+        page_size = ExerciseCursorPagination.page_size
+        queryset = Exercise.objects.all()
+        page = list(search.search(queryset, term)
+                    .order_by(*ordering)[:page_size])
+        if not page:
+            page = list(search.search_similar(queryset, term)
+                        .order_by(*ordering)[:page_size])
+        return page
+
+    def make_exercise(self, rng, number):
+        name = ' '.join([rng.choice(POSITIONS), rng.choice(VARIATIONS),
+                         rng.choice(MOVEMENTS), str(number)])
+        muscles = rng.sample(MUSCLES, 2)
+        return Exercise(
+            name=name,
+            description=f'Builds the {muscles[0]} and {muscles[1]}.',
+            instructions=f'Brace, then perform the {name.lower()} '
+                         f'with a controlled tempo.',
+        )
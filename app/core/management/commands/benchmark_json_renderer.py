@@ -0,0 +1,97 @@
+"""
+Django command to benchmark the JSON renderers.
+"""
+import datetime
+import random
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.models import FitnessProgress
+from core.renderers import ORJSONRenderer
+from fitnessprogress.serializers import FitnessProgressSerializer
+
+RENDERERS = [JSONRenderer, ORJSONRenderer]
+
+
+class Command(BaseCommand):
+    """Django command comparing render time and memory of JSON renderers.
+
+    Renders a page of fitness progress entries, as serialized by the
+    API, and a page of workout plans with nested exercises.
+    """
+    help = 'Benchmark the JSON renderers on large payloads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        rng = random.Random(options['seed'])
+        payloads = {
+            'fitness progress': self.fitness_progress_payload(
+                rng, options['rows']),
+            'workout plans': self.workout_plan_payload(
+                rng, options['rows']),
+        }
+        for name, payload in payloads.items():
+            for renderer_class in RENDERERS:
+                renderer = renderer_class()
+                timings = []
+                for _ in range(options['iterations']):
+                    start = time.perf_counter()
+                    content = renderer.render(payload)
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                tracemalloc.start()
+                renderer.render(payload)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self.stdout.write(
+                    f'{name}, {renderer_class.__name__}: '
+                    f'{len(content) / 1024:.0f}KiB, '
+                    f'median {statistics.median(timings):.1f}ms, '
+                    f'peak memory {peak / 1024:.0f}KiB.')
+
+    def fitness_progress_payload(self, rng, rows):
+        start = datetime.date(2020, 1, 1)
+        entries = [
+            FitnessProgress(
+                id=pk, user_id=1,
+                date=start + datetime.timedelta(days=pk),
+                weight=Decimal(rng.randint(5000, 12000)) / 100,
+                goal_weight=Decimal(rng.randint(5000, 12000)) / 100,
+                achieved_goals='Ran further than last week',
+                notes='Felt strong, slept well',
+                exercise_duration=rng.randint(20, 120),
+                calories_burned=rng.randint(100, 1000),
+                mood=rng.choice(['great', 'good', 'tired']),
+            )
+            for pk in range(1, rows + 1)
+        ]
+        return {'next': None, 'previous': None,
+                'results': FitnessProgressSerializer(entries, many=True).data}
+
+    def workout_plan_payload(self, rng, rows):
+        return {'next': None, 'previous': None, 'results': [
+            {
+                'id': pk,
+                'user': 1,
+                'title': f'Plan {pk}',
+                'frequency': rng.randint(1, 7),
+                'goal': 'Build strength',
+                'session_duration': rng.choice([30, 45, 60, 90]),
+                'workout_exercises': [
+                    {'id': pk * 10 + i, 'exercise': rng.randint(1, 500),
+                     'sets': 4, 'repetitions': 10, 'duration': None}
+                    for i in range(5)
+                ],
+            }
+            for pk in range(1, rows + 1)
+        ]}
@@ -0,0 +1,106 @@
+"""
+Django command to benchmark list serialization.
+"""
+import datetime
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+
+from core.models import Exercise, FitnessProgress, WorkoutPlan, \
+    WorkoutExercise
+from core.serializers import ValuesSerializer
+from fitnessprogress.serializers import FitnessProgressSerializer
+from workout_plans.serializers import WorkoutPlanSerializer
+
+
+class Command(BaseCommand):
+    """Django command comparing model and values list serialization.
+
+    Synthetic rows are inserted in a transaction that is rolled back
+    once both ways of serializing them have been timed.
+    """
+    help = 'Benchmark list serialization with and without model instances.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--exercises-per-plan', type=int, default=3)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                'benchmark-list-serializers@example.com')
+            self.create_rows(rng, user, options)
+            workout_exercises = WorkoutExercise.objects.order_by('id')
+            cases = [
+                ('fitness progress', FitnessProgressSerializer,
+                 FitnessProgress.objects.filter(user=user).order_by('id')),
+                ('workout plans', WorkoutPlanSerializer,
+                 WorkoutPlan.objects.filter(user=user).order_by('id')
+                 .prefetch_related(Prefetch('workout_exercises',
+                                            queryset=workout_exercises))),
+            ]
+            for name, serializer_class, queryset in cases:
+                self.compare(name, serializer_class, queryset,
+                             options['iterations'])
+            transaction.set_rollback(True)
+
+    def compare(self, name, serializer_class, queryset, iterations):
+        values_serializer = ValuesSerializer(serializer_class())
+        timings = {'serializer': [], 'values': []}
+        for _ in range(iterations):
+            start = time.perf_counter()
+            serializer_class(queryset.all(), many=True).data
+            timings['serializer'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            values_serializer.to_representation(
+                list(values_serializer.get_queryset(queryset.all())))
+            timings['values'].append(time.perf_counter() - start)
+
+        rows = queryset.count()
+        serializer_time = statistics.median(timings['serializer'])
+        values_time = statistics.median(timings['values'])
+        self.stdout.write(
+            f'{name}: serializer {serializer_time * 1000:.0f}ms '
+            f'({rows / serializer_time:.0f} rows/s), '
+            f'values {values_time * 1000:.0f}ms '
+            f'({rows / values_time:.0f} rows/s), '
+            f'{serializer_time / values_time:.1f}x faster.')
+
+    def create_rows(self, rng, user, options):
+        rows = options['rows']
+        start = datetime.date(2000, 1, 1)
+        FitnessProgress.objects.bulk_create([
+            FitnessProgress(
+                user=user, date=start + datetime.timedelta(days=day),
+                weight=Decimal(rng.randint(5000, 12000)) / 100,
+                goal_weight=Decimal(rng.randint(5000, 12000)) / 100,
+                achieved_goals='Ran further than last week',
+                notes='Felt strong', exercise_duration=rng.randint(20, 120),
+                calories_burned=rng.randint(100, 1000), mood='good')
+            for day in range(rows)
+        ], batch_size=5000)
+
+        exercise = Exercise.objects.create(
+            name='Benchmark Exercise', description='', instructions='')
+        workout_plans = WorkoutPlan.objects.bulk_create([
+            WorkoutPlan(user=user, title=f'Plan {i}', frequency=3,
+                        goal='Build strength', session_duration=60)
+            for i in range(rows)
+        ], batch_size=5000)
+        WorkoutExercise.objects.bulk_create([
+            WorkoutExercise(workout_plan=workout_plan, exercise=exercise,
+                            sets=4, repetitions=rng.randint(5, 15))
+            for workout_plan in workout_plans
+            for _ in range(options['exercises_per_plan'])
+        ], batch_size=5000)
@@ -0,0 +1,71 @@
+"""
+Django command to benchmark token authentication.
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.authentication import CachedTokenAuthentication, token_users
+from core.caches import get_single_process_cache_settings
+
+AUTHENTICATION_CLASSES = [TokenAuthentication, CachedTokenAuthentication]
+
+
+class Command(BaseCommand):
+    """Django command comparing token authentication latencies.
+
+    Authenticates requests for tokens picked at random among synthetic
+    users, created in a transaction that is rolled back afterwards, and
+    reports the median and 99th percentile time per request.
+    """
+    help = 'Benchmark TokenAuthentication against its cached version.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        rng = random.Random(options['seed'])
+        with transaction.atomic(), override_settings(
+                **get_single_process_cache_settings()):
+            keys = self.create_tokens(options['users'])
+            factory = RequestFactory()
+            requests = [
+                factory.get('/', HTTP_AUTHORIZATION=f'Token {key}')
+                for key in rng.choices(keys, k=options['requests'])
+            ]
+            for authentication_class in AUTHENTICATION_CLASSES:
+                token_users.clear()
+                authentication = authentication_class()
+                timings = []
+                for request in requests:
+                    start = time.perf_counter()
+                    authentication.authenticate(request)
+                    timings.append((time.perf_counter() - start) * 1e6)
+                percentiles = statistics.quantiles(timings, n=100)
+                self.stdout.write(
+                    f'{authentication_class.__name__}: '
+                    f'{len(requests)} requests, '
+                    f'p50 {percentiles[49]:.0f}us, '
+                    f'p99 {percentiles[98]:.0f}us.')
+            transaction.set_rollback(True)
+
+    def create_tokens(self, count):
+        users = get_user_model().objects.bulk_create([
+            get_user_model()(email=f'benchmark-{number}@example.com',
+                             password='!')
+            for number in range(count)
+        ])
+        tokens = Token.objects.bulk_create([
+            Token(key=Token.generate_key(), user=user) for user in users
+        ])
+        return [token.key for token in tokens]
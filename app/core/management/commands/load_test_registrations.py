@@ -0,0 +1,151 @@
+"""
+Django command to load test registrations against plan reads.
+"""
+import asyncio
+import statistics
+import time
+import uuid
+
+import orjson
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.models import WorkoutPlan
+
+PASSWORD = 'load-test-password'
+
+
+def get_host():
+    """Return a host name the application accepts requests for."""
+    return next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                 if host != '*'), 'localhost')
+
+
+async def send_request(application, method, path, body=None, token=None):
+    """Send a request through the ASGI application.
+
+    Returns the status code and the time taken, in milliseconds.
+    """
+    headers = [(b'host', get_host().encode())]
+    if body is not None:
+        body = orjson.dumps(body)
+        headers += [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())]
+    if token is not None:
+        headers.append((b'authorization', f'Token {token}'.encode()))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': headers,
+        'client': ('127.0.0.1', 0),
+        'server': (get_host(), 80),
+    }
+    messages = [{'type': 'http.request', 'body': body or b''}]
+    response = {}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+
+    start = time.perf_counter()
+    await application(scope, receive, send)
+    return response['status'], (time.perf_counter() - start) * 1000
+
+
+class Command(BaseCommand):
+    """Django command measuring plan reads during a burst of registrations.
+
+    Requests go through the ASGI application in this process, as they
+    would from an ASGI server. Readers list the workout plans of a user
+    for a baseline, then again while a burst of users registers and
+    logs in at once. Users are created for the test and deleted after.
+    """
+    help = 'Load test plan reads during a burst of registrations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registrations', type=int, default=40)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument(
+            '--reads', type=int, default=50,
+            help='Plan reads per reader for the baseline.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        prefix = f'load-test-{uuid.uuid4().hex[:8]}-'
+        reader = get_user_model().objects.create_user(
+            email=f'{prefix}reader@example.com', password=PASSWORD)
+        try:
+            WorkoutPlan.objects.bulk_create([
+                WorkoutPlan(user=reader, title=f'Plan {number}',
+                            frequency=3, session_duration=60)
+                for number in range(10)
+            ])
+            token = Token.objects.create(user=reader).key
+            baseline, burst, registrations = asyncio.run(
+                self.run(prefix, token, options))
+        finally:
+            get_user_model().objects.filter(
+                email__startswith=prefix).delete()
+
+        self.report('Plan reads, baseline', baseline)
+        self.report('Plan reads, during burst', burst)
+        self.report('Registrations with login', registrations)
+
+    async def run(self, prefix, token, options):
+        application = ASGIHandler()
+        plans_url = reverse('workout-plan-list')
+
+        async def read_plans(count=None, until=None):
+            results = []
+            while (len(results) < count) if count else not until.done():
+                results.append(await send_request(
+                    application, 'GET', plans_url, token=token))
+            return results
+
+        async def register(number):
+            email = f'{prefix}{number}@example.com'
+            created, create_ms = await send_request(
+                application, 'POST', reverse('user:create'),
+                {'email': email, 'password': PASSWORD, 'name': 'Load'})
+            status, login_ms = await send_request(
+                application, 'POST', reverse('user:token'),
+                {'email': email, 'password': PASSWORD})
+            return max(created, status), create_ms + login_ms
+
+        baseline = await asyncio.gather(*[
+            read_plans(count=options['reads'])
+            for _ in range(options['readers'])
+        ])
+        registrations = asyncio.gather(*[
+            register(number) for number in range(options['registrations'])
+        ])
+        burst = await asyncio.gather(*[
+            read_plans(until=registrations)
+            for _ in range(options['readers'])
+        ])
+        return sum(baseline, []), sum(burst, []), await registrations
+
+    def report(self, label, results):
+        timings = [ms for _, ms in results]
+        errors = sum(status >= 400 for status, _ in results)
+        percentiles = statistics.quantiles(timings, n=100) \
+            if len(timings) > 1 else timings * 99
+        self.stdout.write(
+            f'{label}: {len(results)} requests, {errors} errors, '
+            f'p50 {percentiles[49]:.1f}ms, p99 {percentiles[98]:.1f}ms.')
@@ -0,0 +1,233 @@
+"""
+Middleware shared by the APIs.
+"""
+import gzip
+import hashlib
+from types import SimpleNamespace
+
+import brotli
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, \
+    sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import resolve, reverse
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+
+from core.catalog import CatalogPageCache, get_catalog_version
+from core.hashers import password_hashing
+
+CATALOG_SNAPSHOT_URL_NAMES = ['fitness-exercise-list', 'muscle-group-list']
+CATALOG_SNAPSHOT_CACHE_CONTROL = f'public, max-age={60 * 60}'
+CATALOG_SNAPSHOT_HEADERS = ['Content-Type', 'Allow']
+CATALOG_SNAPSHOT_ENCODINGS = ['br', 'gzip']
+CATALOG_SNAPSHOT_MEDIA_RANGES = {'application/json', 'application/*', '*/*'}
+
+
+def parse_accept(header):
+    """Return the values accepted by an Accept or Accept-Encoding header.
+
+    Values with a quality of zero are refused, so left out.
+    """
+    accepted = set()
+    for value in header.split(','):
+        name, *params = value.split(';')
+        name = name.strip()
+        params = [param.replace(' ', '') for param in params]
+        if name and not any(param in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+                            for param in params):
+            accepted.add(name.lower())
+    return accepted
+
+
+def accepts_snapshot(header):
+    """Return whether an Accept header is answered with the JSON snapshot.
+
+    The view would pick JSON for a missing header, or one accepting JSON
+    but not HTML, which it renders as the browsable API. It answers any
+    other header with its own response, such as 406 Not Acceptable.
+    """
+    if not header.strip():
+        return True
+    accepted = parse_accept(header)
+    return 'text/html' not in accepted and not accepted.isdisjoint(
+        CATALOG_SNAPSHOT_MEDIA_RANGES)
+
+
+def allows_anonymous_reads(path):
+    """Return whether the view at `path` lets anonymous users GET it."""
+    match = resolve(path)
+    view = match.func.cls(**match.func.initkwargs)
+    view.action = getattr(match.func, 'actions', {}).get('get')
+    request = SimpleNamespace(method='GET', user=AnonymousUser(), auth=None)
+    return all(permission.has_permission(request, view)
+               for permission in view.get_permissions())
+
+
+class CatalogSnapshot:
+    """A rendered catalog response with its compressed variants."""
+
+    def __init__(self, content, headers):
+        self.headers = headers
+        self.tag = hashlib.sha256(content).hexdigest()[:32]
+        self.bodies = {
+            None: content,
+            'gzip': gzip.compress(content, compresslevel=9, mtime=0),
+            'br': brotli.compress(content),
+        }
+        self.etags = {encoding: self.get_etag(encoding)
+                      for encoding in self.bodies}
+
+    def get_etag(self, encoding):
+        """Return the strong ETag of one encoding of the snapshot."""
+        return quote_etag(f'{self.tag}-{encoding}' if encoding else self.tag)
+
+    def choose_encoding(self, request):
+        accepted = parse_accept(
+            request.headers.get('Accept-Encoding', ''))
+        return next((encoding for encoding in CATALOG_SNAPSHOT_ENCODINGS
+                     if encoding in accepted), None)
+
+    def respond(self, request):
+        """Answer the request from the snapshot, with 304 if unchanged."""
+        encoding = self.choose_encoding(request)
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            # Only the variant negotiated for this request is current.
+            etags = parse_etags(if_none_match)
+            if '*' in etags or self.etags[encoding] in etags:
+                response = HttpResponseNotModified()
+                self.add_headers(response, encoding)
+                return response
+
+        response = HttpResponse(self.bodies[encoding])
+        for name, value in self.headers.items():
+            response[name] = value
+        if encoding:
+            response['Content-Encoding'] = encoding
+        self.add_headers(response, encoding)
+        return response
+
+    def add_headers(self, response, encoding):
+        response['ETag'] = self.etags[encoding]
+        response['Cache-Control'] = CATALOG_SNAPSHOT_CACHE_CONTROL
+        response['Vary'] = 'Accept, Accept-Encoding'
+
+
+class CatalogSnapshotMiddleware:
+    """Serve the public catalog lists from precompressed snapshots.
+
+    The first JSON response for a catalog list after a catalog change
+    is kept, together with its gzip and brotli variants and a
+    content-hash ETag. Later requests for the same list are answered
+    from the snapshot, and with 304 if their If-None-Match matches the
+    variant they negotiated, before any view code runs. As that skips
+    authentication and permissions, only lists anonymous users may read
+    are snapshotted, and only for requests without credentials.
+    Requests with a query string or not accepting JSON, such as those
+    asking for HTML, are passed through to the view.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.snapshots = CatalogPageCache()
+        self._paths = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @property
+    def paths(self):
+        if self._paths is None:
+            paths = [reverse(name) for name in CATALOG_SNAPSHOT_URL_NAMES]
+            self._paths = {path for path in paths
+                           if allows_anonymous_reads(path)}
+        return self._paths
+
+    def is_snapshot_request(self, request):
+        return request.method == 'GET' \
+            and not request.META.get('QUERY_STRING') \
+            and accepts_snapshot(request.headers.get('Accept', '')) \
+            and 'Authorization' not in request.headers \
+            and request.path in self.paths
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.is_snapshot_request(request):
+            return self.get_response(request)
+
+        version = get_catalog_version()
+        snapshot = self.snapshots.get(version, request.build_absolute_uri())
+        if snapshot is not None:
+            return snapshot.respond(request)
+        return self.respond_from_view(
+            request, version, self.get_response(request))
+
+    async def __acall__(self, request):
+        if not self.is_snapshot_request(request):
+            return await self.get_response(request)
+
+        version = await sync_to_async(get_catalog_version)()
+        snapshot = self.snapshots.get(version, request.build_absolute_uri())
+        if snapshot is not None:
+            return snapshot.respond(request)
+        response = await self.get_response(request)
+        return await sync_to_async(self.respond_from_view)(
+            request, version, response)
+
+    def respond_from_view(self, request, version, response):
+        """Snapshot the view's response if it can be, and answer from it."""
+        if response.status_code != status.HTTP_200_OK \
+                or response.has_header('Content-Encoding') \
+                or version != get_catalog_version():
+            return response
+        snapshot = CatalogSnapshot(response.content, {
+            name: response[name]
+            for name in CATALOG_SNAPSHOT_HEADERS
+            if response.has_header(name)
+        })
+        self.snapshots.set(version, request.build_absolute_uri(), snapshot)
+        if snapshot.choose_encoding(request) is None:
+            snapshot.add_headers(response, None)
+            return response
+        return snapshot.respond(request)
+
+
+class PasswordHashingTimingMiddleware:
+    """Report the CPU time a request spent hashing passwords.
+
+    Requests that hashed a password get a `Server-Timing` header with a
+    `password-hash` metric, in milliseconds, for the load balancer logs
+    and browser tools to pick up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with password_hashing.measure() as timings:
+            response = self.get_response(request)
+        return self.add_timing(response, timings)
+
+    async def __acall__(self, request):
+        with password_hashing.measure() as timings:
+            response = await self.get_response(request)
+        return self.add_timing(response, timings)
+
+    def add_timing(self, response, timings):
+        if timings:
+            timing = f'password-hash;dur={sum(timings) * 1000:.1f}'
+            if response.has_header('Server-Timing'):
+                timing = f"{response['Server-Timing']}, {timing}"
+            response['Server-Timing'] = timing
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.10 on 2026-10-17 22:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_fitnessprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fitnessprogress',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='workoutexercise',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='workoutplan',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.10 on 2026-10-17 22:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_fitnessprogress_version_workoutexercise_version_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutplan',
+            name='template',
+            field=models.ForeignKey(blank=True, help_text='Plan this plan was copied from', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assigned_plans', to='core.workoutplan'),
+        ),
+        migrations.AddConstraint(
+            model_name='workoutplan',
+            constraint=models.UniqueConstraint(fields=('template', 'user'), name='unique_template_user'),
+        ),
+    ]
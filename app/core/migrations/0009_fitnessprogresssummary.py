@@ -0,0 +1,27 @@
+# Generated by Django 4.0.10 on 2026-10-17 23:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_exercise_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FitnessProgressSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fitness_progress_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('entry_count', models.IntegerField(default=0)),
+                ('total_calories_burned', models.BigIntegerField(default=0)),
+                ('total_exercise_duration', models.BigIntegerField(default=0)),
+                ('latest_date', models.DateField(blank=True, null=True)),
+                ('latest_weight', models.DecimalField(blank=True, decimal_places=2, help_text='Weight of the latest entry', max_digits=6, null=True)),
+                ('goal_weight', models.DecimalField(blank=True, decimal_places=2, help_text='Goal weight of the latest entry that has one', max_digits=6, null=True)),
+            ],
+        ),
+    ]
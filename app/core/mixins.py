@@ -0,0 +1,385 @@
+"""
+Mixins shared by the API views.
+"""
+from itertools import islice
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags, quote_etag
+from drf_spectacular.utils import extend_schema, OpenApiTypes
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from core.catalog import catalog_pages, get_catalog_version
+from core.models import VersionedModel
+from core.renderers import CSVRenderer, NDJSONRenderer
+from core.serializers import SparseFieldsetSerializerMixin, \
+    ValuesSerializer
+
+_values_serializers = {}
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has been modified since it was fetched.'
+    default_code = 'precondition_failed'
+
+
+class ConditionalRequestMixin:
+    """ETag support for viewsets of `VersionedModel` objects.
+
+    Retrieve and update responses get a strong ETag built from the
+    object's version. GET requests whose If-None-Match matches are answered
+    with 304 after loading only the version, and PUT, PATCH and DELETE
+    requests whose If-Match does not match fail with 412.
+    """
+
+    def get_etag(self, version):
+        """Return the ETag for an object version."""
+        return quote_etag(str(version))
+
+    def get_object_version(self):
+        """Retrieve the version of the object without loading it."""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = get_object_or_404(
+            queryset.prefetch_related(None).only('pk', 'version'),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, obj)
+        return obj.version
+
+    def check_if_match(self, instance):
+        """Fail unless If-Match matches the version of the instance.
+
+        A matching version is claimed with a conditional UPDATE, so a
+        concurrent write with the same precondition waits for this
+        transaction and then fails instead of overwriting it.
+        """
+        if_match = self.request.headers.get('If-Match')
+        if not if_match:
+            return
+        etags = parse_etags(if_match)
+        if '*' in etags:
+            return
+        if self.get_etag(instance.version) not in etags:
+            raise PreconditionFailed()
+        claimed = type(instance)._default_manager.filter(
+            pk=instance.pk, version=instance.version,
+        ).update(version=F('version'))
+        if not claimed:
+            raise PreconditionFailed()
+
+    def retrieve(self, request, *args, **kwargs):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etag = self.get_etag(self.get_object_version())
+            etags = parse_etags(if_none_match)
+            if '*' in etags or etag in etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED,
+                                headers={'ETag': etag})
+
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data,
+                        headers={'ETag': self.get_etag(instance.version)})
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        response['ETag'] = self.get_etag(self.object_version)
+        return response
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            self.check_if_match(serializer.instance)
+            serializer.save()
+        self.object_version = serializer.instance.version
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            self.check_if_match(instance)
+            instance.delete()
+
+
+class CatalogCacheMixin:
+    """Serve catalog reads from the worker's cache of catalog pages.
+
+    List and retrieve responses are cached per catalog version and
+    absolute URL, so in steady state they are answered without running
+    a single query. Any change to the catalog gives it a new version,
+    which leaves every cached page behind.
+    """
+    catalog_cache = catalog_pages
+
+    def get_catalog_cache_key(self, request):
+        view = type(self)
+        return (view.__module__, view.__qualname__, self.action,
+                request.build_absolute_uri())
+
+    def cached_catalog_response(self, view, request, *args, **kwargs):
+        version = get_catalog_version()
+        key = self.get_catalog_cache_key(request)
+        data = self.catalog_cache.get(version, key)
+        if data is not None:
+            return Response(data)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK \
+                and version == get_catalog_version():
+            self.catalog_cache.set(version, key, response.data)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_catalog_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_catalog_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+def get_ordering_fields(view, queryset):
+    """Return the fields the view's cursor paginator orders by."""
+    paginator = view.paginator
+    if paginator is None or not hasattr(paginator, 'get_ordering'):
+        return []
+    ordering = paginator.get_ordering(view.request, queryset, view)
+    if isinstance(ordering, str):
+        ordering = (ordering,)
+    return [field.lstrip('-') for field in ordering]
+
+
+class ValuesListMixin:
+    """Let list requests be served from `.values_list()` rows.
+
+    `?values=1` serializes the rows with a `ValuesSerializer` compiled
+    from the viewset's serializer, producing the same output without
+    building a model instance per row. Views setting `values_list` to
+    True take this path for every list request. Otherwise lists go
+    through the regular serializer.
+    """
+    values_list = False
+    values_list_param = 'values'
+
+    def use_values_list(self):
+        """Return whether this list request is served from rows."""
+        value = self.request.query_params.get(self.values_list_param)
+        if value is None:
+            return self.values_list
+        return value.lower() in ('1', 'true', 'yes')
+
+    def get_values_serializer(self):
+        serializer = self.get_serializer()
+        key = (type(serializer), tuple(serializer.fields))
+        values_serializer = _values_serializers.get(key)
+        if values_serializer is None:
+            values_serializer = ValuesSerializer(serializer)
+            _values_serializers[key] = values_serializer
+        return values_serializer
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values_list():
+            return super().list(request, *args, **kwargs)
+
+        values_serializer = self.get_values_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = values_serializer.get_queryset(
+            queryset, extra=get_ordering_fields(self, queryset))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                values_serializer.to_representation(page))
+        return Response(values_serializer.to_representation(list(rows)))
+
+
+def flatten_nested(values_serializer, items):
+    """Return the CSV columns and rows of items with nested lists.
+
+    Each nested row becomes a line of its own, repeating the columns of
+    its parent and naming its columns after the nested field, such as
+    `workout_exercises.sets`. Items without nested rows keep one line.
+    """
+    columns = {
+        name: [(f'{name}.{field}', field) for field in child.order]
+        for name, (_, child) in values_serializer.nested
+    }
+    fields = []
+    for name in values_serializer.order:
+        fields.extend([column for column, _ in columns[name]]
+                      if name in columns else [name])
+
+    def rows():
+        for item in items:
+            nested = {name: item.pop(name) for name in columns}
+            if not any(nested.values()):
+                yield item
+                continue
+            for name, children in nested.items():
+                for child in children:
+                    row = dict(item)
+                    for column, field in columns[name]:
+                        row[column] = child[field]
+                    yield row
+
+    return fields, rows()
+
+
+class StreamingExportMixin:
+    """Add an `export` action streaming the whole list as CSV or NDJSON.
+
+    Meant for viewsets using `ValuesListMixin`: rows are read through a
+    server-side cursor `export_chunk_size` at a time and serialized by
+    the viewset's `ValuesSerializer`, so memory use does not grow with
+    the number of rows. The format is negotiated from the `Accept`
+    header or `?format=`, and CSV is the default.
+
+    Under ASGI, Django iterates streaming responses on the event loop,
+    where the ORM cannot run, so there the rows are read before the
+    response starts and only the rendering is streamed.
+    """
+    export_ordering = ('pk',)
+    export_chunk_size = 2000
+    export_filename = 'export'
+
+    @extend_schema(
+        description="Stream the whole list as CSV or NDJSON, picked "
+                    "with the Accept header or ?format=csv|ndjson.",
+        responses={(200, CSVRenderer.media_type): OpenApiTypes.STR,
+                   (200, NDJSONRenderer.media_type): OpenApiTypes.STR},
+    )
+    @action(detail=False, methods=['get'], pagination_class=None,
+            renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """Stream the user's rows in the negotiated format."""
+        values_serializer = self.get_values_serializer()
+        queryset = self.filter_queryset(self.get_queryset()) \
+            .order_by(*self.export_ordering)
+        renderer = request.accepted_renderer
+
+        fields = values_serializer.order
+        items = self.iter_export(queryset, values_serializer)
+        if isinstance(request._request, ASGIRequest):
+            items = list(items)
+        if renderer.format == CSVRenderer.format and values_serializer.nested:
+            fields, items = flatten_nested(values_serializer, items)
+
+        response = StreamingHttpResponse(
+            renderer.stream(items, fields),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = \
+            f'attachment; filename="{self.export_filename}.{renderer.format}"'
+        return response
+
+    def iter_export(self, queryset, values_serializer):
+        """Yield the serialized items of `queryset` chunk by chunk."""
+        chunk_size = self.export_chunk_size
+        # Outside a transaction the cursor is declared WITH HOLD, which
+        # makes the database materialize every row before the first one
+        # is returned.
+        with transaction.atomic():
+            rows = values_serializer.get_queryset(queryset) \
+                .iterator(chunk_size=chunk_size)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    return
+                yield from values_serializer.to_representation(chunk)
+
+
+class SparseFieldsetMixin:
+    """Let GET requests select the fields they need.
+
+    `?fields=a,b` keeps only the named fields of the response and
+    `?omit=c` drops the named ones. The serializer is trimmed to the
+    selection, the query only reads the columns behind it, and
+    prefetches for relations that are not selected are skipped. Writes
+    always validate and return every field.
+    """
+    fields_param = 'fields'
+    omit_param = 'omit'
+
+    def _get_param_names(self, param):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    def get_sparse_fieldset(self):
+        """Return the selected field names, or None for every field."""
+        if not hasattr(self, '_sparse_fieldset'):
+            self._sparse_fieldset = self._build_sparse_fieldset()
+        return self._sparse_fieldset
+
+    def _build_sparse_fieldset(self):
+        if self.request.method not in SAFE_METHODS:
+            return None
+        fields = self._get_param_names(self.fields_param)
+        omit = self._get_param_names(self.omit_param) or []
+        serializer_class = self.get_serializer_class()
+        if (fields is None and not omit) or not issubclass(
+                serializer_class, SparseFieldsetSerializerMixin):
+            return None
+
+        serializer = serializer_class(context=self.get_serializer_context())
+        available = [name for name, field in serializer.fields.items()
+                     if not field.write_only]
+        errors = {}
+        for param, names in [(self.fields_param, fields or []),
+                             (self.omit_param, omit)]:
+            unknown = [f'Unknown field "{name}".' for name in names
+                       if name not in available]
+            if unknown:
+                errors[param] = unknown
+        if errors:
+            raise ValidationError(errors)
+        return [name for name in available
+                if (fields is None or name in fields) and name not in omit]
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset = self.get_sparse_fieldset()
+        if fieldset is not None:
+            kwargs.setdefault('fields', fieldset)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fieldset = self.get_sparse_fieldset()
+        if fieldset is None:
+            return queryset
+        return self.narrow_queryset(queryset, fieldset)
+
+    def narrow_queryset(self, queryset, fieldset):
+        """Only read the columns and relations behind `fieldset`."""
+        serializer = self.get_serializer()
+        model = queryset.model
+        sources = {serializer.fields[name].source for name in fieldset}
+
+        prefetches = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if (lookup.prefetch_through if isinstance(lookup, Prefetch)
+                else lookup).split('__')[0] in sources
+        ]
+        queryset = queryset.prefetch_related(None) \
+            .prefetch_related(*prefetches)
+
+        columns = {model._meta.pk.name}
+        if issubclass(model, VersionedModel):
+            columns.add('version')
+        concrete = {field.name for field in model._meta.concrete_fields}
+        for source in sources | set(get_ordering_fields(self, queryset)):
+            if source in concrete:
+                columns.add(source)
+            elif source not in queryset.query.annotations \
+                    and source not in {
+                        field.name for field in model._meta.get_fields()
+                        if field.is_relation}:
+                # Not backed by a column of the model, so we cannot tell
+                # which columns it needs.
+                return queryset
+        return queryset.only(*columns)
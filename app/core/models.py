@@ -2,6 +2,8 @@
 Database models.
 """
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -24,6 +26,17 @@ class UserManager(BaseUserManager):
 
         return user
 
+    def create_user_with_encoded_password(self, email, encoded,
+                                          **extra_fields):
+        """Create, save and return a new user with a hashed password."""
+        if not email:
+            raise ValueError('User must have an email address.')
+        user = self.model(email=self.normalize_email(email),
+                          password=encoded, **extra_fields)
+        user.save(using=self._db)
+
+        return user
+
     def create_superuser(self, email, password):
         """Create and return a new superuser."""
         user = self.create_user(email, password)
@@ -40,10 +53,33 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    token_version = models.PositiveIntegerField(
+        default=0, editable=False,
+        help_text='Claimed by signed tokens; bumping it revokes them all')
     objects = UserManager()
     USERNAME_FIELD = 'email'
 
 
+class VersionedModel(models.Model):
+    """Model with a version counter bumped on every save."""
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """Save the model, atomically incrementing its version."""
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version'}
+        self.version = models.F('version') + 1
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+
+
 class MuscleGroup(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -58,12 +94,24 @@ class Exercise(models.Model):
     instructions = models.TextField()
     target_muscles = models.ManyToManyField(
         MuscleGroup, related_name='exercises')
+    search_vector = SearchVectorField(
+        null=True, editable=False,
+        help_text='Weighted name, description and instructions,'
+                  ' maintained by a database trigger')
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'],
+                     name='exercise_search_vector_idx'),
+            GinIndex(fields=['name'], name='exercise_name_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class WorkoutPlan(models.Model):
+class WorkoutPlan(VersionedModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE,
                              related_name='workout_plans')
@@ -74,12 +122,23 @@ class WorkoutPlan(models.Model):
     session_duration = \
         models.IntegerField(help_text='Duration of each workout'
                                       ' session in minutes')
+    template = models.ForeignKey('self',
+                                 on_delete=models.SET_NULL,
+                                 null=True, blank=True,
+                                 related_name='assigned_plans',
+                                 help_text='Plan this plan was copied from')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['template', 'user'],
+                                    name='unique_template_user'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.email}"
 
 
-class WorkoutExercise(models.Model):
+class WorkoutExercise(VersionedModel):
     workout_plan = models.ForeignKey(WorkoutPlan,
                                      related_name='workout_exercises',
                                      on_delete=models.CASCADE)
@@ -93,7 +152,7 @@ class WorkoutExercise(models.Model):
                f" {self.sets} sets of {self.repetitions}"
 
 
-class FitnessProgress(models.Model):
+class FitnessProgress(VersionedModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
     date = models.DateField()
@@ -112,3 +171,54 @@ class FitnessProgress(models.Model):
 
     def __str__(self):
         return f"{self.date} - {self.user.email}"
+
+
+class FitnessProgressSummary(models.Model):
+    """Running totals of a user's fitness progress entries.
+
+    Kept up to date in the same transaction as the entries are written
+    through the API or imported, so a user's summary is read from one
+    row instead of aggregating their whole history.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='fitness_progress_summary')
+    entry_count = models.IntegerField(default=0)
+    total_calories_burned = models.BigIntegerField(default=0)
+    total_exercise_duration = models.BigIntegerField(default=0)
+    latest_date = models.DateField(null=True, blank=True)
+    latest_weight = models.DecimalField(
+        max_digits=6, decimal_places=2, null=True, blank=True,
+        help_text='Weight of the latest entry')
+    goal_weight = models.DecimalField(
+        max_digits=6, decimal_places=2, null=True, blank=True,
+        help_text='Goal weight of the latest entry that has one')
+
+    @property
+    def distance_to_goal(self):
+        """Return how far the latest weight is above the goal weight."""
+        if self.latest_weight is None or self.goal_weight is None:
+            return None
+        return self.latest_weight - self.goal_weight
+
+    def __str__(self):
+        return f"{self.user_id}: {self.entry_count} entries"
+
+
+class RefreshToken(models.Model):
+    """Long-lived token exchanged for signed access tokens.
+
+    Only a SHA-256 digest of the token is stored. It is valid until it
+    expires, is used, or the user's token version changes.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE,
+                             related_name='refresh_tokens')
+    token_version = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField()
+
+    def __str__(self):
+        return f"Refresh token of {self.user_id} until {self.expires}"
@@ -0,0 +1,56 @@
+"""
+Pagination classes shared by the APIs.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset pagination ordered by primary key.
+
+    Each page is fetched with a `WHERE ... > cursor LIMIT n` query, so
+    its cost does not depend on how deep the client has paged.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class ExerciseCursorPagination(IdCursorPagination):
+    """Keyset pagination for the exercise catalog, by name.
+
+    Search results annotated with a `search_rank` are paged most
+    relevant first instead. A search whose page comes back empty
+    because nothing matches is run again with the view's
+    `search_fallback` set, so no query is spent checking for matches
+    up front.
+    """
+    ordering = ('name', 'id')
+    search_ordering = ('-search_rank', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations:
+            return self.search_ordering
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        if page or view is None \
+                or 'search_rank' not in queryset.query.annotations \
+                or getattr(view, 'search_fallback', False):
+            return page
+        # A later page may only be empty for having gone past the end.
+        if self.cursor is not None and queryset.exists():
+            return page
+        view.search_fallback = True
+        return super().paginate_queryset(
+            view.filter_queryset(view.get_queryset()), request, view)
+
+
+class FitnessProgressCursorPagination(IdCursorPagination):
+    """Keyset pagination for fitness progress, newest first.
+
+    Matches the `('user', 'date')` unique index, so a page is a range
+    scan over the user's most recent entries.
+    """
+    ordering = ('-date', 'id')
@@ -0,0 +1,51 @@
+"""
+Readers for the CSV and NDJSON files imported in bulk.
+"""
+import csv
+import os
+
+import orjson
+
+FORMATS = ['csv', 'ndjson']
+
+
+def guess_format(path):
+    """Return the format of a file from its extension, or None."""
+    format = os.path.splitext(path)[1].lstrip('.').lower()
+    return format if format in FORMATS else None
+
+
+def iter_lines(stream):
+    """Yield the lines of a binary file or request body, one at a time."""
+    return iter(stream.readline, b'')
+
+
+def read_csv(stream):
+    """Yield the line number and dict of each CSV row after the header.
+
+    A leading byte order mark, as spreadsheets write, is dropped.
+    """
+    reader = csv.DictReader(line.decode('utf-8-sig')
+                            for line in iter_lines(stream))
+    for row in reader:
+        # Empty cells are missing values rather than empty strings.
+        yield reader.line_num, {key: value for key, value in row.items()
+                                if value != '' and key is not None}
+
+
+def read_ndjson(stream):
+    """Yield the line number and object of each NDJSON line.
+
+    Lines that do not hold a JSON object are yielded as None.
+    """
+    for number, line in enumerate(iter_lines(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
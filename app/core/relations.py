@@ -0,0 +1,103 @@
+"""
+Related fields resolving primary keys in bulk.
+"""
+from contextlib import contextmanager, ExitStack
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key related field that can resolve many pks at once.
+
+    Values preloaded with `preloaded()` are looked up in memory instead
+    of with one query each. Missing pks fail with the same errors as
+    `PrimaryKeyRelatedField`.
+    """
+
+    def __init__(self, **kwargs):
+        self._preloaded = None
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def _to_pk(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            raise TypeError
+        return self.get_queryset().model._meta.pk.to_python(data)
+
+    @contextmanager
+    def preloaded(self, values):
+        """Resolve `values` with one query for the duration of the block."""
+        pks = set()
+        for value in values:
+            try:
+                pks.add(self._to_pk(value))
+            except (TypeError, ValueError, DjangoValidationError,
+                    serializers.ValidationError):
+                continue
+        self._preloaded = self.get_queryset().in_bulk(pks)
+        try:
+            yield
+        finally:
+            self._preloaded = None
+
+    def to_internal_value(self, data):
+        if self._preloaded is None:
+            return super().to_internal_value(data)
+        try:
+            pk = self._to_pk(data)
+        except (TypeError, ValueError, DjangoValidationError,
+                serializers.ValidationError):
+            return super().to_internal_value(data)
+        try:
+            return self._preloaded[pk]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Many related field resolving every pk in the list with one query."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        with self.child_relation.preloaded(data):
+            return [
+                self.child_relation.to_internal_value(item)
+                for item in data
+            ]
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """List serializer resolving the children's related pks in bulk.
+
+    Every `BulkPrimaryKeyRelatedField` of the child serializer is
+    resolved with one query for the whole list before the items are
+    validated.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+        items = [item for item in data if isinstance(item, dict)]
+        with ExitStack() as stack:
+            for field in self.child.fields.values():
+                if field.read_only or \
+                        not isinstance(field, BulkPrimaryKeyRelatedField):
+                    continue
+                stack.enter_context(field.preloaded(
+                    item[field.field_name] for item in items
+                    if field.field_name in item))
+            return super().to_internal_value(data)
@@ -0,0 +1,116 @@
+"""
+Renderers shared by the APIs.
+"""
+import csv
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+LINE_TERMINATOR_PREFIX = b'\xe2\x80'
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON renderer backed by orjson.
+
+    Produces the same output as DRF's `JSONRenderer`: values orjson
+    does not handle itself, such as `Decimal`, lazy strings, and dates
+    and times (passed through so they keep DRF's format), are converted
+    by DRF's own encoder. Indented or ASCII-only output, which orjson
+    cannot produce, is left to DRF's renderer.
+    """
+    encoder_class = JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) \
+                or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder_class().default,
+                           option=ORJSON_OPTIONS)
+        # Escape the line terminators JavaScript does not allow in
+        # strings, as DRF's renderer does.
+        if LINE_TERMINATOR_PREFIX in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028') \
+                .replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class LineBuffer:
+    """File-like object handing back what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+class StreamingRenderer(BaseRenderer):
+    """Base for renderers writing a list of dicts one line per row.
+
+    `stream` renders rows lazily so a `StreamingHttpResponse` can send
+    them as they are read; the header, if any, is yielded on its own and
+    rows are grouped `lines_per_chunk` at a time. `render` handles the
+    regular responses of the view, such as errors.
+    """
+    charset = 'utf-8'
+    lines_per_chunk = 500
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        fields = list(rows[0]) if rows else []
+        return b''.join(self.stream(rows, fields))
+
+    def stream(self, rows, fields):
+        """Yield the rendered `fields` of `rows` in chunks of bytes."""
+        header = self.render_header(fields)
+        if header:
+            yield header
+        lines = []
+        for row in rows:
+            lines.append(self.render_row(row, fields))
+            if len(lines) == self.lines_per_chunk:
+                yield b''.join(lines)
+                lines = []
+        if lines:
+            yield b''.join(lines)
+
+    def render_header(self, fields):
+        return b''
+
+    def render_row(self, row, fields):
+        raise NotImplementedError('.render_row() must be overridden.')
+
+
+class CSVRenderer(StreamingRenderer):
+    """Renderer writing rows as CSV with a header row."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def __init__(self):
+        self.writer = csv.writer(LineBuffer())
+
+    def render_header(self, fields):
+        return self.writer.writerow(fields).encode()
+
+    def render_row(self, row, fields):
+        return self.writer.writerow(
+            [row.get(field) for field in fields]).encode()
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """Renderer writing rows as newline delimited JSON objects."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    encoder_class = JSONEncoder
+
+    def __init__(self):
+        self.default = self.encoder_class().default
+
+    def render_row(self, row, fields):
+        return orjson.dumps(row, default=self.default,
+                            option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
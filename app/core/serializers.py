@@ -0,0 +1,156 @@
+"""
+Serializer helpers shared by the APIs.
+"""
+import datetime
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Fields whose representation of a database value is the value itself.
+IDENTITY_FIELDS = (serializers.BooleanField, serializers.CharField,
+                   serializers.IntegerField)
+UNSUPPORTED_FIELDS = (serializers.RelatedField, serializers.ManyRelatedField,
+                      serializers.SerializerMethodField)
+
+
+class ValuesSerializer:
+    """Produce a model serializer's output from `.values_list()` rows.
+
+    The readable fields of the serializer are compiled once into the
+    database columns to select and the conversions to apply, so rows
+    are turned into dicts without building model instances or calling
+    `to_representation` for fields that would return the value as is.
+    Nested many=True model serializers over a reverse foreign key are
+    loaded with one more query for the whole page.
+
+    Only plain model fields, primary key relations and such nested
+    serializers are supported; anything else raises
+    `ImproperlyConfigured` when the serializer is compiled.
+    """
+
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.names = []
+        self.lookups = []
+        self.converters = []
+        self.nested = []
+        self.order = []
+        opts = self.model._meta
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            self.order.append(field.field_name)
+            if isinstance(field, serializers.ListSerializer):
+                self.nested.append(
+                    (field.field_name, self._compile_nested(field)))
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured(
+                    f'Cannot read {field.field_name!r} from values.')
+            model_field = opts.get_field(field.source)
+            self.names.append(field.field_name)
+            self.lookups.append(field.source)
+            converter = self._compile_converter(field, model_field)
+            if converter is not None:
+                self.converters.append((field.field_name, converter))
+        self.reorder = self.order != self.names + [
+            name for name, _ in self.nested]
+
+    def _compile_converter(self, field, model_field):
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return field.pk_field.to_representation \
+                if field.pk_field is not None else None
+        if isinstance(field, UNSUPPORTED_FIELDS):
+            raise ImproperlyConfigured(
+                f'Cannot read {field.field_name!r} from values.')
+        if isinstance(field, IDENTITY_FIELDS):
+            return None
+        if type(field) is serializers.DecimalField and getattr(
+                field, 'coerce_to_string',
+                api_settings.COERCE_DECIMAL_TO_STRING) \
+                and not field.localize and field.decimal_places == getattr(
+                    model_field, 'decimal_places', None):
+            # The column already holds the serializer's decimal places,
+            # so quantizing each value would not change it.
+            return '{:f}'.format
+        if type(field) is serializers.DateField and getattr(
+                field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+            return datetime.date.isoformat
+        return field.to_representation
+
+    def _compile_nested(self, field):
+        child = field.child
+        relation = self.model._meta.get_field(field.source)
+        if not isinstance(child, serializers.ModelSerializer) \
+                or not relation.one_to_many:
+            raise ImproperlyConfigured(
+                f'Cannot read {field.field_name!r} from values.')
+        return relation.field.name, ValuesSerializer(child)
+
+    def get_queryset(self, queryset, extra=()):
+        """Return `queryset` as rows holding the serialized columns.
+
+        `extra` names more columns to select, such as those a paginator
+        orders by; rows are named tuples so they can be read by name.
+        """
+        lookups = self.lookups + [
+            name for name in extra if name not in self.lookups]
+        pk_name = self.model._meta.pk.name
+        if self.nested and pk_name not in lookups:
+            lookups.append(pk_name)
+        return queryset.prefetch_related(None).values_list(
+            *lookups, named=True)
+
+    def to_representation(self, rows):
+        """Return the serialized dicts of the rows."""
+        names = self.names
+        converters = self.converters
+        data = []
+        for row in rows:
+            item = dict(zip(names, row))
+            for name, converter in converters:
+                value = item[name]
+                if value is not None:
+                    item[name] = converter(value)
+            data.append(item)
+
+        if self.nested and data:
+            pk_name = self.model._meta.pk.name
+            pks = [getattr(row, pk_name) for row in rows]
+            for name, (fk_name, child) in self.nested:
+                children = child.to_representation_by(fk_name, pks)
+                for item, pk in zip(data, pks):
+                    item[name] = children.get(pk, [])
+            if self.reorder:
+                data = [{name: item[name] for name in self.order}
+                        for item in data]
+        return data
+
+    def to_representation_by(self, fk_name, pks):
+        """Serialize the rows pointing at `pks`, grouped by that key."""
+        queryset = self.model._default_manager \
+            .filter(**{f'{fk_name}__in': pks}) \
+            .order_by(*self.model._meta.ordering or ['pk'])
+        rows = list(self.get_queryset(queryset, extra=[fk_name]))
+        grouped = defaultdict(list)
+        for row, item in zip(rows, self.to_representation(rows)):
+            grouped[getattr(row, fk_name)].append(item)
+        return grouped
+
+
+class SparseFieldsetSerializerMixin:
+    """Serializer that can be limited to a selection of its fields.
+
+    `fields` keeps only the named fields and `omit` drops the named
+    ones.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in omit or ():
+            self.fields.pop(name, None)
@@ -0,0 +1,97 @@
+"""
+Signal handlers for the core models.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_save
+from django.contrib.auth import get_user_model
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import invalidate_auth
+from core.catalog import bump_catalog_version
+from core.models import Exercise, MuscleGroup
+from core.tokens import publish_token_version, revoke_tokens
+
+# Fields of a user whose change revokes their signed tokens.
+CREDENTIAL_FIELDS = ['password', 'is_active', 'is_staff', 'is_superuser']
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+@receiver(post_save, sender=MuscleGroup)
+@receiver(post_delete, sender=MuscleGroup)
+@receiver(m2m_changed, sender=Exercise.target_muscles.through)
+def catalog_changed(sender, **kwargs):
+    """Bump the catalog version when exercises or muscle groups change."""
+    if kwargs.get('action', 'post_').startswith('post_'):
+        bump_catalog_version()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Forget the cached user of a deleted token."""
+    invalidate_auth(token_keys=[instance.key])
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Forget the cached authentications of a user who changed.
+
+    Deactivating a user or changing their password saves them, so their
+    tokens and credentials are checked again with the new state. Saving
+    only the last login, as every login does, changes neither. Runs
+    before `revoke_changed_credentials`, which drops the stored email.
+    """
+    if created or update_fields == frozenset(['last_login']):
+        return
+    usernames = {instance.get_username()}
+    stored = instance.__dict__.get('_stored_credentials')
+    if stored is not None:
+        usernames.add(stored[0])
+    invalidate_auth(
+        token_keys=Token.objects.filter(
+            user=instance).values_list('key', flat=True),
+        usernames=usernames)
+
+
+@receiver(pre_save, sender=get_user_model())
+def read_stored_credentials(sender, instance, raw=False, **kwargs):
+    """Remember the stored credentials of a user about to be saved."""
+    if instance.pk is None or raw:
+        return
+    instance._stored_credentials = sender.objects.filter(
+        pk=instance.pk).values_list(
+            sender.USERNAME_FIELD, *CREDENTIAL_FIELDS,
+            'token_version').first()
+
+
+def is_password_rehash(instance, update_fields):
+    """Return whether a save only stores a new hash of the same password.
+
+    Logins upgrade outdated hashes this way, both in `ModelBackend` and in
+    `check_credentials`. Unlike `set_password`, neither leaves the raw
+    password behind for `AbstractBaseUser.save` to report as changed.
+    """
+    return update_fields == frozenset(['password']) \
+        and instance._password is None
+
+
+@receiver(post_save, sender=get_user_model())
+def revoke_changed_credentials(sender, instance, created,
+                               update_fields=None, **kwargs):
+    """Revoke the signed tokens of a user whose credentials changed.
+
+    A changed password, deactivation or change of permissions bumps the
+    user's token version, and a version changed by the save itself is
+    published for access tokens to be checked against. Upgrading the
+    hash of the same password keeps the tokens.
+    """
+    stored = instance.__dict__.pop('_stored_credentials', None)
+    if created or stored is None \
+            or is_password_rehash(instance, update_fields):
+        return
+    if list(stored[1:-1]) != [
+            getattr(instance, field) for field in CREDENTIAL_FIELDS]:
+        revoke_tokens(instance)
+    elif stored[-1] != instance.token_version:
+        publish_token_version(instance)
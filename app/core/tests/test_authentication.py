@@ -0,0 +1,318 @@
+"""
+Tests for the cached token authentication.
+"""
+import base64
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from drf_spectacular.generators import SchemaGenerator
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import AUTH_VERSION_TIMEOUT, \
+    CREDENTIAL_CACHE_TIMEOUT, TOKEN_CACHE_PREFIX, TOKEN_CACHE_TIMEOUT, \
+    TOKEN_VERSION_KEY, CachedBasicAuthentication, \
+    CachedTokenAuthentication, TokenUserCache, token_users, \
+    verified_credentials
+from core.hashers import password_hashing
+from user.serializers import UserSerializer
+
+
+def basic_authorization(email, password):
+    credentials = base64.b64encode(f'{email}:{password}'.encode()).decode()
+    return f'Basic {credentials}'
+
+
+class TokenUserCacheTests(TestCase):
+    """Test the per-worker cache of token lookups."""
+
+    def setUp(self):
+        self.now = 0
+        self.cache = TokenUserCache(maxsize=2, timeout=10,
+                                    clock=lambda: self.now)
+
+    def test_entries_expire(self):
+        self.cache.set('key', 'entry')
+        self.now = 9
+        self.assertEqual(self.cache.get('key'), 'entry')
+
+        self.now = 10
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_least_recently_used_evicted(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+
+
+@override_settings(SHARED_CACHE='default')
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached token lookups."""
+
+    def setUp(self):
+        cache.clear()
+        token_users.clear()
+        self.user = get_user_model().objects.create_user(
+            email='token@example.com', password='testpass', name='Token')
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def authenticate(self):
+        request = RequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return self.authentication.authenticate(request)
+
+    def test_lookup_cached(self):
+        """Test the token is only looked up once."""
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token, self.token)
+        self.assertIsNot(self.authenticate()[0], user)
+
+    def test_deleted_token_rejected(self):
+        self.authenticate()
+
+        self.token.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_deactivated_user_rejected(self):
+        self.authenticate()
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_password_change_reloads_user(self):
+        """Test changing the password invalidates the cached user."""
+        self.authenticate()
+
+        serializer = UserSerializer(
+            self.user, data={'password': 'newpass123', 'name': 'Renamed'},
+            partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate()
+        self.assertTrue(user.check_password('newpass123'))
+        self.assertEqual(user.name, 'Renamed')
+
+    def test_last_login_keeps_lookup(self):
+        """Test logging in does not invalidate the cached user."""
+        self.authenticate()
+
+        update_last_login(None, self.user)
+
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_shared_cache(self):
+        """Test workers only load the user of tokens cached elsewhere."""
+        self.authenticate()
+        token_users.clear()
+
+        with self.assertNumQueries(1) as queries:
+            user, token = self.authenticate()
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+        self.assertNotIn('authtoken_token', queries[0]['sql'])
+
+    def test_shared_cache_holds_user_id(self):
+        """Test no user row is stored in the shared cache."""
+        self.authenticate()
+
+        entry = cache.get(TOKEN_CACHE_PREFIX + self.token.key)
+
+        self.assertEqual(entry, (cache.get(TOKEN_VERSION_KEY.format(
+            self.token.key)), self.user.pk))
+
+    def test_versions_expire(self):
+        """Test token versions do not stay in the cache forever."""
+        self.authenticate()
+        key = TOKEN_VERSION_KEY.format(self.token.key)
+        Token.objects.filter(pk=self.token.pk).delete()
+        self.assertIsNotNone(cache.get(key))
+
+        expired = time.time() + AUTH_VERSION_TIMEOUT + 1
+        with patch('django.core.cache.backends.locmem.time.time',
+                   return_value=expired):
+            self.assertIsNone(cache.get(key))
+
+    def test_revoked_in_other_worker(self):
+        """Test a token deleted by another worker is not used here."""
+        self.authenticate()
+        other_worker = TokenUserCache()
+        # The other worker only shares the versions with this one.
+        cache.delete(TOKEN_CACHE_PREFIX + self.token.key)
+
+        with patch.object(CachedTokenAuthentication, 'token_cache',
+                          other_worker):
+            self.authenticate()
+            self.token.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(SHARED_CACHE=None)
+    def test_cached_per_worker_without_shared_cache(self):
+        """Test each worker caches tokens with no shared cache."""
+        self.authenticate()
+
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user, self.user)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(SHARED_CACHE=None)
+    def test_entries_expire_without_shared_cache(self):
+        """Test other workers' changes are seen once entries expire."""
+        self.authenticate()
+        # Deleted by another worker, whose new version is not seen here.
+        with patch('core.signals.invalidate_auth'):
+            Token.objects.filter(pk=self.token.pk).delete()
+        self.authenticate()
+
+        now = time.monotonic() + TOKEN_CACHE_TIMEOUT
+        with patch.object(token_users, 'clock', return_value=now):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                self.authenticate()
+
+
+@override_settings(SHARED_CACHE='default')
+class CachedBasicAuthenticationTests(TestCase):
+    """Test authenticating with cached verified credentials."""
+
+    def setUp(self):
+        cache.clear()
+        verified_credentials.clear()
+        self.user = get_user_model().objects.create_user(
+            email='basic@example.com', password='testpass')
+        self.authentication = CachedBasicAuthentication()
+
+    def authenticate(self, password='testpass'):
+        request = RequestFactory().get(
+            '/', HTTP_AUTHORIZATION=basic_authorization(
+                'basic@example.com', password))
+        return self.authentication.authenticate(request)
+
+    def test_password_hashed_once(self):
+        """Test verified credentials are not hashed again."""
+        self.authenticate()
+        hashes = password_hashing.hashes
+
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(password_hashing.hashes, hashes)
+
+    def test_wrong_password_rejected(self):
+        self.authenticate()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate('wrongpass')
+
+    def test_password_change_rejects_old_password(self):
+        self.authenticate()
+
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+        user, _ = self.authenticate('newpass123')
+        self.assertEqual(user, self.user)
+
+    def test_deactivated_user_rejected(self):
+        self.authenticate()
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_email_change_rejects_old_email(self):
+        self.authenticate()
+
+        self.user.email = 'renamed@example.com'
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(SHARED_CACHE=None)
+    def test_hashed_once_per_worker_without_shared_cache(self):
+        self.authenticate()
+        hashes = password_hashing.hashes
+
+        self.authenticate()
+        self.assertEqual(password_hashing.hashes, hashes)
+
+        self.user.set_password('newpass123')
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(SHARED_CACHE=None)
+    def test_entries_expire_without_shared_cache(self):
+        """Test other workers' password changes apply once entries expire."""
+        self.authenticate()
+        # Changed by another worker, whose new version is not seen here.
+        with patch('core.signals.invalidate_auth'):
+            self.user.set_password('newpass123')
+            self.user.save()
+        self.authenticate()
+
+        now = time.monotonic() + CREDENTIAL_CACHE_TIMEOUT
+        with patch.object(verified_credentials, 'clock', return_value=now):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                self.authenticate()
+
+    def test_hashing_time_reported(self):
+        """Test responses report the time spent hashing passwords."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=basic_authorization(
+            'basic@example.com', 'testpass'))
+
+        res = client.get(reverse('workout-plan-list'))
+        self.assertRegex(res['Server-Timing'],
+                         r'^password-hash;dur=\d+\.\d$')
+
+        res = client.get(reverse('workout-plan-list'))
+        self.assertFalse(res.has_header('Server-Timing'))
+
+
+class AuthenticationSchemaTests(TestCase):
+    """Test the authentication classes are documented in the schema."""
+
+    def test_security_schemes(self):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+
+        schemes = schema['components']['securitySchemes']
+        self.assertEqual(schemes['basicAuth'],
+                         {'type': 'http', 'scheme': 'basic'})
+        self.assertEqual(schemes['bearerAuth']['scheme'], 'bearer')
+        self.assertIn('tokenAuth', schemes)
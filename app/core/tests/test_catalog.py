@@ -0,0 +1,89 @@
+"""
+Tests for the catalog version and page cache.
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+
+from core.catalog import CATALOG_VERSION_KEY, CatalogPageCache, \
+    get_catalog_version
+from core.models import MuscleGroup
+
+
+class CatalogVersionTests(TestCase):
+    """Test the catalog version."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_version_stable_without_changes(self):
+        """Test the version only changes with the catalog."""
+        self.assertEqual(get_catalog_version(), get_catalog_version())
+
+    def test_version_bumped_on_commit(self):
+        """Test catalog writes give the catalog a new version."""
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MuscleGroup.objects.create(name='Neck')
+
+        self.assertNotEqual(get_catalog_version(), version)
+
+    @override_settings(SHARED_CACHE='shared', CACHES={
+        **settings.CACHES,
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                   'LOCATION': 'shared'},
+    })
+    def test_version_kept_in_shared_cache(self):
+        """Test the version is kept where every worker sees it."""
+        self.addCleanup(caches['shared'].clear)
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MuscleGroup.objects.create(name='Neck')
+
+        self.assertNotEqual(caches['shared'].get(CATALOG_VERSION_KEY),
+                            version)
+        self.assertIsNone(cache.get(CATALOG_VERSION_KEY))
+
+
+class CatalogPageCacheTests(TestCase):
+    """Test the per-worker LRU of catalog pages."""
+
+    def test_get_cached_page(self):
+        pages = CatalogPageCache()
+        pages.set('v1', 'page', {'results': []})
+
+        self.assertEqual(pages.get('v1', 'page'), {'results': []})
+        self.assertIsNone(pages.get('v1', 'other'))
+
+    def test_pages_of_other_versions_ignored(self):
+        """Test a new version leaves every older page behind."""
+        pages = CatalogPageCache()
+        pages.set('v1', 'first', 1)
+        pages.set('v2', 'second', 2)
+
+        self.assertIsNone(pages.get('v1', 'first'))
+        self.assertIsNone(pages.get('v2', 'first'))
+        self.assertEqual(pages.get('v2', 'second'), 2)
+
+    def test_pages_expire(self):
+        now = 0
+        pages = CatalogPageCache(timeout=10, clock=lambda: now)
+        pages.set('v1', 'page', 1)
+
+        now = 9
+        self.assertEqual(pages.get('v1', 'page'), 1)
+        now = 10
+        self.assertIsNone(pages.get('v1', 'page'))
+
+    def test_least_recently_used_page_evicted(self):
+        pages = CatalogPageCache(maxsize=2)
+        pages.set('v1', 'a', 1)
+        pages.set('v1', 'b', 2)
+        pages.get('v1', 'a')
+        pages.set('v1', 'c', 3)
+
+        self.assertEqual(pages.get('v1', 'a'), 1)
+        self.assertIsNone(pages.get('v1', 'b'))
+        self.assertEqual(pages.get('v1', 'c'), 3)
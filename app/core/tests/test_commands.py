@@ -1,13 +1,18 @@
 """
 Test custom Django management commands.
 """
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework.authtoken.models import Token
+
+from core.models import Exercise
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -32,3 +37,78 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class BenchmarkExerciseSearchTests(TestCase):
+    """Test the exercise search benchmark command."""
+
+    def test_benchmark_leaves_catalog_untouched(self):
+        """Test the synthetic exercises are rolled back."""
+        out = StringIO()
+        exercise_ids = list(Exercise.objects.values_list('id', flat=True))
+
+        call_command('benchmark_exercise_search', exercises=50,
+                     iterations=5, stdout=out)
+
+        self.assertIn('Ran 5 searches', out.getvalue())
+        self.assertCountEqual(
+            Exercise.objects.values_list('id', flat=True), exercise_ids)
+
+
+class BenchmarkJSONRendererTests(SimpleTestCase):
+    """Test the JSON renderer benchmark command."""
+
+    def test_benchmark_reports_each_renderer(self):
+        out = StringIO()
+
+        call_command('benchmark_json_renderer', rows=10, iterations=1,
+                     stdout=out)
+
+        self.assertIn('fitness progress, ORJSONRenderer', out.getvalue())
+        self.assertIn('workout plans, JSONRenderer', out.getvalue())
+
+
+class BenchmarkTokenAuthenticationTests(TestCase):
+    """Test the token authentication benchmark command."""
+
+    def test_benchmark_reports_each_class(self):
+        out = StringIO()
+
+        call_command('benchmark_token_authentication', users=5,
+                     requests=20, stdout=out)
+
+        self.assertIn('TokenAuthentication: 20 requests', out.getvalue())
+        self.assertIn('CachedTokenAuthentication: 20 requests',
+                      out.getvalue())
+        self.assertFalse(Token.objects.exists())
+
+
+class BenchmarkBasicAuthenticationTests(TestCase):
+    """Test the basic authentication benchmark command."""
+
+    def test_benchmark_reports_each_class(self):
+        out = StringIO()
+
+        call_command('benchmark_basic_authentication', users=2,
+                     requests=4, stdout=out)
+
+        self.assertIn('BasicAuthentication: 4 requests, ', out.getvalue())
+        self.assertIn('CachedBasicAuthentication: 4 requests',
+                      out.getvalue())
+        self.assertIn('2 hashes taking', out.getvalue())
+
+
+class LoadTestRegistrationsTests(TransactionTestCase):
+    """Test the registration load test command."""
+
+    def test_load_test_reports_each_phase(self):
+        out = StringIO()
+
+        call_command('load_test_registrations', registrations=2, readers=1,
+                     reads=2, stdout=out)
+
+        self.assertIn('Plan reads, baseline: 2 requests, 0 errors',
+                      out.getvalue())
+        self.assertIn('Registrations with login: 2 requests, 0 errors',
+                      out.getvalue())
+        self.assertFalse(get_user_model().objects.exists())
@@ -0,0 +1,63 @@
+"""
+Tests for timed and offloaded password hashing.
+"""
+import threading
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase
+
+from core.hashers import TimedPBKDF2PasswordHasher, check_credentials, \
+    password_hashing, run_hashing
+
+
+class RunHashingTests(TestCase):
+    """Test running password hashing in the hashing pool."""
+
+    def test_hashed_in_pool(self):
+        """Test hashing runs in the pool and is measured by the caller."""
+        thread_name = async_to_sync(run_hashing)(
+            lambda: threading.current_thread().name)
+        self.assertTrue(thread_name.startswith('password-hashing'))
+
+        with password_hashing.measure() as timings:
+            async_to_sync(run_hashing)(make_password, 'testpass')
+        self.assertEqual(len(timings), 1)
+
+
+class CheckCredentialsTests(TestCase):
+    """Test checking credentials without blocking the event loop."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='check@example.com', password='testpass')
+
+    def check(self, email='check@example.com', password='testpass'):
+        return async_to_sync(check_credentials)(email, password)
+
+    def test_valid_credentials(self):
+        self.assertEqual(self.check(), self.user)
+
+    def test_invalid_credentials(self):
+        self.assertIsNone(self.check(password='wrongpass'))
+        self.assertIsNone(self.check(email='other@example.com'))
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(self.check())
+
+    def test_outdated_hash_upgraded(self):
+        """Test a hash with fewer iterations is replaced on login."""
+        hasher = TimedPBKDF2PasswordHasher()
+        self.user.password = hasher.encode(
+            'testpass', hasher.salt(), iterations=1000)
+        self.user.save()
+
+        self.assertEqual(self.check(), self.user)
+
+        self.user.refresh_from_db()
+        self.assertEqual(hasher.decode(self.user.password)['iterations'],
+                         hasher.iterations)
@@ -247,3 +247,20 @@ class FitnessProgressModelTests(TestCase):
                 date=date(2022, 3, 1),
                 weight=Decimal('174.00')
             )
+
+    def test_fitness_progress_version_bumped_on_save(self):
+        """Test saving a record increments its version."""
+        fitness_progress = FitnessProgress.objects.create(
+            user=self.user,
+            date=date(2022, 3, 1),
+            weight=Decimal('176.00'),
+        )
+        self.assertEqual(fitness_progress.version, 1)
+
+        fitness_progress.weight = Decimal('175.00')
+        fitness_progress.save()
+        fitness_progress.save(update_fields=['weight'])
+
+        self.assertEqual(fitness_progress.version, 3)
+        fitness_progress.refresh_from_db()
+        self.assertEqual(fitness_progress.version, 3)
@@ -0,0 +1,68 @@
+"""
+Tests for the JSON renderer and parser.
+"""
+import datetime
+import io
+import uuid
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.functional import lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """Test the orjson renderer matches DRF's JSON renderer."""
+
+    def assertSameOutput(self, data, accepted_media_type=None):
+        self.assertEqual(
+            ORJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type))
+
+    def test_render_like_drf(self):
+        """Test values orjson lacks are rendered the way DRF does."""
+        lazy_str = lazy(lambda: 'lazy', str)
+        self.assertSameOutput(ReturnDict({
+            'weight': Decimal('72.50'),
+            'goal_weight': None,
+            'date': datetime.date(2024, 1, 31),
+            'created': datetime.datetime(
+                2024, 1, 31, 8, 30, 15, 123456, tzinfo=timezone.utc),
+            'local': datetime.datetime(2024, 1, 31, 8, 30),
+            'time': datetime.time(8, 30),
+            'duration': datetime.timedelta(minutes=45),
+            'label': lazy_str(),
+            'token': uuid.UUID(int=1),
+            'notes': 'Ran 5km\u2028felt great \u00e9',
+            'sets': [1, 2.5, True],
+            2: 'non string key',
+        }, serializer=None))
+
+    def test_render_indented(self):
+        self.assertSameOutput({'a': [1, 2]}, 'application/json; indent=4')
+
+    def test_render_none(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+class ORJSONParserTests(SimpleTestCase):
+    """Test the orjson parser."""
+
+    def parse(self, content):
+        return ORJSONParser().parse(io.BytesIO(content))
+
+    def test_parse(self):
+        self.assertEqual(self.parse('{"weight": "72.50", "mood": "é"}'
+                                    .encode()),
+                         {'weight': '72.50', 'mood': 'é'})
+
+    def test_parse_invalid(self):
+        for content in [b'{"weight": ', b'{"weight": NaN}']:
+            with self.assertRaises(ParseError):
+                self.parse(content)
@@ -0,0 +1,85 @@
+"""
+Tests for serializing rows fetched with values.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Exercise, FitnessProgress, WorkoutPlan, \
+    WorkoutExercise
+from core.serializers import ValuesSerializer
+from fitness.serializers import ExerciseSerializer
+from fitnessprogress.serializers import FitnessProgressSerializer
+from workout_plans.serializers import WorkoutPlanSerializer
+
+
+class ValuesSerializerParityTests(TestCase):
+    """Test values serialization matches the model serializers."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'parity@example.com', 'testpass')
+
+    def assertParity(self, serializer_class, queryset):
+        values_serializer = ValuesSerializer(serializer_class())
+        rows = list(values_serializer.get_queryset(queryset))
+        expected = serializer_class(queryset, many=True).data
+
+        data = values_serializer.to_representation(rows)
+
+        self.assertEqual(data, expected)
+        self.assertEqual(JSONRenderer().render(data),
+                         JSONRenderer().render(expected))
+
+    def test_fitness_progress_parity(self):
+        FitnessProgress.objects.create(
+            user=self.user, date=date(2024, 1, 1), weight=Decimal('80'),
+            goal_weight=Decimal('75.5'), achieved_goals='Ran 5km',
+            notes='Felt good', exercise_duration=45, calories_burned=400,
+            mood='great')
+        FitnessProgress.objects.create(
+            user=self.user, date=date(2024, 1, 2), weight=Decimal('79.95'))
+
+        self.assertParity(FitnessProgressSerializer,
+                          FitnessProgress.objects.order_by('id'))
+
+    def test_workout_plan_parity(self):
+        exercises = [
+            Exercise.objects.create(name=f'Exercise {i}', description='',
+                                    instructions='')
+            for i in range(3)
+        ]
+        for i in range(3):
+            workout_plan = WorkoutPlan.objects.create(
+                user=self.user, title=f'Plan {i}', frequency=3,
+                goal=None if i else 'Strength', session_duration=60)
+            for exercise in exercises[i:]:
+                WorkoutExercise.objects.create(
+                    workout_plan=workout_plan, exercise=exercise,
+                    sets=3, repetitions=10, duration=i or None)
+
+        self.assertParity(WorkoutPlanSerializer,
+                          WorkoutPlan.objects.order_by('id'))
+
+    def test_nested_rows_loaded_in_one_query(self):
+        for i in range(5):
+            workout_plan = WorkoutPlan.objects.create(
+                user=self.user, title=f'Plan {i}', frequency=3,
+                session_duration=60)
+            WorkoutExercise.objects.create(
+                workout_plan=workout_plan, exercise=Exercise.objects.first(),
+                sets=3, repetitions=10)
+        values_serializer = ValuesSerializer(WorkoutPlanSerializer())
+
+        with self.assertNumQueries(2):
+            values_serializer.to_representation(list(
+                values_serializer.get_queryset(WorkoutPlan.objects.all())))
+
+    def test_unsupported_fields_rejected(self):
+        """Test many-to-many fields cannot be read from values."""
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesSerializer(ExerciseSerializer())
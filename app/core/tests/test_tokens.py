@@ -0,0 +1,240 @@
+"""
+Tests for signed access tokens and refresh tokens.
+"""
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core import signing
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework import exceptions
+
+from core.authentication import AccessTokenAuthentication
+from core.hashers import check_credentials
+from core.models import RefreshToken
+from core.tokens import ACCESS_TOKEN_LIFETIME, \
+    LOCAL_TOKEN_VERSION_TIMEOUT, InvalidToken, create_access_token, \
+    issue_tokens, refresh_tokens
+
+
+class AccessTokenTests(TestCase):
+    """Test authenticating with signed access tokens."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='signed@example.com', password='testpass', name='Signed')
+        self.authentication = AccessTokenAuthentication()
+
+    def authenticate(self, token):
+        request = RequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.authentication.authenticate(request)
+
+    def test_verified_without_query(self):
+        """Test a token is verified from its claims and the cache."""
+        token = create_access_token(self.user)
+        self.authenticate(token)
+
+        with self.assertNumQueries(0):
+            user, claims = self.authenticate(token)
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(claims['ver'], self.user.token_version)
+        self.assertTrue(user.is_active)
+        self.assertIn('email', user.get_deferred_fields())
+        self.assertEqual(user.email, self.user.email)
+
+    def test_other_schemes_ignored(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION='Token abc')
+
+        self.assertIsNone(self.authentication.authenticate(request))
+
+    def test_forged_token_rejected(self):
+        token = signing.dumps({'uid': self.user.pk, 'ver': 0,
+                               'staff': True, 'su': True})
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_expired_token_rejected(self):
+        token = create_access_token(self.user)
+        expired = signing.time.time() + ACCESS_TOKEN_LIFETIME.total_seconds()
+
+        with mock.patch('django.core.signing.time.time',
+                        return_value=expired + 1):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                self.authenticate(token)
+
+    def test_password_change_revokes_tokens(self):
+        tokens = issue_tokens(self.user)
+
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(tokens['access'])
+        with self.assertRaises(InvalidToken):
+            refresh_tokens(tokens['refresh'])
+
+    def store_outdated_hash(self):
+        """Store the password hashed with fewer PBKDF2 iterations."""
+        self.user.password = PBKDF2PasswordHasher().encode(
+            'testpass', 'outdatedsalt', iterations=1000)
+        self.user.save()
+        return issue_tokens(self.user)
+
+    def assert_tokens_kept(self, tokens):
+        user, _ = self.authenticate(tokens['access'])
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(RefreshToken.objects.filter(user=self.user).exists())
+
+    def test_hash_upgraded_on_login_keeps_tokens(self):
+        """Test a login upgrading the stored hash revokes nothing."""
+        tokens = self.store_outdated_hash()
+
+        user = async_to_sync(check_credentials)(self.user.email, 'testpass')
+
+        self.assertNotIn('$1000$', user.password)
+        self.assert_tokens_kept(tokens)
+
+    def test_hash_upgraded_by_model_backend_keeps_tokens(self):
+        tokens = self.store_outdated_hash()
+
+        user = authenticate(email=self.user.email, password='testpass')
+
+        self.assertNotIn('$1000$', user.password)
+        self.assert_tokens_kept(tokens)
+
+    def test_password_saved_alone_revokes_tokens(self):
+        token = create_access_token(self.user)
+
+        self.user.set_password('newpass123')
+        self.user.save(update_fields=['password'])
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_deactivation_revokes_tokens(self):
+        token = create_access_token(self.user)
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_other_changes_keep_tokens(self):
+        token = create_access_token(self.user)
+
+        self.user.name = 'Renamed'
+        self.user.save()
+
+        user, _ = self.authenticate(token)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_deleted_user_rejected(self):
+        token = create_access_token(self.user)
+
+        self.user.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(token)
+
+
+class TwoWorkerTests(TestCase):
+    """Test tokens revoked by one worker and presented to another."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='workers@example.com', password='testpass')
+        self.authentication = AccessTokenAuthentication()
+        self.workers = {name: LocMemCache(f'worker-{name}', {})
+                        for name in ['a', 'b']}
+        for worker in self.workers.values():
+            self.addCleanup(worker.clear)
+
+    def authenticate(self, worker, token):
+        """Authenticate in the worker, with its own local cache."""
+        request = RequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        with mock.patch('core.tokens.cache', self.workers[worker]):
+            return self.authentication.authenticate(request)
+
+    def revoke(self, worker):
+        with mock.patch('core.tokens.cache', self.workers[worker]):
+            self.user.set_password('newpass123')
+            self.user.save()
+
+    def test_new_token_accepted_by_other_worker(self):
+        """Test a worker with an outdated version accepts newer tokens."""
+        self.authenticate('b', create_access_token(self.user))
+
+        self.revoke('a')
+
+        token = create_access_token(self.user)
+        user, _ = self.authenticate('b', token)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_revoked_token_expires_from_other_worker(self):
+        """Test another worker rejects revoked tokens within the timeout."""
+        token = create_access_token(self.user)
+        self.authenticate('b', token)
+
+        self.revoke('a')
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate('a', token)
+        expired = signing.time.time() + LOCAL_TOKEN_VERSION_TIMEOUT
+        with mock.patch('django.core.cache.backends.locmem.time.time',
+                        return_value=expired + 1):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                self.authenticate('b', token)
+
+    @override_settings(SHARED_CACHE='default')
+    def test_revoked_token_rejected_with_shared_cache(self):
+        token = create_access_token(self.user)
+        self.authenticate('b', token)
+
+        self.revoke('a')
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate('b', token)
+
+
+class RefreshTokenTests(TestCase):
+    """Test exchanging refresh tokens."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='refresh@example.com', password='testpass')
+
+    def test_refresh_token_digest_stored(self):
+        tokens = issue_tokens(self.user)
+
+        self.assertFalse(RefreshToken.objects.filter(
+            digest=tokens['refresh']).exists())
+        self.assertEqual(self.user.refresh_tokens.count(), 1)
+
+    def test_refresh_token_used_once(self):
+        """Test a refresh token is replaced by the one issued for it."""
+        tokens = issue_tokens(self.user)
+
+        renewed = refresh_tokens(tokens['refresh'])
+
+        self.assertNotEqual(renewed['refresh'], tokens['refresh'])
+        self.assertEqual(self.user.refresh_tokens.count(), 1)
+        with self.assertRaises(InvalidToken):
+            refresh_tokens(tokens['refresh'])
+
+    def test_expired_refresh_token_rejected(self):
+        tokens = issue_tokens(self.user)
+        RefreshToken.objects.update(expires='2000-01-01T00:00Z')
+
+        with self.assertRaises(InvalidToken):
+            refresh_tokens(tokens['refresh'])
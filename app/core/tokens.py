@@ -0,0 +1,157 @@
+"""
+Signed access tokens and the refresh tokens they are renewed with.
+"""
+import datetime
+import hashlib
+import secrets
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.caches import get_shared_cache
+from core.models import RefreshToken
+
+ACCESS_TOKEN_SALT = 'core.tokens.access'
+ACCESS_TOKEN_LIFETIME = datetime.timedelta(minutes=5)
+REFRESH_TOKEN_LIFETIME = datetime.timedelta(days=30)
+USER_TOKEN_VERSION_KEY = 'core:token_version:{}'
+# How long versions are kept without a shared cache, bounding how long
+# a worker accepts tokens revoked by another one.
+LOCAL_TOKEN_VERSION_TIMEOUT = 60
+# Stored for users who no longer exist, so their tokens never match.
+MISSING_USER_VERSION = -1
+
+
+class InvalidToken(Exception):
+    """The token is malformed, expired or revoked."""
+
+
+def get_token_version_cache():
+    """Return the cache token versions are kept in, and their timeout.
+
+    The shared cache keeps them until they change. Without one, each
+    worker keeps them in its own cache for LOCAL_TOKEN_VERSION_TIMEOUT.
+    """
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        return shared_cache, None
+    return cache, LOCAL_TOKEN_VERSION_TIMEOUT
+
+
+def get_user_token_version(user_id, refresh=False):
+    """Return the user's current token version, read from the cache.
+
+    Versions are published to the cache whenever they change, so only
+    a user whose version is not cached yet, or with `refresh`, is
+    looked up. A refreshed version may race with a newer one being
+    published, so it is only kept for LOCAL_TOKEN_VERSION_TIMEOUT.
+    """
+    version_cache, timeout = get_token_version_cache()
+    key = USER_TOKEN_VERSION_KEY.format(user_id)
+    version = None if refresh else version_cache.get(key)
+    if version is None:
+        version = get_user_model().objects.filter(pk=user_id) \
+            .values_list('token_version', flat=True).first()
+        if version is None:
+            version = MISSING_USER_VERSION
+        if refresh:
+            version_cache.set(key, version, LOCAL_TOKEN_VERSION_TIMEOUT)
+        else:
+            version_cache.add(key, version, timeout)
+    return version
+
+
+def publish_token_version(user):
+    """Make the user's token version the one tokens are checked against.
+
+    Done right away and again once the transaction commits, as a
+    request reading the version in between would cache the old one.
+    Without a shared cache, only this worker's cache is updated, and
+    the others catch up when their cached version expires.
+    """
+    version_cache, timeout = get_token_version_cache()
+    key = USER_TOKEN_VERSION_KEY.format(user.pk)
+    version = user.token_version
+    version_cache.set(key, version, timeout)
+    transaction.on_commit(
+        lambda: version_cache.set(key, version, timeout))
+
+
+def revoke_tokens(user):
+    """Bump the user's token version, revoking every token they hold."""
+    get_user_model().objects.filter(pk=user.pk).update(
+        token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=['token_version'])
+    RefreshToken.objects.filter(user=user).delete()
+    publish_token_version(user)
+
+
+def create_access_token(user):
+    """Return an access token for the user, signed with SECRET_KEY."""
+    return signing.dumps(
+        {'uid': user.pk, 'ver': user.token_version,
+         'staff': user.is_staff, 'su': user.is_superuser},
+        salt=ACCESS_TOKEN_SALT)
+
+
+def read_access_token(token):
+    """Return the claims of a valid access token, without a query.
+
+    Raises `InvalidToken` if the signature does not match, the token
+    has expired, or the user's token version has changed since.
+    """
+    try:
+        claims = signing.loads(token, salt=ACCESS_TOKEN_SALT,
+                               max_age=ACCESS_TOKEN_LIFETIME)
+    except signing.SignatureExpired:
+        raise InvalidToken('Access token expired.')
+    except signing.BadSignature:
+        raise InvalidToken('Invalid access token.')
+    version = get_user_token_version(claims['uid'])
+    if claims['ver'] > version:
+        # Versions only grow, so the cached one is outdated, e.g. it was
+        # bumped by another worker, which issued this token.
+        version = get_user_token_version(claims['uid'], refresh=True)
+    if claims['ver'] != version:
+        raise InvalidToken('Access token revoked.')
+    return claims
+
+
+def get_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_tokens(user):
+    """Return a new access token and refresh token for the user."""
+    refresh = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        digest=get_digest(refresh), user=user,
+        token_version=user.token_version,
+        expires=timezone.now() + REFRESH_TOKEN_LIFETIME)
+    return {
+        'access': create_access_token(user),
+        'refresh': refresh,
+        'expires_in': int(ACCESS_TOKEN_LIFETIME.total_seconds()),
+    }
+
+
+@transaction.atomic
+def refresh_tokens(refresh):
+    """Exchange a refresh token for a new pair of tokens.
+
+    Each refresh token is used once: it is replaced by the one issued.
+    """
+    token = RefreshToken.objects.select_for_update() \
+        .select_related('user').filter(digest=get_digest(refresh)).first()
+    if token is None:
+        raise InvalidToken('Invalid refresh token.')
+    user = token.user
+    if token.expires <= timezone.now() or not user.is_active \
+            or token.token_version != user.token_version:
+        raise InvalidToken('Refresh token expired or revoked.')
+    token.delete()
+    return issue_tokens(user)
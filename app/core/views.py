@@ -0,0 +1,52 @@
+"""
+Base views shared by the APIs.
+"""
+import asyncio
+import functools
+
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """`APIView` whose handlers may be coroutines, for ASGI.
+
+    The request is parsed, authenticated and checked for permissions
+    in the event loop, as `APIView` does it, so views should only use
+    authentication, permission and throttle classes that make no
+    queries. Handlers run database work with `sync_to_async`.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """Return a coroutine function view, for Django to await."""
+        callback = super().as_view(**initkwargs)
+
+        async def view(request, *args, **kwargs):
+            return await callback(request, *args, **kwargs)
+
+        # Keeps `cls`, `initkwargs` and `csrf_exempt` of the DRF view.
+        functools.update_wrapper(view, callback)
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            self.initial(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower(),
+                              self.http_method_not_allowed) \
+                if request.method.lower() in self.http_method_names \
+                else self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs)
+        return self.response
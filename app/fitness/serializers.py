@@ -3,16 +3,20 @@ Serializers for fitness APIs
 """
 from rest_framework import serializers
 from core.models import Exercise, MuscleGroup
+from core.relations import BulkPrimaryKeyRelatedField
+from core.serializers import SparseFieldsetSerializerMixin
 
 
-class MuscleGroupSerializer(serializers.ModelSerializer):
+class MuscleGroupSerializer(SparseFieldsetSerializerMixin,
+                            serializers.ModelSerializer):
     class Meta:
         model = MuscleGroup
         fields = ['id', 'name', 'description']
 
 
-class ExerciseSerializer(serializers.ModelSerializer):
-    target_muscles = serializers.PrimaryKeyRelatedField(
+class ExerciseSerializer(SparseFieldsetSerializerMixin,
+                         serializers.ModelSerializer):
+    target_muscles = BulkPrimaryKeyRelatedField(
         many=True, queryset=MuscleGroup.objects.all()
     )
 
@@ -1,16 +1,23 @@
 """
 Tests for the fitness API.
 """
+import gzip
+from unittest.mock import patch
 
+import brotli
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework import status
+from rest_framework import permissions, status
 from rest_framework.test import APIClient
 from core.models import MuscleGroup, Exercise
 from fitness.serializers import (MuscleGroupSerializer,
                                  ExerciseSerializer,
                                  )
-from django.test import TestCase
+from fitness.views import ExerciseViewSet
+from django.test import AsyncClient, TestCase
 
 
 def muscle_group_url():
@@ -38,6 +45,7 @@ class PublicApiTests(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        cache.clear()
 
     def test_retrieve_muscle_groups(self):
         MuscleGroup.objects.create(name='Biceps',
@@ -50,7 +58,7 @@ class PublicApiTests(TestCase):
         expected = MuscleGroup.objects.all().order_by('id')
         serializer = MuscleGroupSerializer(expected, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrieve_exercises(self):
         muscle_group = \
@@ -63,11 +71,12 @@ class PublicApiTests(TestCase):
         ).target_muscles.set([muscle_group])
 
         res = self.client.get(exercise_url())
-        expected = Exercise.objects.all().order_by('name')
+        expected = Exercise.objects.prefetch_related('target_muscles') \
+            .order_by('name')
         serializer = ExerciseSerializer(expected, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
 
 class AdminApiTests(TestCase):
@@ -75,6 +84,7 @@ class AdminApiTests(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        cache.clear()
         self.admin_user = get_user_model().objects.create_superuser(
             'admin@example.com',
             'password'
@@ -148,3 +158,350 @@ class AdminApiTests(TestCase):
         self.assertEqual(exercise.name, payload['name'])
         self.assertEqual(exercise.description, payload['description'])
         self.assertEqual(exercise.instructions, payload['instructions'])
+
+    def test_create_exercise_resolves_muscles_in_one_query(self):
+        """Test target muscles are resolved with a single query"""
+        muscle_groups = [
+            MuscleGroup.objects.create(name=f'Muscle {i}')
+            for i in range(20)
+        ]
+
+        def payload(muscle_groups):
+            return {
+                'name': 'Clean and Press',
+                'description': 'A full body exercise',
+                'instructions': 'Clean the barbell and press it overhead',
+                'target_muscles': [mg.id for mg in muscle_groups],
+            }
+
+        with self.assertNumQueries(6):
+            res = self.client.post(exercise_url(),
+                                   payload(muscle_groups[:1]),
+                                   format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(6):
+            res = self.client.post(exercise_url(), payload(muscle_groups),
+                                   format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        exercise = Exercise.objects.get(id=res.data['id'])
+        self.assertEqual(exercise.target_muscles.count(), 20)
+
+    def test_create_exercise_with_missing_muscle_group(self):
+        """Test unknown target muscles are reported like DRF does"""
+        payload = {
+            'name': 'Deadlift',
+            'description': 'A compound exercise',
+            'instructions': 'Lift the barbell from the ground to hip level',
+            'target_muscles': [self.muscle_group.id, 0],
+        }
+        res = self.client.post(exercise_url(), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['target_muscles'],
+                         ['Invalid pk "0" - object does not exist.'])
+        self.assertEqual(res.data['target_muscles'][0].code,
+                         'does_not_exist')
+
+
+class ExerciseSearchApiTests(TestCase):
+    """Test searching the exercise catalog"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        Exercise.objects.all().delete()
+        self.squat = Exercise.objects.create(
+            name='Barbell Squats',
+            description='A compound lower body exercise',
+            instructions='Squat down until your thighs are parallel')
+        self.lunge = Exercise.objects.create(
+            name='Walking Lunge',
+            description='Builds the legs, similar to squats',
+            instructions='Step forward and lower your back knee')
+        self.curl = Exercise.objects.create(
+            name='Biceps Curl',
+            description='Isolation exercise for the biceps',
+            instructions='Curl the dumbbells up to your shoulders')
+
+    def search(self, q, **params):
+        return self.client.get(exercise_url(), {'q': q, **params})
+
+    def result_ids(self, res):
+        return [exercise['id'] for exercise in res.data['results']]
+
+    def test_search_by_name_description_and_instructions(self):
+        """Test words are matched in every text field"""
+        res = self.search('squat')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(self.result_ids(res),
+                              [self.squat.id, self.lunge.id])
+        self.assertEqual(self.result_ids(self.search('knee')),
+                         [self.lunge.id])
+        self.assertEqual(self.result_ids(self.search('dumbbells')),
+                         [self.curl.id])
+
+    def test_search_ranks_name_matches_first(self):
+        """Test a match in the name outranks one in the description"""
+        res = self.search('squat')
+
+        self.assertEqual(self.result_ids(res), [self.squat.id, self.lunge.id])
+
+    def test_search_misspelled_name(self):
+        """Test names are found by trigram similarity when misspelled"""
+        res = self.search('squatts')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.result_ids(res), [self.squat.id])
+
+    def test_misspelled_results_are_paginated(self):
+        """Test later pages of a misspelled search keep the fallback"""
+        self.lunge.name = 'Squatting Lunge'
+        self.lunge.save()
+
+        res = self.search('squatts', page_size=1)
+        first = self.result_ids(res)
+        res = self.client.get(res.data['next'])
+
+        self.assertCountEqual(first + self.result_ids(res),
+                              [self.squat.id, self.lunge.id])
+
+    def test_matching_search_skips_fallback(self):
+        """Test a search with matches only queries its page"""
+        with CaptureQueriesContext(connection) as queries:
+            self.search('knee')
+
+        self.assertEqual(len(queries), 2)
+        self.assertIn('@@', queries[0]['sql'])
+        self.assertIn('target_muscles', queries[1]['sql'])
+
+    def test_search_without_matches(self):
+        res = self.search('kettlebell')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+
+    def test_blank_search_lists_all_exercises(self):
+        res = self.search(' ')
+
+        self.assertEqual(self.result_ids(res),
+                         [self.squat.id, self.curl.id, self.lunge.id])
+
+    def test_search_results_are_paginated_by_rank(self):
+        """Test cursor pagination pages through ranked results"""
+        res = self.search('squat', page_size=1)
+        self.assertEqual(self.result_ids(res), [self.squat.id])
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual(self.result_ids(res), [self.lunge.id])
+        self.assertIsNone(res.data['next'])
+
+    def test_search_vector_follows_updates(self):
+        """Test the search vector is kept up to date by the database"""
+        self.curl.name = 'Hammer Curl'
+        self.curl.save()
+
+        self.assertEqual(self.result_ids(self.search('hammer')),
+                         [self.curl.id])
+
+
+class CatalogCacheApiTests(TestCase):
+    """Test catalog reads are served from the catalog cache"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.admin_user = get_user_model().objects.create_superuser(
+            'admin@example.com',
+            'password'
+        )
+
+    def test_repeated_reads_run_no_queries(self):
+        """Test a cached list or detail page needs no database query"""
+        exercise = Exercise.objects.first()
+        for url in [exercise_url(), exercise_detail_url(exercise.id),
+                    muscle_group_url()]:
+            res = self.client.get(url)
+
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+
+            self.assertEqual(cached.status_code, status.HTTP_200_OK)
+            self.assertEqual(cached.content, res.content)
+
+    def test_pages_cached_separately(self):
+        """Test each page and query string is cached on its own"""
+        first = self.client.get(exercise_url(), {'page_size': 1})
+        second = self.client.get(first.data['next'])
+
+        self.assertNotEqual(first.data['results'], second.data['results'])
+
+    def test_write_invalidates_cached_pages(self):
+        """Test pages are rebuilt once a catalog change commits"""
+        self.client.get(muscle_group_url())
+        self.client.force_authenticate(self.admin_user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(muscle_group_url(),
+                                   {'name': 'Neck'})
+        self.client.force_authenticate(None)
+        names = [muscle_group['name'] for muscle_group in
+                 self.client.get(muscle_group_url(),
+                                 {'page_size': 200}).data['results']]
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn('Neck', names)
+
+    def test_admin_write_invalidates_cached_pages(self):
+        """Test changes made outside the API also invalidate pages"""
+        exercise = Exercise.objects.first()
+        url = exercise_detail_url(exercise.id)
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            exercise.name = 'Renamed'
+            exercise.save()
+
+        self.assertEqual(self.client.get(url).data['name'], 'Renamed')
+
+
+class CatalogSnapshotApiTests(TestCase):
+    """Test the catalog lists are served from precompressed snapshots"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def test_compressed_variants(self):
+        """Test gzip and brotli variants hold the same JSON"""
+        plain = self.client.get(exercise_url())
+        gzipped = self.client.get(exercise_url(), HTTP_ACCEPT_ENCODING='gzip')
+        brotlied = self.client.get(exercise_url(),
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.content), plain.content)
+        self.assertEqual(brotlied['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(brotlied.content), plain.content)
+        self.assertEqual(len({plain['ETag'], gzipped['ETag'],
+                              brotlied['ETag']}), 3)
+        self.assertEqual(brotlied['Vary'], 'Accept, Accept-Encoding')
+        self.assertIn('max-age', brotlied['Cache-Control'])
+
+    def test_refused_encoding_not_used(self):
+        res = self.client.get(muscle_group_url(),
+                              HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+
+    def test_not_modified_before_view_runs(self):
+        """Test a matching If-None-Match gets 304 without the view"""
+        etag = self.client.get(exercise_url(),
+                               HTTP_ACCEPT_ENCODING='br')['ETag']
+
+        with patch.object(ExerciseViewSet, 'list') as patched_list, \
+                self.assertNumQueries(0):
+            res = self.client.get(exercise_url(), HTTP_IF_NONE_MATCH=etag,
+                                  HTTP_ACCEPT_ENCODING='br')
+
+        patched_list.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_other_variant_etag_not_matched(self):
+        """Test 304 is only sent for the ETag of the negotiated variant"""
+        etag = self.client.get(exercise_url(),
+                               HTTP_ACCEPT_ENCODING='gzip')['ETag']
+
+        res = self.client.get(exercise_url(), HTTP_IF_NONE_MATCH=etag,
+                              HTTP_ACCEPT_ENCODING='br')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Encoding'], 'br')
+
+    def test_credentials_checked_by_view(self):
+        """Test requests with credentials are not answered by snapshots"""
+        self.client.get(exercise_url())
+
+        res = self.client.get(exercise_url(),
+                              HTTP_AUTHORIZATION='Token invalid')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_authenticated_lists_not_snapshotted(self):
+        """Test lists anonymous users cannot read are left to the view"""
+        with patch.object(ExerciseViewSet, 'permission_classes',
+                          [permissions.IsAuthenticated]):
+            self.client.get(exercise_url())
+            res = self.client.get(exercise_url())
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_served_under_asgi(self):
+        """Test snapshots are served by the async middleware chain"""
+        client = AsyncClient()
+        plain = await client.get(exercise_url())
+
+        res = await client.get(exercise_url(),
+                               **{'accept-encoding': 'gzip'})
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+
+    def test_catalog_change_gives_new_etag(self):
+        etag = self.client.get(muscle_group_url())['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MuscleGroup.objects.create(name='Neck')
+        res = self.client.get(muscle_group_url(), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_query_strings_and_html_passed_to_view(self):
+        """Test only the plain JSON lists are snapshotted"""
+        paged = self.client.get(exercise_url(), {'page_size': 1},
+                                HTTP_ACCEPT_ENCODING='gzip')
+        html = self.client.get(exercise_url(), HTTP_ACCEPT='text/html',
+                               HTTP_ACCEPT_ENCODING='gzip')
+
+        for res in [paged, html]:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertFalse(res.has_header('Content-Encoding'))
+            self.assertFalse(res.has_header('ETag'))
+
+    def test_unacceptable_media_type_passed_to_view(self):
+        """Test a snapshot is not served to requests refusing JSON"""
+        self.client.get(exercise_url())
+
+        res = self.client.get(exercise_url(), HTTP_ACCEPT='application/xml')
+
+        self.assertEqual(res.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_snapshot_served_to_json_clients(self):
+        self.client.get(exercise_url())
+
+        for accept in ['application/json', '*/*',
+                       'application/xml, application/*;q=0.5']:
+            with self.assertNumQueries(0):
+                res = self.client.get(exercise_url(), HTTP_ACCEPT=accept,
+                                      HTTP_ACCEPT_ENCODING='gzip')
+
+            self.assertEqual(res['Content-Encoding'], 'gzip')
+
+
+class SparseFieldsetApiTests(TestCase):
+    """Test selecting the exercise fields to return"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def test_exercise_fields_skip_target_muscles(self):
+        """Test target muscles are not prefetched unless selected"""
+        with self.assertNumQueries(1):
+            res = self.client.get(exercise_url(), {'fields': 'id,name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data['results'][0]), {'id', 'name'})
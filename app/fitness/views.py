@@ -4,17 +4,26 @@ Views for the fitness APIs
 
 
 from rest_framework import viewsets, permissions
+from core.filters import ExerciseSearchFilter
+from core.mixins import CatalogCacheMixin, SparseFieldsetMixin
 from core.models import MuscleGroup, Exercise
+from core.pagination import IdCursorPagination, ExerciseCursorPagination
 from fitness.serializers import MuscleGroupSerializer, ExerciseSerializer
 
 
-class MuscleGroupViewSet(viewsets.ModelViewSet):
+class MuscleGroupViewSet(CatalogCacheMixin, SparseFieldsetMixin,
+                         viewsets.ModelViewSet):
     queryset = MuscleGroup.objects.all()
     serializer_class = MuscleGroupSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = IdCursorPagination
 
 
-class ExerciseViewSet(viewsets.ModelViewSet):
-    queryset = Exercise.objects.all().order_by('name')
+class ExerciseViewSet(CatalogCacheMixin, SparseFieldsetMixin,
+                      viewsets.ModelViewSet):
+    queryset = Exercise.objects.prefetch_related('target_muscles') \
+        .order_by('name')
     serializer_class = ExerciseSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ExerciseCursorPagination
+    filter_backends = [ExerciseSearchFilter]
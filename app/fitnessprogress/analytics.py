@@ -0,0 +1,59 @@
+"""
+Progress analytics for the fitnessprogress API.
+"""
+from django.db import connection
+
+from core.models import FitnessProgress
+
+BUCKETS = ['day', 'week', 'month']
+
+
+def get_trends(user, start, end, bucket='day', window=7):
+    """Summarize the user's progress between two dates per time bucket.
+
+    Each bucket holds the average, minimum and maximum weight, the
+    summed calories burned and exercise duration, and the `window`-day
+    moving average of the weight as of the bucket's last entry. The
+    moving average is a window function over the user's entries, which
+    are read as one range scan of the `(user, date)` index starting
+    `window` days before `start`, so the first buckets are averaged
+    over a full window too.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f'Unknown bucket {bucket!r}.')
+    quote_name = connection.ops.quote_name
+    opts = FitnessProgress._meta
+    table = quote_name(opts.db_table)
+    user_column, date_column, weight_column, calories_column, \
+        duration_column = (
+            quote_name(opts.get_field(name).column)
+            for name in ['user', 'date', 'weight', 'calories_burned',
+                         'exercise_duration'])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH entries AS ('
+            f'SELECT {date_column} AS date, {weight_column} AS weight, '
+            f'{calories_column} AS calories_burned, '
+            f'{duration_column} AS exercise_duration, '
+            f'AVG({weight_column}) OVER ('
+            f'ORDER BY {date_column} RANGE BETWEEN '
+            f'make_interval(days => %(window)s - 1) PRECEDING '
+            f'AND CURRENT ROW) AS moving_average '
+            f'FROM {table} '
+            f'WHERE {user_column} = %(user)s '
+            f'AND {date_column} >= %(start)s::date - %(window)s '
+            f'AND {date_column} <= %(end)s) '
+            f'SELECT date_trunc(%(bucket)s, date)::date AS bucket, '
+            f'COUNT(*) AS entries, '
+            f'ROUND(AVG(weight), 2) AS average_weight, '
+            f'MIN(weight) AS min_weight, MAX(weight) AS max_weight, '
+            f'SUM(calories_burned) AS calories_burned, '
+            f'SUM(exercise_duration) AS exercise_duration, '
+            f'ROUND((ARRAY_AGG(moving_average ORDER BY date DESC))[1], 2) '
+            f'AS moving_average_weight '
+            f'FROM entries WHERE date >= %(start)s '
+            f'GROUP BY 1 ORDER BY 1',
+            {'user': user.id, 'start': start, 'end': end,
+             'bucket': bucket, 'window': window})
+        columns = [column.name for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
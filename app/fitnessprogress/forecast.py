@@ -0,0 +1,265 @@
+"""
+Goal weight forecasts for the fitnessprogress API.
+"""
+import datetime
+import math
+
+import numpy as np
+from django.db import connection
+
+from core.caches import get_shared_cache, get_shared_or_default_cache
+from core.models import FitnessProgress
+
+# Entries up to this many days before a user's latest entry are fitted.
+FORECAST_WINDOW_DAYS = 90
+MIN_FORECAST_ENTRIES = 3
+# A fitted weight this close to the goal counts as reaching it.
+GOAL_TOLERANCE = 0.25
+MAX_FORECAST_DAYS = 365 * 5
+ROBUST_ITERATIONS = 5
+HUBER_K = 1.345
+# Spread below which residuals are rounding errors of an exact fit.
+MIN_SCALE = 1e-6
+CONFIDENCE_Z = 1.96
+FORECAST_CACHE_TIMEOUT = 60 * 60
+EPOCH = datetime.date(1970, 1, 1)
+
+FORECAST_STATUSES = ['on_track', 'off_track', 'reached', 'no_goal',
+                     'insufficient_data']
+
+# Columns of the series arrays.
+USER, ENTRY, VERSION, DAY, WEIGHT, GOAL = range(6)
+
+
+def load_series(user_ids):
+    """Return the recent entries of the users as one NumPy array.
+
+    Rows hold the user, entry id and version, the date as days since
+    the epoch, the weight, and the user's latest goal weight (NaN if
+    they never set one), ordered by user and date. Only entries within
+    `FORECAST_WINDOW_DAYS` of each user's latest entry are read, in one
+    query using the `(user, date)` index.
+    """
+    quote_name = connection.ops.quote_name
+    opts = FitnessProgress._meta
+    table = quote_name(opts.db_table)
+    id_column, version_column, user_column, date_column, weight_column, \
+        goal_column = (
+            quote_name(opts.get_field(name).column)
+            for name in ['id', 'version', 'user', 'date', 'weight',
+                         'goal_weight'])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH latest AS ('
+            f'SELECT {user_column} AS user_id, MAX({date_column}) AS date, '
+            f'(SELECT {goal_column} FROM {table} goal '
+            f'WHERE goal.{user_column} = entry.{user_column} '
+            f'AND {goal_column} IS NOT NULL '
+            f'ORDER BY {date_column} DESC LIMIT 1) AS goal_weight '
+            f'FROM {table} entry WHERE {user_column} = ANY(%(users)s) '
+            f'GROUP BY {user_column}) '
+            f'SELECT entry.{user_column}, entry.{id_column}, '
+            f'entry.{version_column}, '
+            f"entry.{date_column} - DATE '1970-01-01', "
+            f'entry.{weight_column}::float8, latest.goal_weight::float8 '
+            f'FROM {table} entry JOIN latest '
+            f'ON entry.{user_column} = latest.user_id '
+            f'AND entry.{date_column} > latest.date - %(window)s '
+            f'ORDER BY entry.{user_column}, entry.{date_column}',
+            {'users': list(user_ids), 'window': FORECAST_WINDOW_DAYS})
+        return np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 6)
+
+
+def group_sums(groups, values, count):
+    return np.bincount(groups, weights=values, minlength=count)
+
+
+def group_medians(groups, values, starts, counts):
+    """Return the median of the non-negative values of each group.
+
+    Rows are sorted by group. Offsetting each group's values past the
+    previous group's lets a single sort order the values within every
+    group while keeping the groups in place.
+    """
+    offsets = groups * (values.max(initial=0) * 2 + 1)
+    ordered = np.sort(values + offsets) - offsets
+    return (ordered[starts + (counts - 1) // 2]
+            + ordered[starts + counts // 2]) / 2
+
+
+def fit_lines(groups, days, weights, point_weights, count):
+    """Fit a weighted least squares line to each group of rows."""
+    sw = group_sums(groups, point_weights, count)
+    swt = group_sums(groups, point_weights * days, count)
+    swy = group_sums(groups, point_weights * weights, count)
+    stt = group_sums(groups, point_weights * days * days, count) \
+        - swt * swt / sw
+    sty = group_sums(groups, point_weights * days * weights, count) \
+        - swt * swy / sw
+    slope = np.where(stt > 0, sty / stt, np.nan)
+    # A single entry has no slope, and the intercept is its weight.
+    intercept = (swy - np.nan_to_num(slope) * swt) / sw
+    return intercept, slope, stt
+
+
+def fit_trends(series):
+    """Fit a robust linear trend to the weight of each user in `series`.
+
+    Every user is fitted at once: a Huber regression by iteratively
+    reweighted least squares, whose per-user sums are NumPy bincounts
+    over the whole array. Days are counted from each user's latest
+    entry, so the intercept is the trend's weight as of that entry.
+    Returns the users, their row counts and latest rows, and the
+    intercepts, slopes per day and standard errors of the slopes.
+    """
+    users, starts, counts = np.unique(
+        series[:, USER], return_index=True, return_counts=True)
+    count = len(users)
+    groups = np.repeat(np.arange(count), counts)
+    ends = starts + counts - 1
+    days = series[:, DAY] - series[ends, DAY][groups]
+    weights = series[:, WEIGHT]
+
+    point_weights = np.ones(len(series))
+    for _ in range(ROBUST_ITERATIONS):
+        intercept, slope, stt = fit_lines(
+            groups, days, weights, point_weights, count)
+        residuals = np.abs(weights - intercept[groups]
+                           - np.nan_to_num(slope)[groups] * days)
+        # Median absolute deviation, as an estimate of the spread.
+        scale = group_medians(groups, residuals, starts, counts) / 0.6745
+        bound = HUBER_K * np.maximum(scale, MIN_SCALE)[groups]
+        point_weights = np.where(
+            residuals > bound, bound / np.maximum(residuals, 1e-12), 1.0)
+
+    intercept, slope, stt = fit_lines(
+        groups, days, weights, point_weights, count)
+    residuals = weights - intercept[groups] - slope[groups] * days
+    variance = group_sums(groups, point_weights * residuals ** 2, count) \
+        / np.maximum(counts - 2, 1)
+    slope_error = np.sqrt(variance / stt)
+    return users, counts, ends, intercept, slope, slope_error
+
+
+def project_days(gap, slope):
+    """Return the days until a trend closes `gap`, NaN if it never does."""
+    days = np.full(gap.shape, np.nan)
+    closing = gap * slope > 0
+    days[closing] = gap[closing] / slope[closing]
+    days[days > MAX_FORECAST_DAYS] = np.nan
+    return days
+
+
+def to_date(day):
+    if math.isnan(day):
+        return None
+    return EPOCH + datetime.timedelta(days=math.ceil(day))
+
+
+def forecast_series(series, goal_weight=None):
+    """Return the goal weight forecast of each user in `series`.
+
+    `goal_weight` replaces the users' own latest goal weight. Each
+    forecast projects the date the fitted trend reaches the goal, and
+    the earliest and latest dates within the confidence band of its
+    slope; a bound the band never reaches is None. A goal the trend has
+    already passed counts as reached.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        users, counts, ends, intercept, slope, slope_error = \
+            fit_trends(series)
+        goal = series[ends, GOAL] if goal_weight is None \
+            else np.full(len(users), float(goal_weight))
+        gap = goal - intercept
+        margin = CONFIDENCE_Z * slope_error
+        expected = project_days(gap, slope)
+        bounds = [project_days(gap, slope + margin),
+                  project_days(gap, slope - margin)]
+        earliest = np.fmin(*bounds)
+        latest = np.where(np.isnan(bounds[0]) | np.isnan(bounds[1]),
+                          np.nan, np.fmax(*bounds))
+        # The trend has crossed the goal when its first and latest
+        # weights fall on either side of it.
+        first_day = series[ends - counts + 1, DAY] - series[ends, DAY]
+        crossed = gap * (gap - slope * first_day) < 0
+    last_day = series[ends, DAY]
+
+    forecasts = []
+    for index, user in enumerate(users.astype(int).tolist()):
+        enough = counts[index] >= MIN_FORECAST_ENTRIES \
+            and not math.isnan(slope[index])
+        if math.isnan(goal[index]):
+            status = 'no_goal'
+        elif not enough:
+            status = 'insufficient_data'
+        elif abs(gap[index]) <= GOAL_TOLERANCE or crossed[index]:
+            status = 'reached'
+        elif math.isnan(expected[index]):
+            status = 'off_track'
+        else:
+            status = 'on_track'
+        on_track = status == 'on_track'
+        forecasts.append({
+            'user': user,
+            'entry': int(series[ends[index], ENTRY]),
+            'version': int(series[ends[index], VERSION]),
+            'status': status,
+            'entries': int(counts[index]),
+            'goal_weight': None if math.isnan(goal[index])
+            else round(float(goal[index]), 2),
+            'current_weight': round(float(intercept[index]), 2)
+            if enough else None,
+            'weekly_change': round(float(slope[index]) * 7, 3)
+            if enough else None,
+            'goal_date': to_date(last_day[index] + expected[index])
+            if on_track else None,
+            'goal_date_earliest': to_date(last_day[index] + earliest[index])
+            if on_track else None,
+            'goal_date_latest': to_date(last_day[index] + latest[index])
+            if on_track else None,
+        })
+    return forecasts
+
+
+def get_cache_key(user_id, entry, version, goal_weight=None):
+    return f'fitness-forecast:{user_id}:{entry}:{version}:{goal_weight}'
+
+
+def get_forecast(user, goal_weight=None):
+    """Return the user's goal weight forecast.
+
+    Forecasts are cached under the user's latest entry and its version,
+    so a new latest entry, or an edit to it, gives a new forecast;
+    edits to older entries show once the cached one expires.
+    """
+    latest = FitnessProgress.objects.filter(user=user) \
+        .order_by('-date').values_list('id', 'version').first()
+    if latest is None:
+        return {'user': user.id, 'status': 'insufficient_data',
+                'entries': 0, 'goal_weight': goal_weight}
+    forecast_cache = get_shared_or_default_cache()
+    key = get_cache_key(user.id, *latest, goal_weight)
+    forecast = forecast_cache.get(key)
+    if forecast is None:
+        forecast = forecast_series(
+            load_series([user.id]), goal_weight=goal_weight)[0]
+        forecast_cache.set(key, forecast, FORECAST_CACHE_TIMEOUT)
+    return forecast
+
+
+def forecast_cohort(user_ids):
+    """Forecast every user of a cohort in one pass.
+
+    Users without entries are left out. With a SHARED_CACHE, the
+    forecasts are cached there for the API to serve; the default cache
+    is local to this process, so nothing is cached without one.
+    """
+    forecasts = forecast_series(load_series(user_ids))
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.set_many({
+            get_cache_key(forecast['user'], forecast['entry'],
+                          forecast['version']): forecast
+            for forecast in forecasts
+        }, FORECAST_CACHE_TIMEOUT)
+    return forecasts
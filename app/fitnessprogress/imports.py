@@ -0,0 +1,144 @@
+"""
+Bulk import of fitness progress entries.
+"""
+import io
+from collections import Counter
+
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from core.models import FitnessProgress
+from core.readers import READERS
+from fitnessprogress.serializers import FitnessProgressImportSerializer
+from fitnessprogress.summary import update_summary
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+STAGING_TABLE = 'fitness_progress_import'
+# Entry fields summed up by the user's summary.
+SUMMARY_TOTALS = ['calories_burned', 'exercise_duration']
+
+
+def import_fitness_progress(user, stream, format='csv',
+                            chunk_size=DEFAULT_CHUNK_SIZE):
+    """Create or update the user's entries from a CSV or NDJSON stream.
+
+    The stream is read and validated a chunk of rows at a time. Valid
+    rows are loaded into a temporary staging table with COPY and merged
+    with one INSERT ... ON CONFLICT (user, date), so an entry for a date
+    the user already has is updated; within the file the last row for
+    a date wins. Invalid rows are skipped and reported by line. Only
+    one chunk is held in memory at a time, and the whole import runs
+    in a single transaction, which also updates the user's summary.
+    """
+    serializer = FitnessProgressImportSerializer()
+    fields = list(serializer.fields)
+    result = {'created': 0, 'updated': 0, 'error_count': 0, 'errors': []}
+    change = Counter()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        create_staging_table(cursor)
+        chunk = []
+        for line, row in READERS[format](stream):
+            try:
+                if row is None:
+                    raise ValidationError(
+                        {'non_field_errors': ['Expected a JSON object.']})
+                data = serializer.run_validation(row)
+            except ValidationError as exc:
+                result['error_count'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append(
+                        {'line': line, 'errors': exc.detail})
+                continue
+            chunk.append([line] + [data.get(field) for field in fields])
+            if len(chunk) >= chunk_size:
+                change.update(
+                    merge_chunk(cursor, user, fields, chunk, result))
+                chunk = []
+        if chunk:
+            change.update(merge_chunk(cursor, user, fields, chunk, result))
+        if result['created'] or result['updated']:
+            update_summary(user.id, **change)
+    return result
+
+
+def create_staging_table(cursor):
+    opts = FitnessProgress._meta
+    columns = ', '.join(
+        f'{connection.ops.quote_name(field.column)} '
+        f'{field.db_type(connection)}'
+        for field in (opts.get_field(name)
+                      for name in FitnessProgressImportSerializer.Meta.fields))
+    cursor.execute(
+        f'CREATE TEMPORARY TABLE {STAGING_TABLE} (line integer, {columns}) '
+        f'ON COMMIT DROP')
+
+
+def copy_value(value):
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def merge_chunk(cursor, user, fields, chunk, result):
+    """COPY a chunk into the staging table and upsert it.
+
+    Returns how the chunk changes the totals of the user's summary.
+    """
+    quote_name = connection.ops.quote_name
+    opts = FitnessProgress._meta
+    table = quote_name(opts.db_table)
+    columns = [quote_name(opts.get_field(field).column) for field in fields]
+    user_column = quote_name(opts.get_field('user').column)
+    date_column = quote_name(opts.get_field('date').column)
+    version_column = quote_name(opts.get_field('version').column)
+    total_columns = [quote_name(opts.get_field(field).column)
+                     for field in SUMMARY_TOTALS]
+
+    buffer = io.StringIO()
+    for row in chunk:
+        buffer.write(','.join(map(copy_value, row)))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(
+        f'COPY {STAGING_TABLE} (line, {", ".join(columns)}) '
+        f'FROM STDIN WITH (FORMAT csv)', buffer)
+
+    # The totals of the entries about to be overwritten, locked until
+    # the import commits.
+    totals = ', '.join(f'COALESCE(SUM({column}), 0)'
+                       for column in total_columns)
+    cursor.execute(
+        f'SELECT {totals} FROM ('
+        f'SELECT {", ".join(total_columns)} FROM {table} '
+        f'WHERE {user_column} = %s AND {date_column} IN '
+        f'(SELECT {date_column} FROM {STAGING_TABLE}) FOR UPDATE) old',
+        [user.id])
+    old_totals = cursor.fetchone()
+
+    # Rows inserted rather than updated have no deleting transaction
+    # id, so xmax tells the two apart.
+    updates = ', '.join(f'{column} = EXCLUDED.{column}'
+                        for column in columns)
+    cursor.execute(
+        f'WITH merged AS ('
+        f'INSERT INTO {table} ({user_column}, {version_column}, '
+        f'{", ".join(columns)}) '
+        f'SELECT DISTINCT ON ({date_column}) %s, 1, {", ".join(columns)} '
+        f'FROM {STAGING_TABLE} ORDER BY {date_column}, line DESC '
+        f'ON CONFLICT ({user_column}, {date_column}) DO UPDATE SET '
+        f'{updates}, {version_column} = {table}.{version_column} + 1 '
+        f'RETURNING xmax = 0 AS created, {", ".join(total_columns)}) '
+        f'SELECT COUNT(*) FILTER (WHERE created), '
+        f'COUNT(*) FILTER (WHERE NOT created), {totals} FROM merged',
+        [user.id])
+    created, updated, *new_totals = cursor.fetchone()
+    result['created'] += created
+    result['updated'] += updated
+    cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+
+    change = {'entries': created}
+    for field, old, new in zip(SUMMARY_TOTALS, old_totals, new_totals):
+        change[field] = new - old
+    return change
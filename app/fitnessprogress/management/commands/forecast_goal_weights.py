@@ -0,0 +1,50 @@
+"""
+Django command to forecast the goal weights of a cohort of users.
+"""
+import csv
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from fitnessprogress.forecast import forecast_cohort
+from fitnessprogress.summary import DEFAULT_BATCH_SIZE, iter_user_batches
+
+COLUMNS = ['user', 'status', 'entries', 'goal_weight', 'current_weight',
+           'weekly_change', 'goal_date', 'goal_date_earliest',
+           'goal_date_latest']
+
+
+class Command(BaseCommand):
+    """Django command to forecast goal weights for many users at once.
+
+    Each batch of users is loaded with one query and forecast in one
+    vectorized pass, and the forecasts are written to stdout as CSV.
+    They are also cached for the API, but only with a SHARED_CACHE, as
+    the API workers cannot read this process's own cache.
+    """
+    help = 'Forecast when users reach their goal weight.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email', action='append', dest='emails',
+            help='Forecast this user; repeat for a cohort. By default '
+                 'every user is forecast.')
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of users forecast in one pass.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['emails']:
+            user_ids = list(get_user_model().objects.filter(
+                email__in=options['emails']).values_list('pk', flat=True))
+            if len(user_ids) != len(set(options['emails'])):
+                raise CommandError('Some of the users do not exist.')
+            batches = [user_ids]
+        else:
+            batches = iter_user_batches(options['batch_size'])
+
+        writer = csv.DictWriter(self.stdout, COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for user_ids in batches:
+            writer.writerows(forecast_cohort(user_ids))
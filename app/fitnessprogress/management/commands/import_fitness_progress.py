@@ -0,0 +1,52 @@
+"""
+Django command to import fitness progress entries from a file.
+"""
+import csv
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.readers import FORMATS, guess_format
+from fitnessprogress.imports import DEFAULT_CHUNK_SIZE, \
+    import_fitness_progress
+
+
+class Command(BaseCommand):
+    """Django command to import a user's entries from CSV or NDJSON."""
+    help = 'Create or update fitness progress entries from a file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Format of the file, by default from its extension.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help='Number of rows validated and merged at a time.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['email']} does not exist.")
+
+        format = options['format'] or guess_format(options['path'])
+        if format is None:
+            raise CommandError(
+                f'Cannot tell the format of {options["path"]}, '
+                f'use --format.')
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = import_fitness_progress(
+                    user, stream, format, chunk_size=options['chunk_size'])
+        except (OSError, UnicodeDecodeError, csv.Error) as exc:
+            raise CommandError(f'Could not read {options["path"]}: {exc}')
+
+        for error in result['errors']:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} and updated {result['updated']} "
+            f"entries, skipped {result['error_count']} invalid rows."))
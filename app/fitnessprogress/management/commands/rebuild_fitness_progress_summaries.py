@@ -0,0 +1,45 @@
+"""
+Django command to rebuild the fitness progress summaries of all users.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from fitnessprogress.summary import DEFAULT_BATCH_SIZE, \
+    iter_user_batches, rebuild_summaries
+
+
+class Command(BaseCommand):
+    """Django command to recompute every user's summary from their entries.
+
+    Users are processed in batches, each in its own transaction, and
+    only summaries that differ from the recomputed ones are written.
+    """
+    help = 'Recompute and store the fitness progress summaries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report the summaries that are out of date, and '
+                 'fail if there are any.')
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of users recomputed at a time.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        verify_only = options['verify']
+        users = 0
+        stale = 0
+        for user_ids in iter_user_batches(options['batch_size']):
+            summaries = rebuild_summaries(user_ids, verify_only=verify_only)
+            for summary in summaries:
+                self.stderr.write(
+                    f'Summary of user {summary.user_id} is out of date.')
+            users += len(user_ids)
+            stale += len(summaries)
+
+        if verify_only and stale:
+            raise CommandError(
+                f'{stale} of {users} summaries are out of date.')
+        action = 'Found' if verify_only else 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {stale} out of date summaries for {users} users.'))
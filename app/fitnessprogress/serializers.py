@@ -3,11 +3,99 @@ Serializers for fitnessprogress APIs
 """
 
 from rest_framework import serializers
-from core.models import FitnessProgress
+from core.models import FitnessProgress, FitnessProgressSummary
+from core.serializers import SparseFieldsetSerializerMixin
+from fitnessprogress.analytics import BUCKETS
+from fitnessprogress.forecast import FORECAST_STATUSES
 
+MAX_TREND_DAYS = 366 * 5
+MAX_TREND_WINDOW = 365
 
-class FitnessProgressSerializer(serializers.ModelSerializer):
+
+class FitnessProgressSerializer(SparseFieldsetSerializerMixin,
+                                serializers.ModelSerializer):
     class Meta:
         model = FitnessProgress
-        fields = '__all__'
+        exclude = ('version',)
         read_only_fields = ('user',)
+
+
+class FitnessProgressImportSerializer(serializers.ModelSerializer):
+    """Serializer validating one imported fitness progress entry."""
+    class Meta:
+        model = FitnessProgress
+        fields = ['date', 'weight', 'goal_weight', 'achieved_goals',
+                  'notes', 'exercise_duration', 'calories_burned', 'mood']
+
+
+class FitnessProgressImportResultSerializer(serializers.Serializer):
+    """Serializer for the outcome of a fitness progress import."""
+    created = serializers.IntegerField()
+    updated = serializers.IntegerField()
+    error_count = serializers.IntegerField()
+    errors = serializers.ListField(child=serializers.DictField())
+
+
+class FitnessProgressTrendsQuerySerializer(serializers.Serializer):
+    """Serializer for the parameters of progress trends."""
+    start = serializers.DateField()
+    end = serializers.DateField()
+    bucket = serializers.ChoiceField(choices=BUCKETS, default='day')
+    window = serializers.IntegerField(min_value=1,
+                                      max_value=MAX_TREND_WINDOW,
+                                      default=7)
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError(
+                {'end': 'End must not be before start.'})
+        if (attrs['end'] - attrs['start']).days >= MAX_TREND_DAYS:
+            raise serializers.ValidationError(
+                {'end': f'Trends span at most {MAX_TREND_DAYS} days.'})
+        return attrs
+
+
+class FitnessProgressTrendSerializer(serializers.Serializer):
+    """Serializer for the progress summary of one time bucket."""
+    bucket = serializers.DateField()
+    entries = serializers.IntegerField()
+    average_weight = serializers.DecimalField(max_digits=6,
+                                              decimal_places=2)
+    min_weight = serializers.DecimalField(max_digits=6, decimal_places=2)
+    max_weight = serializers.DecimalField(max_digits=6, decimal_places=2)
+    calories_burned = serializers.IntegerField(allow_null=True)
+    exercise_duration = serializers.IntegerField(allow_null=True)
+    moving_average_weight = serializers.DecimalField(max_digits=6,
+                                                     decimal_places=2)
+
+
+class FitnessProgressSummarySerializer(serializers.ModelSerializer):
+    """Serializer for the totals of a user's entries."""
+    distance_to_goal = serializers.DecimalField(
+        max_digits=7, decimal_places=2, read_only=True, allow_null=True)
+
+    class Meta:
+        model = FitnessProgressSummary
+        fields = ['entry_count', 'total_calories_burned',
+                  'total_exercise_duration', 'latest_date',
+                  'latest_weight', 'goal_weight', 'distance_to_goal']
+
+
+class FitnessProgressForecastQuerySerializer(serializers.Serializer):
+    """Serializer for the parameters of a goal weight forecast."""
+    goal_weight = serializers.DecimalField(
+        max_digits=6, decimal_places=2, min_value=0, required=False,
+        help_text='Goal to forecast instead of the latest goal weight.')
+
+
+class FitnessProgressForecastSerializer(serializers.Serializer):
+    """Serializer for the forecast of when a goal weight is reached."""
+    status = serializers.ChoiceField(choices=FORECAST_STATUSES)
+    entries = serializers.IntegerField()
+    goal_weight = serializers.FloatField(allow_null=True, default=None)
+    current_weight = serializers.FloatField(allow_null=True, default=None)
+    weekly_change = serializers.FloatField(allow_null=True, default=None)
+    goal_date = serializers.DateField(allow_null=True, default=None)
+    goal_date_earliest = serializers.DateField(allow_null=True,
+                                               default=None)
+    goal_date_latest = serializers.DateField(allow_null=True, default=None)
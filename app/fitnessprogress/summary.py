@@ -0,0 +1,130 @@
+"""
+Per-user summaries of fitness progress entries.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core.models import FitnessProgress, FitnessProgressSummary
+
+SUMMARY_FIELDS = ['entry_count', 'total_calories_burned',
+                  'total_exercise_duration', 'latest_date',
+                  'latest_weight', 'goal_weight']
+DEFAULT_BATCH_SIZE = 500
+
+
+def latest_values(entries):
+    """Return expressions reading the latest values of a user's entries."""
+    latest = entries.order_by('-date')
+    return {
+        'latest_date': Subquery(latest.values('date')[:1]),
+        'latest_weight': Subquery(latest.values('weight')[:1]),
+        'goal_weight': Subquery(
+            latest.filter(goal_weight__isnull=False)
+            .values('goal_weight')[:1]),
+    }
+
+
+def compute_summaries(user_ids):
+    """Return the summaries of the users computed from their entries."""
+    entries = FitnessProgress.objects.filter(user=OuterRef('pk'))
+    rows = get_user_model().objects.filter(pk__in=user_ids) \
+        .order_by('pk').values('pk').annotate(
+            entry_count=Count('fitnessprogress'),
+            total_calories_burned=Coalesce(
+                Sum('fitnessprogress__calories_burned'), 0),
+            total_exercise_duration=Coalesce(
+                Sum('fitnessprogress__exercise_duration'), 0),
+            **latest_values(entries))
+    return [FitnessProgressSummary(user_id=row.pop('pk'), **row)
+            for row in rows]
+
+
+def entry_change(old=None, new=None):
+    """Return how an entry being created, updated or deleted changes
+    the totals of its user's summary.
+
+    `old` is the entry before the write, None if it is created, and
+    `new` the entry after it, None if it is deleted.
+    """
+    def total(entry, field):
+        if entry is None:
+            return 0
+        return getattr(entry, field) or 0
+
+    return {
+        'entries': (new is not None) - (old is not None),
+        'calories_burned': total(new, 'calories_burned')
+        - total(old, 'calories_burned'),
+        'exercise_duration': total(new, 'exercise_duration')
+        - total(old, 'exercise_duration'),
+    }
+
+
+@transaction.atomic
+def update_summary(user_id, entries=0, calories_burned=0,
+                   exercise_duration=0):
+    """Apply written entries to the user's summary.
+
+    Called in the transaction writing the entries, after they have been
+    written: the changes are added to the totals and the latest values
+    are read again from the user's entries. A user without a summary
+    row yet has it computed from all of their entries instead.
+    """
+    summaries = FitnessProgressSummary.objects.filter(user_id=user_id)
+    # Lock the row before updating it, so the update reads the entries
+    # of concurrent writes for the user that committed meanwhile.
+    if not summaries.select_for_update().exists():
+        try:
+            with transaction.atomic():
+                compute_summaries([user_id])[0].save(force_insert=True)
+            return
+        except IntegrityError:
+            # Created by a concurrent write, which did not see ours.
+            summaries.select_for_update().exists()
+    summaries.update(
+        entry_count=F('entry_count') + entries,
+        total_calories_burned=F('total_calories_burned') + calories_burned,
+        total_exercise_duration=F('total_exercise_duration')
+        + exercise_duration,
+        **latest_values(FitnessProgress.objects.filter(user_id=user_id)))
+
+
+def summary_values(summary):
+    return [getattr(summary, field) for field in SUMMARY_FIELDS]
+
+
+def iter_user_batches(batch_size=DEFAULT_BATCH_SIZE):
+    """Yield the ids of all users, `batch_size` at a time."""
+    users = get_user_model().objects.order_by('pk')
+    last_id = None
+    while True:
+        batch = users if last_id is None else users.filter(pk__gt=last_id)
+        user_ids = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not user_ids:
+            return
+        yield user_ids
+        last_id = user_ids[-1]
+
+
+@transaction.atomic
+def rebuild_summaries(user_ids, verify_only=False):
+    """Recompute the summaries of the users and store those that differ.
+
+    Returns the recomputed summaries that did not match the stored
+    ones; a user without a summary row matches an empty summary. With
+    `verify_only` nothing is written.
+    """
+    stored = FitnessProgressSummary.objects.select_for_update() \
+        .in_bulk(user_ids)
+    stale = [
+        summary for summary in compute_summaries(user_ids)
+        if summary_values(summary) != summary_values(
+            stored.get(summary.user_id, FitnessProgressSummary()))
+    ]
+    if stale and not verify_only:
+        FitnessProgressSummary.objects.filter(
+            user_id__in=[summary.user_id for summary in stale]).delete()
+        FitnessProgressSummary.objects.bulk_create(stale)
+    return stale
@@ -0,0 +1,156 @@
+"""
+Test the fitnessprogress management commands.
+"""
+import csv
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.models import FitnessProgress, FitnessProgressSummary
+from fitnessprogress.forecast import get_forecast
+
+
+class ImportFitnessProgressCommandTests(TestCase):
+    """Test the import_fitness_progress command."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='import@example.com', password='testpass')
+
+    def write_file(self, suffix, content):
+        upload = tempfile.NamedTemporaryFile('w', suffix=suffix)
+        upload.write(content)
+        upload.flush()
+        self.addCleanup(upload.close)
+        return upload.name
+
+    def test_import_in_chunks(self):
+        """Test every chunk of a file is merged."""
+        start = date(2024, 1, 1)
+        path = self.write_file('.csv', 'date,weight\n' + ''.join(
+            f'{start + timedelta(days=day)},{70 + day}\n'
+            for day in range(5)) + f'{start},65\n')
+        out = StringIO()
+
+        call_command('import_fitness_progress', self.user.email, path,
+                     chunk_size=2, stdout=out)
+
+        self.assertIn('Created 5 and updated 1 entries', out.getvalue())
+        self.assertEqual(
+            FitnessProgress.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(
+            FitnessProgress.objects.get(date=start).weight, 65)
+
+    def test_import_unknown_format(self):
+        path = self.write_file('.txt', 'date,weight\n')
+
+        with self.assertRaises(CommandError):
+            call_command('import_fitness_progress', self.user.email, path)
+
+
+class RebuildFitnessProgressSummariesCommandTests(TestCase):
+    """Test the rebuild_fitness_progress_summaries command."""
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f'user{number}@example.com', password='testpass')
+            for number in range(3)
+        ]
+        for number, user in enumerate(self.users):
+            FitnessProgress.objects.create(
+                user=user, date=date(2024, 1, 1), weight=70 + number,
+                calories_burned=100 * number)
+
+    def test_rebuild_in_batches(self):
+        """Test missing and wrong summaries are recomputed."""
+        FitnessProgressSummary.objects.create(
+            user=self.users[1], entry_count=5, total_calories_burned=1)
+        out = StringIO()
+
+        call_command('rebuild_fitness_progress_summaries', batch_size=2,
+                     stdout=out, stderr=StringIO())
+
+        self.assertIn('Rebuilt 3 out of date summaries for 3 users',
+                      out.getvalue())
+        summary = FitnessProgressSummary.objects.get(user=self.users[1])
+        self.assertEqual(summary.entry_count, 1)
+        self.assertEqual(summary.total_calories_burned, 100)
+        self.assertEqual(summary.latest_weight, 71)
+        call_command('rebuild_fitness_progress_summaries', verify=True,
+                     stdout=out)
+
+    def test_verify_reports_stale_summaries(self):
+        call_command('rebuild_fitness_progress_summaries',
+                     stdout=StringIO(), stderr=StringIO())
+        FitnessProgressSummary.objects.filter(user=self.users[2]).update(
+            total_exercise_duration=10)
+        err = StringIO()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_fitness_progress_summaries', verify=True,
+                         stdout=StringIO(), stderr=err)
+
+        self.assertIn(f'user {self.users[2].id} is out of date',
+                      err.getvalue())
+        self.assertEqual(FitnessProgressSummary.objects.get(
+            user=self.users[2]).total_exercise_duration, 10)
+
+
+class ForecastGoalWeightsCommandTests(TestCase):
+    """Test the forecast_goal_weights command."""
+
+    def test_forecast_cohort(self):
+        """Test each user of the cohort gets a forecast."""
+        users = [
+            get_user_model().objects.create_user(
+                email=f'user{number}@example.com', password='testpass')
+            for number in range(3)
+        ]
+        for number, user in enumerate(users[:2]):
+            FitnessProgress.objects.bulk_create([
+                FitnessProgress(user=user, date=date(2024, 1, 1 + day),
+                                weight=80 - day * number, goal_weight=70)
+                for day in range(5)
+            ])
+        FitnessProgress.objects.create(user=users[2], date=date(2024, 1, 1),
+                                       weight=80, goal_weight=70)
+        get_user_model().objects.create_user(
+            email='new@example.com', password='testpass')
+        out = StringIO()
+
+        call_command('forecast_goal_weights', batch_size=2, stdout=out)
+
+        rows = {row['user']: row
+                for row in csv.DictReader(StringIO(out.getvalue()))}
+        self.assertEqual(set(rows), {str(user.id) for user in users})
+        self.assertEqual(rows[str(users[2].id)]['status'],
+                         'insufficient_data')
+        self.assertEqual(rows[str(users[0].id)]['status'], 'off_track')
+        self.assertEqual(rows[str(users[1].id)]['status'], 'on_track')
+        self.assertEqual(rows[str(users[1].id)]['goal_date'], '2024-01-11')
+
+    @override_settings(SHARED_CACHE='default')
+    def test_forecasts_cached_with_shared_cache(self):
+        """Test the API serves the forecasts from the shared cache."""
+        cache.clear()
+        user = get_user_model().objects.create_user(
+            email='cached@example.com', password='testpass')
+        FitnessProgress.objects.bulk_create([
+            FitnessProgress(user=user, date=date(2024, 1, 1 + day),
+                            weight=80 - day, goal_weight=70)
+            for day in range(5)
+        ])
+
+        call_command('forecast_goal_weights', emails=[user.email],
+                     stdout=StringIO())
+
+        with self.assertNumQueries(1):
+            forecast = get_forecast(user)
+        self.assertEqual(forecast['status'], 'on_track')
@@ -1,13 +1,21 @@
 """
 Tests for the FitnessProgress API.
 """
+import json
+from unittest.mock import patch
 
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
-from core.models import FitnessProgress
+from core.models import FitnessProgress, FitnessProgressSummary
+from fitnessprogress.views import FitnessProgressViewSet
 from decimal import Decimal
 from datetime import date
 from datetime import timedelta
@@ -18,6 +26,31 @@ def fitness_progress_list_url():
     return reverse('fitness-progress-list')
 
 
+def fitness_progress_trends_url():
+    """Return fitness progress trends URL"""
+    return reverse('fitness-progress-trends')
+
+
+def fitness_progress_summary_url():
+    """Return fitness progress summary URL"""
+    return reverse('fitness-progress-summary')
+
+
+def fitness_progress_forecast_url():
+    """Return fitness progress forecast URL"""
+    return reverse('fitness-progress-forecast')
+
+
+def fitness_progress_import_url():
+    """Return fitness progress import URL"""
+    return reverse('fitness-progress-import')
+
+
+def fitness_progress_export_url():
+    """Return fitness progress export URL"""
+    return reverse('fitness-progress-export')
+
+
 def fitness_progress_detail_url(fp_id):
     """Return fitness progress detail URL"""
     return reverse('fitness-progress-detail', args=[fp_id])
@@ -92,3 +125,648 @@ class PrivateFitnessProgressApiTests(TestCase):
                          status.HTTP_204_NO_CONTENT)
         self.assertFalse(FitnessProgress.objects.filter(
             id=self.fitness_progress.id).exists())
+
+    def test_list_fitness_progress_paginated_newest_first(self):
+        """Test the list is cursor paginated by date, newest first."""
+        for days in range(2, 7):
+            FitnessProgress.objects.create(
+                user=self.user, date=date.today() - timedelta(days=days),
+                weight=Decimal('70.0'))
+
+        res = self.client.get(fitness_progress_list_url(), {'page_size': 4})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first_page = [entry['date'] for entry in res.data['results']]
+        self.assertEqual(len(first_page), 4)
+        self.assertIsNone(res.data['previous'])
+
+        res = self.client.get(res.data['next'])
+
+        second_page = [entry['date'] for entry in res.data['results']]
+        self.assertEqual(len(second_page), 2)
+        self.assertIsNone(res.data['next'])
+        expected = [
+            (date.today() - timedelta(days=days)).isoformat()
+            for days in range(1, 7)
+        ]
+        self.assertEqual(first_page + second_page, expected)
+
+    def test_list_fitness_progress_from_values_rows(self):
+        """Test lists use values rows only when asked to."""
+        url = fitness_progress_list_url()
+        with patch('core.mixins.ValuesListMixin.get_values_serializer') \
+                as get_values_serializer:
+            res = self.client.get(url)
+        get_values_serializer.assert_not_called()
+
+        values_res = self.client.get(url, {'values': '1'})
+
+        self.assertEqual(values_res.status_code, status.HTTP_200_OK)
+        self.assertEqual(values_res.data['results'], res.data['results'])
+
+    def test_list_fitness_progress_page_size_capped(self):
+        """Test clients cannot request pages above the maximum size."""
+        FitnessProgress.objects.bulk_create([
+            FitnessProgress(user=self.user,
+                            date=date.today() - timedelta(days=days),
+                            weight=Decimal('70.0'))
+            for days in range(2, 252)
+        ])
+
+        res = self.client.get(fitness_progress_list_url(),
+                              {'page_size': 1000})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 200)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_retrieve_fitness_progress_returns_etag(self):
+        """Test retrieving a record returns its version as ETag."""
+        url = fitness_progress_detail_url(self.fitness_progress.id)
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], '"1"')
+        self.assertNotIn('version', res.data)
+
+    def test_retrieve_fitness_progress_not_modified(self):
+        """Test a matching If-None-Match returns 304 with one query."""
+        url = fitness_progress_detail_url(self.fitness_progress.id)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH='"1"')
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], '"1"')
+        self.assertFalse(res.content)
+
+    def test_retrieve_fitness_progress_modified(self):
+        """Test a stale If-None-Match returns the record."""
+        self.fitness_progress.save()
+        url = fitness_progress_detail_url(self.fitness_progress.id)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH='"1"')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], '"2"')
+
+    def test_update_fitness_progress_if_match(self):
+        """Test updating with a matching If-Match bumps the version."""
+        url = fitness_progress_detail_url(self.fitness_progress.id)
+        res = self.client.patch(url, {'weight': '69.0'},
+                                HTTP_IF_MATCH='"1"')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], '"2"')
+        self.fitness_progress.refresh_from_db()
+        self.assertEqual(self.fitness_progress.version, 2)
+        self.assertEqual(self.fitness_progress.weight, Decimal('69.0'))
+
+    def test_update_fitness_progress_stale_if_match(self):
+        """Test updating with a stale If-Match fails with 412."""
+        url = fitness_progress_detail_url(self.fitness_progress.id)
+        self.client.patch(url, {'weight': '69.0'})
+
+        res = self.client.patch(url, {'weight': '68.0'},
+                                HTTP_IF_MATCH='"1"')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.fitness_progress.refresh_from_db()
+        self.assertEqual(self.fitness_progress.weight, Decimal('69.0'))
+
+    def test_delete_fitness_progress_stale_if_match(self):
+        """Test deleting with a stale If-Match fails with 412."""
+        url = fitness_progress_detail_url(self.fitness_progress.id)
+        res = self.client.delete(url, HTTP_IF_MATCH='"2"')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(FitnessProgress.objects.filter(
+            id=self.fitness_progress.id).exists())
+
+
+class FitnessProgressSparseFieldsetTests(TestCase):
+    """Test selecting the FitnessProgress fields to return"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='sparse@example.com', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.fitness_progress = FitnessProgress.objects.create(
+            user=self.user, date=date(2024, 1, 1), weight=Decimal('70.5'),
+            notes='A long note', achieved_goals='Ran 10km')
+
+    def test_list_selected_fields(self):
+        """Test only the selected columns are read and returned"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(fitness_progress_list_url(),
+                                  {'fields': 'date,weight'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'],
+                         [{'date': '2024-01-01', 'weight': '70.50'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('notes', queries[0]['sql'])
+        self.assertNotIn('achieved_goals', queries[0]['sql'])
+
+    def test_retrieve_omitted_fields(self):
+        """Test omitted fields are neither read nor returned"""
+        url = fitness_progress_detail_url(self.fitness_progress.id)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, {'omit': 'notes,achieved_goals'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('notes', res.data)
+        self.assertNotIn('achieved_goals', res.data)
+        self.assertEqual(res.data['weight'], '70.50')
+        self.assertEqual(res['ETag'], '"1"')
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('notes', queries[0]['sql'])
+
+    def test_unknown_field_rejected(self):
+        res = self.client.get(fitness_progress_list_url(),
+                              {'fields': 'date,height', 'omit': 'colour'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, {'fields': ['Unknown field "height".'],
+                                    'omit': ['Unknown field "colour".']})
+
+    def test_write_returns_every_field(self):
+        """Test writes ignore the field selection"""
+        url = fitness_progress_detail_url(self.fitness_progress.id)
+        res = self.client.patch(f'{url}?fields=date', {'weight': '69.0'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['weight'], '69.00')
+        self.assertEqual(res.data['notes'], 'A long note')
+
+
+class FitnessProgressTrendsTests(TestCase):
+    """Test the FitnessProgress trends endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='trends@example.com', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        # Monday 2024-01-01 to Sunday 2024-01-14, losing 0.5kg a day.
+        for day in range(14):
+            FitnessProgress.objects.create(
+                user=self.user, date=date(2024, 1, 1) + timedelta(days=day),
+                weight=Decimal('80') - Decimal('0.5') * day,
+                calories_burned=100, exercise_duration=30 if day % 2 else None)
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass')
+        FitnessProgress.objects.create(
+            user=other_user, date=date(2024, 1, 5), weight=Decimal('120'))
+
+    def get_trends(self, **params):
+        return self.client.get(fitness_progress_trends_url(), params)
+
+    def test_daily_trends(self):
+        """Test daily buckets with a moving average over prior days"""
+        with self.assertNumQueries(1):
+            res = self.get_trends(start='2024-01-03', end='2024-01-05',
+                                  window=3)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'bucket': '2024-01-03', 'entries': 1,
+             'average_weight': '79.00', 'min_weight': '79.00',
+             'max_weight': '79.00', 'calories_burned': 100,
+             'exercise_duration': None, 'moving_average_weight': '79.50'},
+            {'bucket': '2024-01-04', 'entries': 1,
+             'average_weight': '78.50', 'min_weight': '78.50',
+             'max_weight': '78.50', 'calories_burned': 100,
+             'exercise_duration': 30, 'moving_average_weight': '79.00'},
+            {'bucket': '2024-01-05', 'entries': 1,
+             'average_weight': '78.00', 'min_weight': '78.00',
+             'max_weight': '78.00', 'calories_burned': 100,
+             'exercise_duration': None, 'moving_average_weight': '78.50'},
+        ])
+
+    def test_weekly_trends(self):
+        """Test weekly buckets aggregate each week's entries"""
+        res = self.get_trends(start='2024-01-01', end='2024-01-31',
+                              bucket='week')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([bucket['bucket'] for bucket in res.data],
+                         ['2024-01-01', '2024-01-08'])
+        first_week = res.data[0]
+        self.assertEqual(first_week['entries'], 7)
+        self.assertEqual(first_week['average_weight'], '78.50')
+        self.assertEqual(first_week['min_weight'], '77.00')
+        self.assertEqual(first_week['max_weight'], '80.00')
+        self.assertEqual(first_week['calories_burned'], 700)
+        self.assertEqual(first_week['exercise_duration'], 90)
+        self.assertEqual(first_week['moving_average_weight'], '78.50')
+
+    def test_monthly_trends_size_independent_of_entries(self):
+        res = self.get_trends(start='2023-12-01', end='2024-02-29',
+                              bucket='month')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['bucket'], '2024-01-01')
+        self.assertEqual(res.data[0]['entries'], 14)
+
+    def test_invalid_trend_parameters(self):
+        for params in [{'start': '2024-01-05', 'end': '2024-01-01'},
+                       {'start': '2024-01-01', 'end': '2024-01-05',
+                        'bucket': 'year'},
+                       {'start': '2024-01-01', 'end': '2024-01-05',
+                        'window': 0},
+                       {'start': '2000-01-01', 'end': '2024-01-05'},
+                       {'end': '2024-01-05'}]:
+            res = self.get_trends(**params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FitnessProgressImportTests(TestCase):
+    """Test importing FitnessProgress entries"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='import@example.com', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.existing = FitnessProgress.objects.create(
+            user=self.user, date=date(2024, 1, 2), weight=Decimal('80'),
+            notes='Before import')
+
+    def import_entries(self, content, content_type='text/csv'):
+        return self.client.post(fitness_progress_import_url(),
+                                data=content.encode(),
+                                content_type=content_type)
+
+    def test_import_csv(self):
+        """Test rows are created, and existing dates updated"""
+        res = self.import_entries(
+            'date,weight,goal_weight,notes,calories_burned\n'
+            '2024-01-01,81.5,75,"First, entry",300\n'
+            '2024-01-02,80.5,,,\n')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'created': 1, 'updated': 1,
+                                    'error_count': 0, 'errors': []})
+        first = FitnessProgress.objects.get(user=self.user,
+                                            date=date(2024, 1, 1))
+        self.assertEqual(first.weight, Decimal('81.5'))
+        self.assertEqual(first.goal_weight, Decimal('75'))
+        self.assertEqual(first.notes, 'First, entry')
+        self.assertEqual(first.calories_burned, 300)
+        self.assertEqual(first.version, 1)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.weight, Decimal('80.5'))
+        self.assertIsNone(self.existing.notes)
+        self.assertEqual(self.existing.version, 2)
+
+    def test_import_csv_with_byte_order_mark(self):
+        """Test a CSV starting with a byte order mark is read"""
+        res = self.import_entries('\ufeffdate,weight\n2024-01-03,79\n')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['error_count'], 0)
+
+    def test_import_reports_invalid_rows(self):
+        """Test invalid rows are skipped and reported by line"""
+        res = self.import_entries(
+            'date,weight\n'
+            '2024-01-01,heavy\n'
+            '2024-01-03,79\n'
+            'yesterday,\n')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['error_count'], 2)
+        self.assertEqual([error['line'] for error in res.data['errors']],
+                         [2, 4])
+        self.assertIn('weight', res.data['errors'][0]['errors'])
+        self.assertEqual(set(res.data['errors'][1]['errors']),
+                         {'date', 'weight'})
+        self.assertFalse(FitnessProgress.objects.filter(
+            date=date(2024, 1, 1)).exists())
+
+    def test_import_ndjson_last_row_for_date_wins(self):
+        res = self.import_entries(
+            '{"date": "2024-02-01", "weight": "70.0"}\n'
+            '\n'
+            'not json\n'
+            '{"date": "2024-02-01", "weight": 69.5, "mood": "great"}\n',
+            content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['errors'][0]['line'], 3)
+        entry = FitnessProgress.objects.get(date=date(2024, 2, 1))
+        self.assertEqual(entry.weight, Decimal('69.5'))
+        self.assertEqual(entry.mood, 'great')
+
+    def test_import_only_touches_own_entries(self):
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass')
+        other = FitnessProgress.objects.create(
+            user=other_user, date=date(2024, 1, 2), weight=Decimal('100'))
+
+        self.import_entries('date,weight\n2024-01-02,60\n')
+
+        other.refresh_from_db()
+        self.assertEqual(other.weight, Decimal('100'))
+
+    def test_import_unsupported_media_type(self):
+        res = self.import_entries('{}', content_type='application/json')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_import_with_charset(self):
+        """Test the media type is matched without its parameters"""
+        res = self.import_entries('date,weight\n2024-01-03,79\n',
+                                  content_type='text/csv; charset=utf-8')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+
+    def test_import_other_charset_unsupported(self):
+        res = self.import_entries('date,weight\n2024-01-03,79\n',
+                                  content_type='text/csv; charset=latin-1')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+
+class FitnessProgressExportTests(TestCase):
+    """Test exporting FitnessProgress entries"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='export@example.com', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        FitnessProgress.objects.create(
+            user=self.user, date=date(2024, 1, 2), weight=Decimal('80'),
+            notes='Second, with a comma')
+        FitnessProgress.objects.create(
+            user=self.user, date=date(2024, 1, 1), weight=Decimal('81.5'),
+            calories_burned=300)
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass')
+        FitnessProgress.objects.create(
+            user=other_user, date=date(2024, 1, 1), weight=Decimal('100'))
+
+    def test_export_csv(self):
+        """Test entries are streamed as CSV, oldest first"""
+        res = self.client.get(fitness_progress_export_url(),
+                              {'fields': 'date,weight,notes'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('fitness-progress.csv', res['Content-Disposition'])
+        self.assertEqual(
+            b''.join(res.streaming_content).decode(),
+            'date,weight,notes\r\n'
+            '2024-01-01,81.50,\r\n'
+            '2024-01-02,80.00,"Second, with a comma"\r\n')
+
+    def test_export_ndjson_matches_list(self):
+        """Test each NDJSON line is an entry as the list returns it"""
+        res = self.client.get(fitness_progress_export_url(),
+                              HTTP_ACCEPT='application/x-ndjson')
+        entries = self.client.get(fitness_progress_list_url()).json()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        lines = b''.join(res.streaming_content).splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         entries['results'][::-1])
+
+    def test_export_reads_in_chunks(self):
+        """Test the rows are fetched from a cursor chunk by chunk"""
+        with patch.object(FitnessProgressViewSet, 'export_chunk_size', 1):
+            res = self.client.get(fitness_progress_export_url(),
+                                  {'format': 'ndjson'})
+            lines = b''.join(res.streaming_content).splitlines()
+
+        self.assertEqual(len(lines), 2)
+
+    def test_export_unknown_format(self):
+        res = self.client.get(fitness_progress_export_url(),
+                              HTTP_ACCEPT='application/xml')
+
+        self.assertEqual(res.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+
+class FitnessProgressAsgiExportTests(TransactionTestCase):
+    """Test exporting FitnessProgress entries through the ASGI handler.
+
+    The handler serves each request on a thread of its own, with its own
+    database connection, so the entries are committed.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='export@example.com', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        for day in [2, 1]:
+            FitnessProgress.objects.create(
+                user=self.user, date=date(2024, 1, day),
+                weight=Decimal('80'))
+
+    async def test_export_streams_every_row(self):
+        """Test the export body is complete under ASGI"""
+        path = fitness_progress_export_url()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(),
+            'query_string': b'format=ndjson', 'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        await ASGIHandler()(scope, receive, send)
+
+        self.assertEqual(messages[0]['status'], status.HTTP_200_OK)
+        body = b''.join(message.get('body', b'')
+                        for message in messages[1:])
+        self.assertEqual(
+            [json.loads(line)['date'] for line in body.splitlines()],
+            ['2024-01-01', '2024-01-02'])
+
+
+class FitnessProgressSummaryTests(TestCase):
+    """Test the summary kept for each user's FitnessProgress"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='summary@example.com', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_entry(self, day, **payload):
+        payload = {'date': date(2024, 1, day), 'weight': '80.00',
+                   **payload}
+        res = self.client.post(fitness_progress_list_url(), payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def get_summary(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(fitness_progress_summary_url())
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_summary_without_entries(self):
+        summary = self.get_summary()
+
+        self.assertEqual(summary['entry_count'], 0)
+        self.assertEqual(summary['total_calories_burned'], 0)
+        self.assertIsNone(summary['latest_weight'])
+        self.assertIsNone(summary['distance_to_goal'])
+
+    def test_summary_follows_writes(self):
+        """Test creates, updates and deletes are applied to the summary"""
+        self.create_entry(1, weight='82.00', goal_weight='75.00',
+                          calories_burned=300, exercise_duration=30)
+        second = self.create_entry(3, weight='81.00', calories_burned=200)
+        third = self.create_entry(2, weight='90.00', exercise_duration=45)
+
+        summary = self.get_summary()
+        self.assertEqual(summary['entry_count'], 3)
+        self.assertEqual(summary['total_calories_burned'], 500)
+        self.assertEqual(summary['total_exercise_duration'], 75)
+        self.assertEqual(summary['latest_date'], '2024-01-03')
+        self.assertEqual(summary['latest_weight'], '81.00')
+        self.assertEqual(summary['goal_weight'], '75.00')
+        self.assertEqual(summary['distance_to_goal'], '6.00')
+
+        self.client.patch(fitness_progress_detail_url(second),
+                          {'calories_burned': 50, 'weight': '79.00'})
+        self.client.delete(fitness_progress_detail_url(third))
+
+        summary = self.get_summary()
+        self.assertEqual(summary['entry_count'], 2)
+        self.assertEqual(summary['total_calories_burned'], 350)
+        self.assertEqual(summary['total_exercise_duration'], 30)
+        self.assertEqual(summary['latest_weight'], '79.00')
+        self.assertEqual(summary['distance_to_goal'], '4.00')
+
+    def test_summary_created_from_existing_entries(self):
+        """Test a user's first summary counts the entries it predates"""
+        FitnessProgress.objects.create(
+            user=self.user, date=date(2024, 1, 1), weight=Decimal('80'),
+            calories_burned=100)
+
+        self.create_entry(2, calories_burned=10)
+
+        summary = self.get_summary()
+        self.assertEqual(summary['entry_count'], 2)
+        self.assertEqual(summary['total_calories_burned'], 110)
+
+    def test_summary_follows_imports(self):
+        self.create_entry(1, calories_burned=100, exercise_duration=10)
+
+        self.client.post(fitness_progress_import_url(),
+                         data=b'date,weight,calories_burned\n'
+                              b'2024-01-01,70,40\n'
+                              b'2024-01-05,71,\n',
+                         content_type='text/csv')
+
+        summary = self.get_summary()
+        self.assertEqual(summary['entry_count'], 2)
+        self.assertEqual(summary['total_calories_burned'], 40)
+        self.assertEqual(summary['total_exercise_duration'], 0)
+        self.assertEqual(summary['latest_date'], '2024-01-05')
+        self.assertEqual(
+            FitnessProgressSummary.objects.get(user=self.user).latest_weight,
+            Decimal('71'))
+
+
+class FitnessProgressForecastTests(TestCase):
+    """Test forecasting when the goal weight is reached"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='forecast@example.com', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.start = date(2024, 1, 1)
+        # Losing 0.1 a day from 90, with one entry far off the trend.
+        FitnessProgress.objects.bulk_create([
+            FitnessProgress(
+                user=self.user, date=self.start + timedelta(days=day),
+                weight=Decimal(90) - Decimal(day) / 10
+                + (10 if day == 5 else 0),
+                goal_weight=Decimal(85) if day == 0 else None)
+            for day in range(21)
+        ])
+
+    def test_forecast_goal_date(self):
+        """Test the trend is projected to the latest goal weight"""
+        res = self.client.get(fitness_progress_forecast_url())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], 'on_track')
+        self.assertEqual(res.data['entries'], 21)
+        self.assertEqual(res.data['goal_weight'], 85)
+        self.assertAlmostEqual(res.data['current_weight'], 88, places=1)
+        self.assertAlmostEqual(res.data['weekly_change'], -0.7, places=2)
+        self.assertEqual(res.data['goal_date'], '2024-02-20')
+        self.assertLessEqual(res.data['goal_date_earliest'],
+                             res.data['goal_date'])
+        self.assertGreaterEqual(res.data['goal_date_latest'],
+                                res.data['goal_date'])
+
+    def test_forecast_is_cached_until_latest_entry_changes(self):
+        self.client.get(fitness_progress_forecast_url())
+
+        with self.assertNumQueries(1):
+            res = self.client.get(fitness_progress_forecast_url())
+        self.assertEqual(res.data['goal_date'], '2024-02-20')
+
+        latest = FitnessProgress.objects.get(
+            user=self.user, date=self.start + timedelta(days=20))
+        latest.goal_weight = Decimal('80.00')
+        latest.save()
+        res = self.client.get(fitness_progress_forecast_url())
+        self.assertEqual(res.data['goal_weight'], 80)
+        self.assertGreater(res.data['goal_date'], '2024-02-20')
+
+    def test_forecast_goal_not_approached(self):
+        res = self.client.get(fitness_progress_forecast_url(),
+                              {'goal_weight': '95'})
+
+        self.assertEqual(res.data['status'], 'off_track')
+        self.assertIsNone(res.data['goal_date'])
+
+    def test_forecast_goal_passed(self):
+        """Test a goal the trend has moved past counts as reached"""
+        res = self.client.get(fitness_progress_forecast_url(),
+                              {'goal_weight': '89'})
+
+        self.assertEqual(res.data['status'], 'reached')
+        self.assertIsNone(res.data['goal_date'])
+
+    def test_forecast_without_entries(self):
+        FitnessProgress.objects.all().delete()
+
+        res = self.client.get(fitness_progress_forecast_url())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], 'insufficient_data')
+        self.assertEqual(res.data['entries'], 0)
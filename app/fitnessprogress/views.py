@@ -1,21 +1,149 @@
 """
 Views for the fitnessprogress APIs
 """
+import csv
+import io
 
 
+from django.db import transaction
+from django.http.multipartparser import parse_header
+from drf_spectacular.utils import extend_schema, OpenApiTypes
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
 from rest_framework.permissions import IsAuthenticated
-from core.models import FitnessProgress
-from fitnessprogress.serializers import FitnessProgressSerializer
+from rest_framework.response import Response
+from core.mixins import ConditionalRequestMixin, \
+    SparseFieldsetMixin, StreamingExportMixin, ValuesListMixin
+from core.models import FitnessProgress, FitnessProgressSummary
+from core.pagination import FitnessProgressCursorPagination
+from fitnessprogress.analytics import get_trends
+from fitnessprogress.imports import import_fitness_progress
+from fitnessprogress.serializers import FitnessProgressSerializer, \
+    FitnessProgressTrendsQuerySerializer, FitnessProgressTrendSerializer, \
+    FitnessProgressImportResultSerializer, FitnessProgressSummarySerializer, \
+    FitnessProgressForecastQuerySerializer, FitnessProgressForecastSerializer
+from fitnessprogress.forecast import get_forecast
+from fitnessprogress.summary import entry_change, update_summary
 
+IMPORT_MEDIA_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+# Uploads are read as UTF-8, which ASCII is a subset of.
+IMPORT_CHARSETS = {'utf-8', 'utf8', 'us-ascii'}
 
-class FitnessProgressViewSet(viewsets.ModelViewSet):
+
+class FitnessProgressViewSet(ConditionalRequestMixin, ValuesListMixin,
+                             StreamingExportMixin, SparseFieldsetMixin,
+                             viewsets.ModelViewSet):
     queryset = FitnessProgress.objects.all()
     serializer_class = FitnessProgressSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FitnessProgressCursorPagination
+    export_ordering = ('date',)
+    export_filename = 'fitness-progress'
 
     def get_queryset(self):
         return FitnessProgress.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+            self.record_change(new=serializer.instance)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            old = self.lock_entry(serializer.instance)
+            super().perform_update(serializer)
+            self.record_change(old, serializer.instance)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            old = self.lock_entry(instance)
+            super().perform_destroy(instance)
+            self.record_change(old)
+
+    def lock_entry(self, instance):
+        """Lock the entry and return it as currently stored."""
+        return FitnessProgress.objects.select_for_update() \
+            .filter(pk=instance.pk).first()
+
+    def record_change(self, old=None, new=None):
+        """Apply the change of an entry to the user's summary."""
+        if old is not None or new is not None:
+            update_summary(self.request.user.id, **entry_change(old, new))
+
+    @extend_schema(
+        description="Totals and latest values over all entries of the "
+                    "authenticated user.",
+        responses={200: FitnessProgressSummarySerializer},
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def summary(self, request):
+        """Return the user's progress summary."""
+        summary = FitnessProgressSummary.objects.filter(
+            user=request.user).first() \
+            or FitnessProgressSummary(user=request.user)
+        return Response(FitnessProgressSummarySerializer(summary).data)
+
+    @extend_schema(
+        description="Progress of the authenticated user between two "
+                    "dates, summarized per day, week or month with a "
+                    "moving average of the weight.",
+        parameters=[FitnessProgressTrendsQuerySerializer],
+        responses={200: FitnessProgressTrendSerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def trends(self, request):
+        """Return the user's progress per time bucket."""
+        query = FitnessProgressTrendsQuerySerializer(
+            data=request.query_params)
+        query.is_valid(raise_exception=True)
+        serializer = FitnessProgressTrendSerializer(
+            get_trends(request.user, **query.validated_data), many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        description="Forecast when the authenticated user reaches their "
+                    "goal weight, from a robust linear trend fitted to "
+                    "their recent weights, with the earliest and latest "
+                    "dates within its 95% confidence band.",
+        parameters=[FitnessProgressForecastQuerySerializer],
+        responses={200: FitnessProgressForecastSerializer},
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def forecast(self, request):
+        """Return the forecast of the user's goal weight."""
+        query = FitnessProgressForecastQuerySerializer(
+            data=request.query_params)
+        query.is_valid(raise_exception=True)
+        serializer = FitnessProgressForecastSerializer(
+            get_forecast(request.user, **query.validated_data))
+        return Response(serializer.data)
+
+    @extend_schema(
+        description="Import entries from a CSV file with a header row, "
+                    "or from NDJSON, sent as the request body. Entries "
+                    "for dates the user already has are updated, and "
+                    "invalid rows are skipped and reported by line.",
+        request={media_type: OpenApiTypes.BINARY
+                 for media_type in IMPORT_MEDIA_TYPES},
+        responses={200: FitnessProgressImportResultSerializer},
+    )
+    @action(detail=False, methods=['post'], url_path='import',
+            url_name='import')
+    def import_entries(self, request):
+        """Create or update the user's entries from an uploaded file."""
+        media_type, params = parse_header(request.content_type.encode())
+        format = IMPORT_MEDIA_TYPES.get(media_type.lower())
+        charset = params.get('charset', b'utf-8').decode().lower()
+        if format is None or charset not in IMPORT_CHARSETS:
+            raise UnsupportedMediaType(request.content_type)
+        try:
+            result = import_fitness_progress(
+                request.user, request.stream or io.BytesIO(), format)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError(f'Could not read the upload: {exc}')
+        return Response(FitnessProgressImportResultSerializer(result).data)
@@ -0,0 +1,66 @@
+"""
+Django command to create users in bulk from a file.
+"""
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.readers import FORMATS, guess_format
+from user.provisioning import DEFAULT_CHUNK_SIZE, provision_users
+
+
+class Command(BaseCommand):
+    """Django command to provision users from CSV or NDJSON.
+
+    Each row has the email, name and password of a user; rows without
+    a password get an unusable one. Users that already exist are
+    skipped.
+    """
+    help = 'Create users in bulk from a file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Format of the file, by default from its extension.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help='Number of users hashed and inserted at a time.')
+        parser.add_argument(
+            '--workers', type=int,
+            help='Processes hashing passwords, by default one per CPU.')
+        parser.add_argument(
+            '--tokens', metavar='PATH',
+            help='Create an auth token for each new user and write the '
+                 'emails and tokens to this CSV file.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        format = options['format'] or guess_format(options['path'])
+        if format is None:
+            raise CommandError(
+                f'Cannot tell the format of {options["path"]}, '
+                f'use --format.')
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = provision_users(
+                    stream, format, chunk_size=options['chunk_size'],
+                    workers=options['workers'],
+                    issue_tokens=bool(options['tokens']))
+        except (OSError, UnicodeDecodeError, csv.Error) as exc:
+            raise CommandError(f'Could not read {options["path"]}: {exc}')
+
+        if options['tokens']:
+            with open(options['tokens'], 'w', newline='') as tokens:
+                writer = csv.writer(tokens)
+                writer.writerow(['email', 'token'])
+                writer.writerows(result['tokens'])
+
+        for error in result['errors']:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} users in {result['seconds']}s "
+            f"({result['users_per_second']} users/s), skipped "
+            f"{result['existing']} existing and {result['error_count']} "
+            f"invalid rows."))
@@ -0,0 +1,151 @@
+"""
+Bulk provisioning of users from a file.
+"""
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+
+from core.readers import READERS
+from user.serializers import UserProvisioningSerializer
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def hash_passwords(passwords):
+    """Return the hashes of the passwords, made in a worker process.
+
+    Missing passwords get an unusable password, without hashing.
+    """
+    return [make_password(password) for password in passwords]
+
+
+def iter_valid_rows(stream, format, result):
+    """Yield the validated rows of the file with normalized emails.
+
+    Invalid rows, and rows repeating the email of an earlier row, are
+    skipped and reported by line in `result`.
+    """
+    manager = get_user_model().objects
+    serializer = UserProvisioningSerializer()
+    emails = set()
+    for line, row in READERS[format](stream):
+        try:
+            if row is None:
+                raise ValidationError(
+                    {'non_field_errors': ['Expected a JSON object.']})
+            data = serializer.run_validation(row)
+            data['email'] = manager.normalize_email(data['email'])
+            if data['email'] in emails:
+                raise ValidationError(
+                    {'email': ['Repeats the email of an earlier row.']})
+        except ValidationError as exc:
+            result['error_count'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append({'line': line, 'errors': exc.detail})
+            continue
+        emails.add(data['email'])
+        yield data
+
+
+def provision_users(stream, format='csv', chunk_size=DEFAULT_CHUNK_SIZE,
+                    workers=None, issue_tokens=False):
+    """Create the users of a CSV or NDJSON stream of email, name, password.
+
+    Rows are handled a chunk at a time. Users whose email already
+    exists are skipped before their password is hashed. The passwords
+    of a chunk are hashed across `workers` processes, by default one
+    per CPU, while the previous chunk is inserted with `bulk_create`,
+    ignoring conflicts on the email, in its own transaction. With
+    `issue_tokens`, an auth token is created for each new user in the
+    same transaction, and the emails and keys are returned.
+    """
+    workers = workers or os.cpu_count()
+    result = {'created': 0, 'existing': 0, 'error_count': 0, 'errors': [],
+              'tokens': []}
+    start = time.perf_counter()
+    rows = iter_valid_rows(stream, format, result)
+
+    # Spawned, as forked workers would share the database connection.
+    with ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup) as executor:
+        pending = None
+        while chunk := list(islice(rows, chunk_size)):
+            chunk = exclude_existing(chunk, result)
+            hashes = hash_chunk(executor, chunk, workers)
+            if pending:
+                insert_chunk(*pending, result, issue_tokens)
+            pending = chunk, hashes
+        if pending:
+            insert_chunk(*pending, result, issue_tokens)
+
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    result['users_per_second'] = round(
+        result['created'] / result['seconds'], 1) \
+        if result['seconds'] else 0
+    return result
+
+
+def exclude_existing(chunk, result):
+    """Return the rows of the chunk whose email is not taken yet."""
+    existing = set(get_user_model().objects.filter(
+        email__in=[row['email'] for row in chunk]).values_list(
+            'email', flat=True))
+    result['existing'] += len(existing)
+    return [row for row in chunk if row['email'] not in existing]
+
+
+def hash_chunk(executor, chunk, workers):
+    """Start hashing the passwords of the chunk, split between workers."""
+    passwords = [row.get('password') for row in chunk]
+    size = max(math.ceil(len(passwords) / workers), 1)
+    return [executor.submit(hash_passwords, passwords[offset:offset + size])
+            for offset in range(0, len(passwords), size)]
+
+
+def insert_chunk(chunk, hashes, result, issue_tokens):
+    """Insert the users of the chunk once their passwords are hashed.
+
+    Users created by someone else since the chunk was checked are left
+    alone. They are told apart from the users inserted here by their
+    password hash, as every hash has its own salt.
+    """
+    user_model = get_user_model()
+    passwords = {}
+    for row, encoded in zip(chunk, (encoded for future in hashes
+                                    for encoded in future.result())):
+        passwords[row['email']] = encoded
+    with transaction.atomic():
+        user_model.objects.bulk_create([
+            user_model(email=row['email'], name=row['name'],
+                       password=passwords[row['email']])
+            for row in chunk
+        ], ignore_conflicts=True)
+        created = [
+            (user_id, email) for user_id, email, password
+            in user_model.objects.filter(email__in=passwords).values_list(
+                'id', 'email', 'password')
+            if password == passwords[email]
+        ]
+        result['created'] += len(created)
+        result['existing'] += len(chunk) - len(created)
+        if issue_tokens:
+            tokens = Token.objects.bulk_create([
+                Token(key=Token.generate_key(), user_id=user_id)
+                for user_id, _ in created
+            ])
+            result['tokens'] += [
+                (email, token.key)
+                for (_, email), token in zip(created, tokens)
+            ]
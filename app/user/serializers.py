@@ -1,13 +1,14 @@
 """
 Serializers for the user API View.
 """
-from django.contrib.auth import (
-    get_user_model,
-    authenticate,
-)
+from django.contrib.auth import get_user_model
 from django.utils.translation import gettext as _
 
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from core.hashers import check_credentials
+from core.tokens import InvalidToken, refresh_tokens
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -34,6 +35,20 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+class UserProvisioningSerializer(serializers.ModelSerializer):
+    """Serializer for the rows of a user provisioning file."""
+
+    class Meta:
+        model = get_user_model()
+        fields = ['email', 'name', 'password']
+        extra_kwargs = {
+            # Existing emails are skipped by the provisioning instead.
+            'email': {'validators': []},
+            'password': {'write_only': True, 'min_length': 5,
+                         'required': False},
+        }
+
+
 class AuthTokenSerializer(serializers.Serializer):
     """Serializer for the user auth token."""
     email = serializers.EmailField()
@@ -42,18 +57,41 @@ class AuthTokenSerializer(serializers.Serializer):
         trim_whitespace=False,
     )
 
-    def validate(self, attrs):
-        """Validate and authenticate the user."""
-        email = attrs.get('email')
-        password = attrs.get('password')
-        user = authenticate(
-            request=self.context.get('request'),
-            username=email,
-            password=password,
-        )
+    async def authenticate(self):
+        """Return the user with the validated credentials.
+
+        The password is checked in the hashing pool, without blocking
+        the event loop. Unlike `django.contrib.auth.authenticate`, only
+        the model backend is tried.
+        """
+        user = await check_credentials(self.validated_data['email'],
+                                       self.validated_data['password'])
         if not user:
             msg = _('Unable to authenticate with provided credentials.')
-            raise serializers.ValidationError(msg, code='authorization')
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [msg]},
+                code='authorization')
+        return user
+
+
+class TokenPairSerializer(serializers.Serializer):
+    """Serializer for the tokens issued to a user."""
+    token = serializers.CharField(read_only=True)
+    access = serializers.CharField(read_only=True)
+    refresh = serializers.CharField(read_only=True)
+    expires_in = serializers.IntegerField(
+        read_only=True, help_text='Seconds until the access token expires.')
 
-        attrs['user'] = user
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer exchanging a refresh token for new tokens."""
+    refresh = serializers.CharField(trim_whitespace=False)
+
+    def validate(self, attrs):
+        """Use up the refresh token and issue new tokens."""
+        try:
+            attrs['tokens'] = refresh_tokens(attrs['refresh'])
+        except InvalidToken as exc:
+            raise serializers.ValidationError(
+                str(exc), code='authorization')
         return attrs
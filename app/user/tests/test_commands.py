@@ -0,0 +1,72 @@
+"""
+Test the user management commands.
+"""
+import csv
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+
+
+class ProvisionUsersCommandTests(TestCase):
+    """Test the provision_users command."""
+
+    def write_file(self, suffix, content):
+        upload = tempfile.NamedTemporaryFile('w', suffix=suffix)
+        upload.write(content)
+        upload.flush()
+        self.addCleanup(upload.close)
+        return upload.name
+
+    def test_provision_in_chunks(self):
+        """Test new users are created and the others skipped."""
+        get_user_model().objects.create_user(
+            email='taken@example.com', password='testpass')
+        path = self.write_file('.csv', (
+            'email,name,password\n'
+            'one@EXAMPLE.com,One,password1\n'
+            'taken@example.com,Taken,password2\n'
+            'two@example.com,Two,\n'
+            'one@example.com,Again,password3\n'
+            'invalid,Invalid,password4\n'
+        ))
+        out = StringIO()
+        err = StringIO()
+
+        call_command('provision_users', path, chunk_size=2, workers=1,
+                     stdout=out, stderr=err)
+
+        self.assertIn('Created 2 users', out.getvalue())
+        self.assertIn('skipped 1 existing and 2 invalid rows',
+                      out.getvalue())
+        self.assertIn('Line 5:', err.getvalue())
+        one = get_user_model().objects.get(email='one@example.com')
+        self.assertEqual(one.name, 'One')
+        self.assertTrue(one.check_password('password1'))
+        two = get_user_model().objects.get(email='two@example.com')
+        self.assertFalse(two.has_usable_password())
+
+    def test_provision_with_tokens(self):
+        path = self.write_file(
+            '.ndjson', '{"email": "token@example.com", "name": "Token"}\n')
+        tokens = self.write_file('.csv', '')
+
+        call_command('provision_users', path, workers=1, tokens=tokens,
+                     stdout=StringIO())
+
+        with open(tokens, newline='') as stream:
+            rows = list(csv.DictReader(stream))
+        self.assertEqual(rows, [{
+            'email': 'token@example.com',
+            'token': Token.objects.get(user__email='token@example.com').key,
+        }])
+
+    def test_provision_unknown_format(self):
+        path = self.write_file('.txt', 'email,name,password\n')
+
+        with self.assertRaises(CommandError):
+            call_command('provision_users', path)
@@ -1,7 +1,7 @@
 """
 Tests for the user API.
 """
-from django.test import TestCase
+from django.test import AsyncClient, TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
@@ -11,6 +11,7 @@ from rest_framework import status
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
+TOKEN_REFRESH_URL = reverse('user:token-refresh')
 ME_URL = reverse('user:me')
 
 
@@ -39,6 +40,21 @@ class PublicUserApiTests(TestCase):
         self.assertTrue(user.check_password(payload['password']))
         self.assertNotIn('password', res.data)
 
+    async def test_register_and_login_under_asgi(self):
+        """Test the user endpoints run as coroutines under ASGI."""
+        client = AsyncClient()
+        payload = {'email': 'test@example.com', 'password': 'testpass123'}
+
+        res = await client.post(CREATE_USER_URL, {**payload, 'name': 'Test'},
+                                content_type='application/json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn('password-hash', res['Server-Timing'])
+
+        res = await client.post(TOKEN_URL, payload,
+                                content_type='application/json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+
     def test_user_with_email_exists_error(self):
         """Test error returned if user with email exists."""
         payload = {
@@ -82,6 +98,8 @@ class PublicUserApiTests(TestCase):
         res = self.client.post(TOKEN_URL, payload)
 
         self.assertIn('token', res.data)
+        self.assertIn('access', res.data)
+        self.assertIn('refresh', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_create_token_bad_credentials(self):
@@ -116,6 +134,42 @@ class PublicUserApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_retrieve_user_with_token(self):
+        """Test the token returned for a user authenticates them."""
+        create_user(email='test@example.com', password='goodpass')
+        res = self.client.post(TOKEN_URL, {'email': 'test@example.com',
+                                           'password': 'goodpass'})
+
+        token = res.data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], 'test@example.com')
+
+    def test_retrieve_user_with_access_token(self):
+        """Test a refreshed access token authenticates the user."""
+        create_user(email='test@example.com', password='goodpass')
+        res = self.client.post(TOKEN_URL, {'email': 'test@example.com',
+                                           'password': 'goodpass'})
+        res = self.client.post(TOKEN_REFRESH_URL,
+                               {'refresh': res.data['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {res.data["access"]}')
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], 'test@example.com')
+
+    def test_refresh_token_invalid(self):
+        """Test an unknown refresh token is rejected."""
+        res = self.client.post(TOKEN_REFRESH_URL, {'refresh': 'unknown'})
+
+        self.assertNotIn('access', res.data)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class PrivateUserApiTests(TestCase):
     """Test API requests that require authentication."""
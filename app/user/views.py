@@ -1,33 +1,99 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
-from rest_framework.authtoken.views import ObtainAuthToken
-from rest_framework.settings import api_settings
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics, permissions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
 
+from core.authentication import AccessTokenAuthentication, \
+    CachedTokenAuthentication
+from core.hashers import run_hashing
+from core.tokens import issue_tokens
+from core.views import AsyncAPIView
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
+    RefreshTokenSerializer,
+    TokenPairSerializer,
 )
 
 
-class CreateUserView(generics.CreateAPIView):
+def get_tokens(user):
+    """Return the auth token of the user with new signed tokens."""
+    token, created = Token.objects.get_or_create(user=user)
+    return {'token': token.key, **issue_tokens(user)}
+
+
+class CreateUserView(AsyncAPIView):
     """Create a new user in the system."""
     serializer_class = UserSerializer
+    authentication_classes = []
+    permission_classes = []
+
+    @extend_schema(request=UserSerializer,
+                   responses={201: UserSerializer})
+    async def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        # Queries run in a thread and hashing in the hashing pool, so
+        # registrations do not hold up the event loop.
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        validated_data = dict(serializer.validated_data)
+        encoded = await run_hashing(make_password,
+                                    validated_data.pop('password'))
+        user = await sync_to_async(
+            get_user_model().objects.create_user_with_encoded_password)(
+                encoded=encoded, **validated_data)
+        return Response(self.serializer_class(user).data,
+                        status=status.HTTP_201_CREATED)
+
 
+class CreateTokenView(AsyncAPIView):
+    """Create a new auth token for user.
 
-class CreateTokenView(ObtainAuthToken):
-    """Create a new auth token for user."""
+    Along with the auth token, a signed access token and the refresh
+    token it is renewed with are issued.
+    """
     serializer_class = AuthTokenSerializer
-    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    authentication_classes = []
+    permission_classes = []
+
+    @extend_schema(request=AuthTokenSerializer,
+                   responses=TokenPairSerializer)
+    async def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = await serializer.authenticate()
+        return Response(await sync_to_async(get_tokens)(user))
+
+
+class RefreshTokenView(generics.GenericAPIView):
+    """Exchange a refresh token for a new access and refresh token."""
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = []
+    permission_classes = []
+
+    @extend_schema(responses=TokenPairSerializer)
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.validated_data['tokens'])
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication,
+                              AccessTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return the authenticated user."""
-        return self.request.user
+        user = self.request.user
+        deferred = user.get_deferred_fields()
+        if deferred:
+            user.refresh_from_db(fields=deferred)
+        return user
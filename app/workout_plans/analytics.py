@@ -0,0 +1,57 @@
+"""
+Training analytics for the workout_plans API.
+"""
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Coalesce
+
+from core.models import WorkoutPlan, WorkoutExercise
+
+TRAINING_VOLUME_CACHE_TIMEOUT = 60 * 60
+
+
+def get_plans_stamp(user):
+    """Return a value that changes whenever any of the user's plans do.
+
+    Plan ids only grow and every change to a plan or its workout
+    exercises bumps the plan's version, so the plan count, highest id
+    and sum of versions together change on every create, update and
+    delete.
+    """
+    stamp = WorkoutPlan.objects.filter(user=user).aggregate(
+        count=Count('id'), max_id=Max('id'), versions=Sum('version'))
+    return '{count}-{max_id}-{versions}'.format(**stamp)
+
+
+def compute_training_volume(user):
+    """Aggregate the user's weekly training volume per muscle group.
+
+    Each workout exercise counts once per target muscle of its exercise
+    and is weighted by the weekly frequency of its plan. The totals are
+    computed by the database in a single query.
+    """
+    frequency = F('workout_plan__frequency')
+    return list(
+        WorkoutExercise.objects
+        .filter(workout_plan__user=user,
+                exercise__target_muscles__isnull=False)
+        .values(muscle_group=F('exercise__target_muscles'),
+                name=F('exercise__target_muscles__name'))
+        .annotate(
+            weekly_sets=Sum(F('sets') * frequency),
+            weekly_repetitions=Sum(
+                F('sets') * F('repetitions') * frequency),
+            weekly_duration=Sum(Coalesce('duration', 0) * frequency),
+        )
+        .order_by('muscle_group')
+    )
+
+
+def get_training_volume(user):
+    """Return the user's training volume, cached until a plan changes."""
+    key = f'workout_plans:training_volume:{user.id}:{get_plans_stamp(user)}'
+    volume = cache.get(key)
+    if volume is None:
+        volume = compute_training_volume(user)
+        cache.set(key, volume, TRAINING_VOLUME_CACHE_TIMEOUT)
+    return volume
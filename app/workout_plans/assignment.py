@@ -0,0 +1,121 @@
+"""
+Assignment of template workout plans to many users.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from core.models import WorkoutPlan, WorkoutExercise
+
+DEFAULT_CHUNK_SIZE = 1000
+COPIED_WORKOUT_PLAN_FIELDS = ['title', 'frequency', 'goal',
+                              'session_duration']
+COPIED_WORKOUT_EXERCISE_FIELDS = ['exercise', 'sets', 'repetitions',
+                                  'duration']
+
+
+def assign_workout_plan(template, user_ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Copy a plan and its workout exercises to each of the users.
+
+    Users are processed in chunks, each in its own transaction with one
+    query to find the users still missing a copy, and an INSERT ...
+    SELECT each for their plans and their workout exercises. Users that
+    already have a copy of the template, including from an assignment
+    running at the same time, or do not exist, are skipped, so the
+    assignment can safely be repeated.
+    """
+    start = time.perf_counter()
+    user_ids = list(dict.fromkeys(user_ids))
+    assigned = 0
+    workout_exercises = 0
+
+    for offset in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[offset:offset + chunk_size]
+        with transaction.atomic():
+            new_user_ids = get_user_model().objects \
+                .filter(id__in=chunk) \
+                .exclude(workout_plans__template=template) \
+                .order_by('id').values_list('id', flat=True)
+            workout_plan_ids = insert_workout_plans(
+                template, list(new_user_ids))
+            workout_exercises += copy_workout_exercises(
+                template, workout_plan_ids)
+        assigned += len(workout_plan_ids)
+
+    seconds = time.perf_counter() - start
+    return {
+        'assigned': assigned,
+        'skipped': len(user_ids) - assigned,
+        'workout_exercises': workout_exercises,
+        'seconds': round(seconds, 3),
+        'plans_per_second': round(assigned / seconds, 1) if seconds else 0,
+    }
+
+
+def insert_workout_plans(template, user_ids):
+    """Insert a copy of the template plan for each of the users.
+
+    Users who got a copy since they were looked up are skipped by
+    ON CONFLICT on the unique template and user, rather than failing
+    the chunk. Returns the ids of the plans inserted.
+    """
+    if not user_ids:
+        return []
+    quote_name = connection.ops.quote_name
+    opts = WorkoutPlan._meta
+    table = quote_name(opts.db_table)
+    user_column = quote_name(opts.get_field('user').column)
+    template_column = quote_name(opts.get_field('template').column)
+    version_column = quote_name(opts.get_field('version').column)
+    columns = ', '.join(
+        quote_name(opts.get_field(name).column)
+        for name in COPIED_WORKOUT_PLAN_FIELDS)
+    copied = ', '.join(
+        f'template_plan.{quote_name(opts.get_field(name).column)}'
+        for name in COPIED_WORKOUT_PLAN_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {template_column}, '
+            f'{version_column}, {columns}) '
+            f'SELECT assignee.id, template_plan.id, 1, {copied} '
+            f'FROM unnest(%s::bigint[]) AS assignee (id) '
+            f'CROSS JOIN {table} AS template_plan '
+            f'WHERE template_plan.{quote_name(opts.pk.column)} = %s '
+            f'ORDER BY assignee.id '
+            f'ON CONFLICT ({template_column}, {user_column}) DO NOTHING '
+            f'RETURNING {quote_name(opts.pk.column)}',
+            [user_ids, template.id])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def copy_workout_exercises(template, workout_plan_ids):
+    """Copy the template's workout exercises to each of the plans.
+
+    The rows are copied by the database with one INSERT ... SELECT, so
+    no model instances are built. Returns the number of rows inserted.
+    """
+    if not workout_plan_ids:
+        return 0
+    quote_name = connection.ops.quote_name
+    opts = WorkoutExercise._meta
+    table = quote_name(opts.db_table)
+    plan_column = quote_name(opts.get_field('workout_plan').column)
+    version_column = quote_name(opts.get_field('version').column)
+    columns = ', '.join(
+        quote_name(opts.get_field(name).column)
+        for name in COPIED_WORKOUT_EXERCISE_FIELDS)
+    copied = ', '.join(
+        f'template_exercise.{quote_name(opts.get_field(name).column)}'
+        for name in COPIED_WORKOUT_EXERCISE_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({plan_column}, {version_column}, '
+            f'{columns}) '
+            f'SELECT plan.id, 1, {copied} '
+            f'FROM unnest(%s::bigint[]) AS plan (id) '
+            f'CROSS JOIN {table} AS template_exercise '
+            f'WHERE template_exercise.{plan_column} = %s '
+            f'ORDER BY plan.id, template_exercise.id',
+            [workout_plan_ids, template.id])
+        return cursor.rowcount
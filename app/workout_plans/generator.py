@@ -0,0 +1,124 @@
+"""
+Personalized workout plan generation.
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+
+from core.catalog import CATALOG_PAGE_TIMEOUT, get_catalog_version
+from core.models import Exercise, MuscleGroup
+
+MINUTES_PER_EXERCISE = 10
+GOAL_SCHEMES = {
+    'strength': {'sets': 5, 'repetitions': 5},
+    'hypertrophy': {'sets': 4, 'repetitions': 10},
+    'endurance': {'sets': 3, 'repetitions': 15},
+}
+DEFAULT_GOAL = 'hypertrophy'
+MAX_RANDOM_PICKS = 8
+# Rebuilt as often as catalog pages expire, for changes made by other
+# workers when there is no shared cache.
+EXERCISE_INDEX_TIMEOUT = CATALOG_PAGE_TIMEOUT
+
+
+class ExerciseIndex:
+    """In-memory index from muscle groups to the exercises targeting them.
+
+    Built from the catalog with two queries, after which plans are
+    generated without touching the database.
+    """
+
+    def __init__(self, muscle_groups, targets, version=None,
+                 expires=None):
+        self.version = version
+        self.expires = expires
+        self.muscle_groups = dict(muscle_groups)
+        exercises_by_muscle = defaultdict(list)
+        for muscle_group_id, exercise_id in targets:
+            exercises_by_muscle[muscle_group_id].append(exercise_id)
+        self.exercises_by_muscle = {
+            muscle_group_id: tuple(sorted(exercise_ids))
+            for muscle_group_id, exercise_ids in exercises_by_muscle.items()
+        }
+
+    @classmethod
+    def from_catalog(cls, version=None, expires=None):
+        """Build the index from the exercise catalog."""
+        return cls(
+            MuscleGroup.objects.values_list('id', 'name'),
+            Exercise.target_muscles.through.objects.values_list(
+                'musclegroup_id', 'exercise_id'),
+            version=version,
+            expires=expires,
+        )
+
+    def is_current(self, version, now):
+        """Return whether the index was built for `version` and is fresh."""
+        return self.version == version and (
+            self.expires is None or now < self.expires)
+
+    def select_exercises(self, muscle_group_ids, slots, rng=random):
+        """Pick up to `slots` distinct exercises spread over the muscles.
+
+        Muscle groups take turns, each contributing a random exercise
+        not picked yet, until the slots are filled or every muscle group
+        has run out of exercises.
+        """
+        candidates = [self.exercises_by_muscle[muscle_group_id]
+                      for muscle_group_id in dict.fromkeys(muscle_group_ids)
+                      if self.exercises_by_muscle.get(muscle_group_id)]
+        selected = []
+        used = set()
+        while candidates and len(selected) < slots:
+            for exercise_ids in list(candidates):
+                exercise_id = self._pick(exercise_ids, used, rng)
+                if exercise_id is None:
+                    candidates.remove(exercise_ids)
+                    continue
+                used.add(exercise_id)
+                selected.append(exercise_id)
+                if len(selected) == slots:
+                    break
+        return selected
+
+    def _pick(self, exercise_ids, used, rng):
+        for _ in range(MAX_RANDOM_PICKS):
+            exercise_id = exercise_ids[rng.randrange(len(exercise_ids))]
+            if exercise_id not in used:
+                return exercise_id
+        return next((exercise_id for exercise_id in exercise_ids
+                     if exercise_id not in used), None)
+
+    def generate(self, muscle_group_ids, session_duration,
+                 goal=None, rng=random):
+        """Return the workout exercises of a plan as a list of dicts."""
+        scheme = GOAL_SCHEMES[goal or DEFAULT_GOAL]
+        slots = max(1, session_duration // MINUTES_PER_EXERCISE)
+        return [
+            {'exercise_id': exercise_id, **scheme}
+            for exercise_id in self.select_exercises(
+                muscle_group_ids, slots, rng)
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_exercise_index():
+    """Return this worker's exercise index, rebuilt if the catalog changed.
+
+    It is also rebuilt every EXERCISE_INDEX_TIMEOUT seconds.
+    """
+    global _index
+    version = get_catalog_version()
+    now = time.monotonic()
+    index = _index
+    if index is None or not index.is_current(version, now):
+        with _index_lock:
+            if _index is None or not _index.is_current(version, now):
+                _index = ExerciseIndex.from_catalog(
+                    version=version, expires=now + EXERCISE_INDEX_TIMEOUT)
+            index = _index
+    return index
@@ -0,0 +1,50 @@
+"""
+Django command to assign a template workout plan to many users.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import WorkoutPlan
+from workout_plans.assignment import DEFAULT_CHUNK_SIZE, assign_workout_plan
+
+
+class Command(BaseCommand):
+    """Django command to copy a workout plan to a list of users."""
+    help = 'Copy a template workout plan and its exercises to users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('template_id', type=int)
+        parser.add_argument(
+            '--users', type=int, nargs='+', default=[],
+            help='Ids of the users to assign the plan to.')
+        parser.add_argument(
+            '--users-file',
+            help='File with one user id per line.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help='Number of users assigned per transaction.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            template = WorkoutPlan.objects.get(id=options['template_id'])
+        except WorkoutPlan.DoesNotExist:
+            raise CommandError(
+                f"Workout plan {options['template_id']} does not exist.")
+
+        user_ids = list(options['users'])
+        if options['users_file']:
+            with open(options['users_file']) as users_file:
+                user_ids += [int(line) for line in users_file
+                             if line.strip()]
+        if not user_ids:
+            raise CommandError('No users given.')
+
+        result = assign_workout_plan(template, user_ids,
+                                     chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Assigned '{template.title}' to {result['assigned']} users "
+            f"({result['skipped']} skipped, "
+            f"{result['workout_exercises']} workout exercises) "
+            f"in {result['seconds']}s, "
+            f"{result['plans_per_second']} plans/s."))
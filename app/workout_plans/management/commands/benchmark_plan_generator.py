@@ -0,0 +1,60 @@
+"""
+Django command to benchmark workout plan generation.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from workout_plans.generator import ExerciseIndex, GOAL_SCHEMES
+
+
+class Command(BaseCommand):
+    """Django command timing plan generation on a synthetic catalog."""
+    help = 'Benchmark plan generation against a synthetic catalog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exercises', type=int, default=10000)
+        parser.add_argument('--muscle-groups', type=int, default=50)
+        parser.add_argument('--iterations', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        rng = random.Random(options['seed'])
+        muscle_group_ids = range(1, options['muscle_groups'] + 1)
+        targets = [
+            (muscle_group_id, exercise_id)
+            for exercise_id in range(1, options['exercises'] + 1)
+            for muscle_group_id in rng.sample(
+                muscle_group_ids, min(3, len(muscle_group_ids)))
+        ]
+
+        start = time.perf_counter()
+        index = ExerciseIndex(
+            ((pk, f'Muscle {pk}') for pk in muscle_group_ids), targets)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        timings = []
+        max_requested = min(4, len(muscle_group_ids))
+        for _ in range(options['iterations']):
+            requested = rng.sample(muscle_group_ids,
+                                   rng.randint(1, max_requested))
+            session_duration = rng.choice([30, 45, 60, 90])
+            goal = rng.choice(list(GOAL_SCHEMES))
+            start = time.perf_counter()
+            index.generate(requested, session_duration, goal=goal, rng=rng)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"Index of {options['exercises']} exercises and "
+            f"{options['muscle_groups']} muscle groups built "
+            f"in {build_ms:.1f}ms.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['iterations']} plans: "
+            f"mean {statistics.mean(timings):.3f}ms, "
+            f"p50 {statistics.median(timings):.3f}ms, "
+            f"p99 {p99:.3f}ms."))
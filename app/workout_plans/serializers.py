@@ -1,18 +1,32 @@
 """
 Serializers for the workout_plans API View.
 """
+import random
+
+from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
 from core.models import Exercise, WorkoutPlan,\
     WorkoutExercise, MuscleGroup
+from core.relations import BulkPrimaryKeyRelatedField, BulkListSerializer
+from core.serializers import SparseFieldsetSerializerMixin
+from workout_plans.generator import GOAL_SCHEMES, MINUTES_PER_EXERCISE, \
+    get_exercise_index
+
+WORKOUT_EXERCISE_UPDATE_FIELDS = ['sets', 'repetitions', 'duration']
+_DUPLICATE_OPERATION_MESSAGE = \
+    'Workout exercise appears in more than one operation.'
 
 
-class MuscleGroupSerializer(serializers.ModelSerializer):
+class MuscleGroupSerializer(SparseFieldsetSerializerMixin,
+                            serializers.ModelSerializer):
     class Meta:
         model = MuscleGroup
         fields = ['id', 'name', 'description']
 
 
-class ExerciseSerializer(serializers.ModelSerializer):
+class ExerciseSerializer(SparseFieldsetSerializerMixin,
+                         serializers.ModelSerializer):
     target_muscles = MuscleGroupSerializer(many=True,
                                            read_only=True)
 
@@ -22,25 +36,45 @@ class ExerciseSerializer(serializers.ModelSerializer):
                   'instructions', 'target_muscles']
 
 
-class WorkoutExerciseSerializer(serializers.ModelSerializer):
-    exercise = serializers.PrimaryKeyRelatedField(
+class UserWorkoutPlanField(BulkPrimaryKeyRelatedField):
+    """Workout plan of the requesting user, by primary key."""
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        if request is None:
+            return WorkoutPlan.objects.none()
+        return WorkoutPlan.objects.filter(user=request.user)
+
+
+class WorkoutExerciseSerializer(SparseFieldsetSerializerMixin,
+                                serializers.ModelSerializer):
+    exercise = BulkPrimaryKeyRelatedField(
         queryset=Exercise.objects.all())
-    workout_plan = serializers.PrimaryKeyRelatedField(
+    workout_plan = UserWorkoutPlanField(
         queryset=WorkoutPlan.objects.all(), write_only=True)
 
     class Meta:
         model = WorkoutExercise
         fields = ['id', 'workout_plan', 'exercise',
                   'sets', 'repetitions', 'duration']
+        list_serializer_class = BulkListSerializer
 
     def create(self, validated_data):
         return WorkoutExercise.objects.create(**validated_data)
 
 
-class WorkoutPlanSerializer(serializers.ModelSerializer):
+class NestedWorkoutExerciseSerializer(WorkoutExerciseSerializer):
+    """Serializer for workout exercises written through their plan."""
+    workout_plan = UserWorkoutPlanField(
+        queryset=WorkoutPlan.objects.all(), write_only=True,
+        required=False)
+
+
+class WorkoutPlanSerializer(SparseFieldsetSerializerMixin,
+                            serializers.ModelSerializer):
     workout_exercises = WorkoutExerciseSerializer(
         many=True, read_only=True)
-    create_workout_exercises = WorkoutExerciseSerializer(
+    create_workout_exercises = NestedWorkoutExerciseSerializer(
         many=True, write_only=True, required=False)
 
     class Meta:
@@ -49,15 +83,17 @@ class WorkoutPlanSerializer(serializers.ModelSerializer):
                   'session_duration', 'workout_exercises',
                   'create_workout_exercises']
 
+    @transaction.atomic
     def create(self, validated_data):
         workout_exercises_data = validated_data.pop(
             'create_workout_exercises', [])
         workout_plan = WorkoutPlan.objects.create(**validated_data)
-        for workout_exercise_data in workout_exercises_data:
-            WorkoutExercise.objects.create(
-                workout_plan=workout_plan, **workout_exercise_data)
+        WorkoutExercise.objects.bulk_create(
+            self._build_workout_exercises(
+                workout_plan, workout_exercises_data))
         return workout_plan
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.title = validated_data.get('title', instance.title)
         instance.frequency = validated_data.get(
@@ -67,11 +103,271 @@ class WorkoutPlanSerializer(serializers.ModelSerializer):
             'session_duration', instance.session_duration)
 
         if 'create_workout_exercises' in validated_data:
-            instance.workout_exercises.all().delete()
-            for workout_exercise_data\
-                    in validated_data['create_workout_exercises']:
-                WorkoutExercise.objects.create(
-                    workout_plan=instance, **workout_exercise_data)
+            self._sync_workout_exercises(
+                instance, validated_data['create_workout_exercises'])
 
         instance.save()
         return instance
+
+    def _build_workout_exercises(self, workout_plan, workout_exercises_data):
+        """Return unsaved workout exercises belonging to the plan."""
+        workout_exercises = []
+        for workout_exercise_data in workout_exercises_data:
+            workout_exercise_data = dict(workout_exercise_data)
+            workout_exercise_data.pop('workout_plan', None)
+            workout_exercises.append(WorkoutExercise(
+                workout_plan=workout_plan, **workout_exercise_data))
+        return workout_exercises
+
+    def _sync_workout_exercises(self, workout_plan, workout_exercises_data):
+        """Replace the plan's workout exercises, writing only the diff.
+
+        Existing rows are matched to the requested ones by exercise in
+        id order, so unchanged rows keep their ids. Changed rows are
+        updated, new rows inserted and unmatched rows deleted, each in
+        a single query.
+        """
+        existing = {}
+        for workout_exercise in workout_plan.workout_exercises.order_by('id'):
+            existing.setdefault(
+                workout_exercise.exercise_id, []).append(workout_exercise)
+
+        to_create = []
+        to_update = []
+        for requested in self._build_workout_exercises(
+                workout_plan, workout_exercises_data):
+            matches = existing.get(requested.exercise_id)
+            if not matches:
+                to_create.append(requested)
+                continue
+            workout_exercise = matches.pop(0)
+            changed = False
+            for field in WORKOUT_EXERCISE_UPDATE_FIELDS:
+                value = getattr(requested, field)
+                if getattr(workout_exercise, field) != value:
+                    setattr(workout_exercise, field, value)
+                    changed = True
+            if changed:
+                to_update.append(workout_exercise)
+
+        stale_ids = [workout_exercise.id
+                     for matches in existing.values()
+                     for workout_exercise in matches]
+        if stale_ids:
+            WorkoutExercise.objects.filter(id__in=stale_ids).delete()
+        if to_update:
+            WorkoutExercise.objects.bulk_update(
+                to_update, WORKOUT_EXERCISE_UPDATE_FIELDS)
+            WorkoutExercise.objects.filter(id__in=[
+                workout_exercise.id for workout_exercise in to_update
+            ]).update(version=F('version') + 1)
+        if to_create:
+            WorkoutExercise.objects.bulk_create(to_create)
+
+
+class WorkoutExerciseOperationSerializer(serializers.Serializer):
+    """Serializer for one operation of a workout exercise batch."""
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    op = serializers.ChoiceField(choices=[CREATE, UPDATE, DELETE])
+    id = serializers.IntegerField(required=False)
+    workout_plan = serializers.IntegerField(required=False)
+    exercise = serializers.IntegerField(required=False)
+    sets = serializers.IntegerField(required=False)
+    repetitions = serializers.IntegerField(required=False)
+    duration = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        required = ['workout_plan', 'exercise'] \
+            if attrs['op'] == self.CREATE else ['id']
+        errors = {field: [serializers.Field.default_error_messages[
+            'required']] for field in required if field not in attrs}
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+
+class WorkoutExerciseBulkSerializer(serializers.Serializer):
+    """Serializer applying a batch of workout exercise operations.
+
+    Plans, workout exercises and exercises referenced by the batch are
+    each resolved with one query, and the writes run in one
+    transaction with one DELETE, one UPDATE and one INSERT.
+    """
+    operations = WorkoutExerciseOperationSerializer(
+        many=True, allow_empty=False)
+
+    def validate_operations(self, operations):
+        user = self.context['request'].user
+        plan_ids = {operation['workout_plan'] for operation in operations
+                    if operation['op'] == WorkoutExerciseOperationSerializer
+                    .CREATE}
+        workout_exercise_ids = [operation['id'] for operation in operations
+                                if 'id' in operation and operation['op'] !=
+                                WorkoutExerciseOperationSerializer.CREATE]
+        exercise_ids = {operation['exercise'] for operation in operations
+                        if 'exercise' in operation}
+
+        plans = WorkoutPlan.objects.filter(
+            user=user, id__in=plan_ids).in_bulk()
+        workout_exercises = WorkoutExercise.objects.filter(
+            workout_plan__user=user,
+            id__in=workout_exercise_ids).in_bulk()
+        exercises = Exercise.objects.in_bulk(exercise_ids)
+
+        errors = []
+        seen = set()
+        for operation in operations:
+            item_errors = {}
+            if operation['op'] == WorkoutExerciseOperationSerializer.CREATE:
+                operation.pop('id', None)
+                plan = plans.get(operation['workout_plan'])
+                if plan is None:
+                    item_errors['workout_plan'] = [
+                        self._does_not_exist(operation['workout_plan'])]
+                operation['workout_plan'] = plan
+            else:
+                operation.pop('workout_plan', None)
+                workout_exercise = workout_exercises.get(operation['id'])
+                if workout_exercise is None:
+                    item_errors['id'] = [
+                        self._does_not_exist(operation['id'])]
+                elif operation['id'] in seen:
+                    item_errors['id'] = [_DUPLICATE_OPERATION_MESSAGE]
+                seen.add(operation['id'])
+                operation['instance'] = workout_exercise
+            if 'exercise' in operation:
+                exercise = exercises.get(operation['exercise'])
+                if exercise is None:
+                    item_errors['exercise'] = [
+                        self._does_not_exist(operation['exercise'])]
+                operation['exercise'] = exercise
+            errors.append(item_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return operations
+
+    def _does_not_exist(self, pk_value):
+        return serializers.PrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist'].format(pk_value=pk_value)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        results = []
+        to_create = []
+        to_update = []
+        to_delete = []
+        for operation in validated_data['operations']:
+            op = operation.pop('op')
+            if op == WorkoutExerciseOperationSerializer.CREATE:
+                workout_exercise = WorkoutExercise(**operation)
+                to_create.append(workout_exercise)
+            elif op == WorkoutExerciseOperationSerializer.UPDATE:
+                workout_exercise = operation.pop('instance')
+                operation.pop('id')
+                for field, value in operation.items():
+                    setattr(workout_exercise, field, value)
+                to_update.append(workout_exercise)
+            else:
+                workout_exercise = operation['instance']
+                to_delete.append(workout_exercise.id)
+            results.append((op, workout_exercise))
+
+        if to_delete:
+            WorkoutExercise.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            WorkoutExercise.objects.bulk_update(
+                to_update, ['exercise'] + WORKOUT_EXERCISE_UPDATE_FIELDS)
+            WorkoutExercise.objects.filter(id__in=[
+                workout_exercise.id for workout_exercise in to_update
+            ]).update(version=F('version') + 1)
+        if to_create:
+            WorkoutExercise.objects.bulk_create(to_create)
+        WorkoutPlan.objects.filter(id__in={
+            workout_exercise.workout_plan_id for _, workout_exercise in results
+        }).update(version=F('version') + 1)
+        return results
+
+    def to_representation(self, instance):
+        results = []
+        for op, workout_exercise in instance:
+            if op == WorkoutExerciseOperationSerializer.DELETE:
+                result = {'id': workout_exercise.id}
+            else:
+                result = WorkoutExerciseSerializer(workout_exercise).data
+                result['workout_plan'] = workout_exercise.workout_plan_id
+            results.append({'op': op, **result})
+        return {'results': results}
+
+
+class WorkoutPlanAssignmentSerializer(serializers.Serializer):
+    """Serializer for assigning a template plan to users."""
+    users = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False,
+        write_only=True)
+    assigned = serializers.IntegerField(read_only=True)
+    skipped = serializers.IntegerField(read_only=True)
+    workout_exercises = serializers.IntegerField(read_only=True)
+    seconds = serializers.FloatField(read_only=True)
+    plans_per_second = serializers.FloatField(read_only=True)
+
+
+class TrainingVolumeSerializer(serializers.Serializer):
+    """Serializer for the weekly training volume of a muscle group."""
+    muscle_group = serializers.IntegerField()
+    name = serializers.CharField()
+    weekly_sets = serializers.IntegerField()
+    weekly_repetitions = serializers.IntegerField()
+    weekly_duration = serializers.IntegerField()
+
+
+class WorkoutPlanGenerateSerializer(serializers.Serializer):
+    """Serializer for generating a personalized workout plan."""
+    title = serializers.CharField(max_length=255, required=False)
+    muscle_groups = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False)
+    frequency = serializers.IntegerField(min_value=1, max_value=7)
+    session_duration = serializers.IntegerField(
+        min_value=MINUTES_PER_EXERCISE)
+    goal = serializers.ChoiceField(choices=list(GOAL_SCHEMES),
+                                   required=False)
+    seed = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        index = get_exercise_index()
+        for muscle_group_id in attrs['muscle_groups']:
+            if muscle_group_id not in index.muscle_groups:
+                raise serializers.ValidationError({'muscle_groups': [
+                    serializers.PrimaryKeyRelatedField
+                    .default_error_messages['does_not_exist']
+                    .format(pk_value=muscle_group_id)]})
+
+        attrs['workout_exercises'] = index.generate(
+            attrs['muscle_groups'], attrs['session_duration'],
+            goal=attrs.get('goal'), rng=random.Random(attrs.get('seed')))
+        if not attrs['workout_exercises']:
+            raise serializers.ValidationError({'muscle_groups': [
+                'No exercises target the requested muscle groups.']})
+        if 'title' not in attrs:
+            names = ', '.join(index.muscle_groups[muscle_group_id]
+                              for muscle_group_id
+                              in dict.fromkeys(attrs['muscle_groups']))
+            attrs['title'] = f'Generated plan: {names}'[:255]
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        workout_plan = WorkoutPlan.objects.create(
+            user=validated_data['user'],
+            title=validated_data['title'],
+            frequency=validated_data['frequency'],
+            goal=validated_data.get('goal'),
+            session_duration=validated_data['session_duration'])
+        WorkoutExercise.objects.bulk_create([
+            WorkoutExercise(workout_plan=workout_plan, **workout_exercise)
+            for workout_exercise in validated_data['workout_exercises']
+        ])
+        return workout_plan
@@ -0,0 +1,107 @@
+"""
+Test the workout_plans management commands.
+"""
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Exercise, WorkoutPlan, WorkoutExercise
+from workout_plans.assignment import assign_workout_plan, \
+    copy_workout_exercises, insert_workout_plans
+
+
+class AssignWorkoutPlanCommandTests(TestCase):
+    """Test the assign_workout_plan command."""
+
+    def setUp(self):
+        coach = get_user_model().objects.create_user(
+            'coach@example.com', 'testpass')
+        self.template = WorkoutPlan.objects.create(
+            user=coach, title='Cohort Plan',
+            frequency=3, session_duration=45)
+        exercise = Exercise.objects.create(
+            name='Squat', description='Squat description',
+            instructions='Do a squat')
+        WorkoutExercise.objects.create(
+            workout_plan=self.template, exercise=exercise,
+            sets=5, repetitions=5)
+        self.users = [
+            get_user_model().objects.create_user(
+                f'client{i}@example.com', 'testpass')
+            for i in range(5)
+        ]
+
+    def test_assign_workout_plan_in_chunks(self):
+        """Test the plan is assigned to every user across chunks."""
+        out = StringIO()
+
+        call_command('assign_workout_plan', self.template.id,
+                     '--users', *[str(user.id) for user in self.users],
+                     '--chunk-size', '2', stdout=out)
+
+        self.assertIn('to 5 users', out.getvalue())
+        self.assertIn('plans/s', out.getvalue())
+        for user in self.users:
+            workout_plan = WorkoutPlan.objects.get(user=user)
+            self.assertEqual(workout_plan.workout_exercises.count(), 1)
+
+    def test_assign_workout_plan_twice(self):
+        """Test running the command again skips assigned users."""
+        user_ids = [str(user.id) for user in self.users]
+        call_command('assign_workout_plan', self.template.id,
+                     '--users', *user_ids, stdout=StringIO())
+        out = StringIO()
+
+        call_command('assign_workout_plan', self.template.id,
+                     '--users', *user_ids, stdout=out)
+
+        self.assertIn('to 0 users (5 skipped', out.getvalue())
+        self.assertEqual(
+            WorkoutPlan.objects.filter(template=self.template).count(), 5)
+
+    def test_assign_concurrently_assigned_users_skipped(self):
+        """Test users assigned the plan by another run are skipped."""
+        def assign_concurrently(template, user_ids):
+            # Another assignment commits a copy after the users were read.
+            concurrent = WorkoutPlan.objects.create(
+                user=self.users[0], template=template, title=template.title,
+                frequency=template.frequency,
+                session_duration=template.session_duration)
+            copy_workout_exercises(template, [concurrent.id])
+            return insert_workout_plans(template, user_ids)
+
+        with mock.patch('workout_plans.assignment.insert_workout_plans',
+                        side_effect=assign_concurrently):
+            result = assign_workout_plan(
+                self.template, [user.id for user in self.users])
+
+        self.assertEqual(result['assigned'], 4)
+        self.assertEqual(result['workout_exercises'], 4)
+        workout_plan = WorkoutPlan.objects.get(user=self.users[0])
+        self.assertEqual(workout_plan.workout_exercises.count(), 1)
+
+    def test_assign_unknown_workout_plan(self):
+        """Test an unknown template raises a CommandError."""
+        with self.assertRaises(CommandError):
+            call_command('assign_workout_plan', 0,
+                         '--users', str(self.users[0].id),
+                         stdout=StringIO())
+
+
+class BenchmarkPlanGeneratorCommandTests(TestCase):
+    """Test the benchmark_plan_generator command."""
+
+    def test_benchmark_plan_generator(self):
+        """Test the benchmark reports generation timings."""
+        out = StringIO()
+
+        call_command('benchmark_plan_generator', '--exercises', '200',
+                     '--muscle-groups', '5', '--iterations', '20',
+                     stdout=out)
+
+        self.assertIn('Index of 200 exercises', out.getvalue())
+        self.assertIn('Generated 20 plans', out.getvalue())
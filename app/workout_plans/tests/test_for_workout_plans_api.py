@@ -1,11 +1,14 @@
 """
 Tests for the workout_plans API.
 """
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
-from core.models import Exercise,\
+from core.models import Exercise, MuscleGroup,\
     WorkoutPlan, WorkoutExercise
 from workout_plans.serializers import \
     WorkoutPlanSerializer
@@ -21,6 +24,26 @@ def workout_plan_detail_url(workout_plan_id):
     return reverse('workout-plan-detail', args=[workout_plan_id])
 
 
+def workout_plan_assign_url(workout_plan_id):
+    return reverse('workout-plan-assign', args=[workout_plan_id])
+
+
+def workout_plan_volume_url():
+    return reverse('workout-plan-volume')
+
+
+def workout_plan_export_url():
+    return reverse('workout-plan-export')
+
+
+def workout_plan_generate_url():
+    return reverse('workout-plan-generate')
+
+
+def plan_exercise_url():
+    return reverse('plan-exercise-list')
+
+
 def workout_exercise_url():
     return reverse('workout-exercise-list')
 
@@ -29,6 +52,10 @@ def workout_exercise_detail_url(workout_exercise_id):
     return reverse('workout-exercise-detail', args=[workout_exercise_id])
 
 
+def workout_exercise_bulk_url():
+    return reverse('workout-exercise-bulk')
+
+
 # Public API tests
 class PublicWorkoutApiTests(APITestCase):
     def test_login_required_for_retrieving_workout_plans(self):
@@ -59,7 +86,7 @@ class PrivateWorkoutApiTests(APITestCase):
         serializer = WorkoutPlanSerializer(workout_plans, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_workout_plans_limited_to_user(self):
         other_user = get_user_model().objects.create_user(
@@ -73,8 +100,8 @@ class PrivateWorkoutApiTests(APITestCase):
         res = self.client.get(workout_plan_url())
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['id'], workout_plan.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['id'], workout_plan.id)
 
     def test_retrieve_workout_plan_detail(self):
         """Test retrieving a single workout plan detail"""
@@ -139,7 +166,7 @@ class PrivateWorkoutApiTests(APITestCase):
         serializer = WorkoutPlanSerializer(workout_plans, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_create_workout_exercise(self):
         """Test creating workout exercise"""
@@ -177,8 +204,8 @@ class PrivateWorkoutApiTests(APITestCase):
             sets=4, repetitions=15, duration=75)
         res = self.client.get(workout_exercise_url())
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['exercise'], exercise.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['exercise'], exercise.id)
 
     def test_retrieve_workout_exercise_detail(self):
         """Test retrieving a single workout exercise detail"""
@@ -240,3 +267,1007 @@ class PrivateWorkoutApiTests(APITestCase):
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(
             WorkoutExercise.objects.filter(id=workout_exercise.id).exists())
+
+    def test_other_users_workout_exercise_not_found(self):
+        """Test workout exercises of other users' plans are hidden"""
+        other_user = get_user_model().objects.create_user(
+            'other-exercise@example.com', 'testpass')
+        other_plan = WorkoutPlan.objects.create(
+            user=other_user, title='Other Plan',
+            frequency=3, session_duration=30)
+        exercise = Exercise.objects.create(
+            name='Lunge', description='Lunge description',
+            instructions='Do a lunge')
+        workout_exercise = WorkoutExercise.objects.create(
+            workout_plan=other_plan, exercise=exercise, sets=3)
+        url = workout_exercise_detail_url(workout_exercise.id)
+
+        self.assertEqual(self.client.get(url).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.patch(url, {'sets': 5}).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(workout_exercise_url())
+                         .data['results'], [])
+
+    def test_move_workout_exercise_between_plans(self):
+        """Test moving an exercise bumps both plans, but only own plans"""
+        plans = [
+            WorkoutPlan.objects.create(
+                user=self.user, title=f'Plan {number}',
+                frequency=3, session_duration=30)
+            for number in range(2)
+        ]
+        other_plan = WorkoutPlan.objects.create(
+            user=get_user_model().objects.create_user(
+                'other-move@example.com', 'testpass'),
+            title='Other Plan', frequency=3, session_duration=30)
+        exercise = Exercise.objects.create(
+            name='Row', description='Row description',
+            instructions='Do a row')
+        workout_exercise = WorkoutExercise.objects.create(
+            workout_plan=plans[0], exercise=exercise, sets=3)
+        url = workout_exercise_detail_url(workout_exercise.id)
+
+        res = self.client.patch(url, {'workout_plan': other_plan.id})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('workout_plan', res.data)
+
+        res = self.client.patch(url, {'workout_plan': plans[1].id})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        workout_exercise.refresh_from_db()
+        self.assertEqual(workout_exercise.workout_plan, plans[1])
+        for plan in plans:
+            plan.refresh_from_db()
+            self.assertEqual(plan.version, 2)
+
+
+class WorkoutPlanQueryCountTests(APITestCase):
+    """Test the workout plan endpoints run a fixed number of queries."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'budget@example.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.exercises = [
+            Exercise.objects.create(
+                name=f'Exercise {i}', description='Description',
+                instructions='Instructions')
+            for i in range(3)
+        ]
+
+    def create_workout_plan(self, title):
+        workout_plan = WorkoutPlan.objects.create(
+            user=self.user, title=title,
+            frequency=3, session_duration=60)
+        for exercise in self.exercises:
+            WorkoutExercise.objects.create(
+                workout_plan=workout_plan, exercise=exercise,
+                sets=3, repetitions=10)
+        return workout_plan
+
+    def test_list_workout_plans_query_count(self):
+        """Test listing plans does not issue a query per plan"""
+        for i in range(10):
+            self.create_workout_plan(f'Plan {i}')
+
+        with self.assertNumQueries(2):
+            res = self.client.get(workout_plan_url())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 10)
+        for workout_plan in res.data['results']:
+            self.assertEqual(len(workout_plan['workout_exercises']), 3)
+
+    def test_list_workout_plans_from_values_rows(self):
+        """Test ?values=1 lists plans from values rows"""
+        for i in range(3):
+            self.create_workout_plan(f'Plan {i}')
+        res = self.client.get(workout_plan_url())
+
+        with self.assertNumQueries(2):
+            values_res = self.client.get(workout_plan_url(), {'values': '1'})
+
+        self.assertEqual(values_res.status_code, status.HTTP_200_OK)
+        self.assertEqual(values_res.data['results'], res.data['results'])
+
+    def test_list_workout_plans_query_count_constant(self):
+        """Test the list query count does not grow with plans"""
+        self.create_workout_plan('First Plan')
+        with self.assertNumQueries(2):
+            self.client.get(workout_plan_url())
+
+        for i in range(20):
+            self.create_workout_plan(f'Plan {i}')
+        with self.assertNumQueries(2):
+            self.client.get(workout_plan_url())
+
+    def test_list_workout_plans_deep_page_query_count(self):
+        """Test later pages cost the same number of queries"""
+        for i in range(6):
+            self.create_workout_plan(f'Plan {i}')
+        res = self.client.get(workout_plan_url(), {'page_size': 2})
+        seen = [workout_plan['id'] for workout_plan in res.data['results']]
+
+        while res.data['next']:
+            with self.assertNumQueries(2):
+                res = self.client.get(res.data['next'])
+            seen += [workout_plan['id']
+                     for workout_plan in res.data['results']]
+
+        self.assertEqual(
+            seen,
+            list(WorkoutPlan.objects.filter(user=self.user)
+                 .order_by('id').values_list('id', flat=True)))
+
+    def test_list_exercises_query_count(self):
+        """Test nested muscle groups are prefetched, then cached"""
+        cache.clear()
+        muscle_group = MuscleGroup.objects.create(name='Budget Muscle')
+        for exercise in self.exercises:
+            exercise.target_muscles.set([muscle_group])
+
+        with self.assertNumQueries(2):
+            res = self.client.get(plan_exercise_url(), {'page_size': 200})
+        with self.assertNumQueries(0):
+            cached = self.client.get(plan_exercise_url(), {'page_size': 200})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.data, res.data)
+
+    def test_retrieve_workout_plan_query_count(self):
+        """Test retrieving a plan loads its exercises in one query"""
+        workout_plan = self.create_workout_plan('Detail Plan')
+
+        with self.assertNumQueries(2):
+            res = self.client.get(workout_plan_detail_url(workout_plan.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['workout_exercises']), 3)
+
+
+class WorkoutPlanNestedWriteTests(APITestCase):
+    """Test writing workout exercises through their workout plan."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'nested@example.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.squat = Exercise.objects.create(
+            name='Squat', description='Squat description',
+            instructions='Do a squat')
+        self.lunge = Exercise.objects.create(
+            name='Lunge', description='Lunge description',
+            instructions='Do a lunge')
+        self.plank = Exercise.objects.create(
+            name='Plank', description='Plank description',
+            instructions='Hold a plank')
+
+    def test_create_workout_plan_with_exercises(self):
+        """Test creating a plan creates its workout exercises"""
+        payload = {
+            'user': self.user.id,
+            'title': 'Leg Day',
+            'frequency': 2,
+            'session_duration': 45,
+            'create_workout_exercises': [
+                {'exercise': self.squat.id, 'sets': 5, 'repetitions': 5},
+                {'exercise': self.lunge.id, 'sets': 3, 'repetitions': 12},
+            ],
+        }
+        res = self.client.post(workout_plan_url(), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        workout_plan = WorkoutPlan.objects.get(id=res.data['id'])
+        self.assertEqual(workout_plan.user, self.user)
+        workout_exercises = workout_plan.workout_exercises.order_by('id')
+        self.assertEqual(
+            [(we.exercise, we.sets, we.repetitions)
+             for we in workout_exercises],
+            [(self.squat, 5, 5), (self.lunge, 3, 12)])
+        self.assertEqual(len(res.data['workout_exercises']), 2)
+
+    def test_create_workout_plan_query_count_constant(self):
+        """Test nested exercises are validated in a fixed number of queries"""
+        def payload(size):
+            return {
+                'user': self.user.id,
+                'title': 'Volume',
+                'frequency': 5,
+                'session_duration': 90,
+                'create_workout_exercises': [
+                    {'exercise': self.squat.id, 'sets': 3, 'repetitions': 5}
+                    for _ in range(size)
+                ],
+            }
+
+        with self.assertNumQueries(7):
+            self.client.post(workout_plan_url(), payload(1), format='json')
+        with self.assertNumQueries(7):
+            res = self.client.post(workout_plan_url(), payload(50),
+                                   format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['workout_exercises']), 50)
+
+    def test_create_workout_plan_with_missing_exercise(self):
+        """Test unknown nested exercises are reported per item"""
+        payload = {
+            'user': self.user.id,
+            'title': 'Leg Day',
+            'frequency': 2,
+            'session_duration': 45,
+            'create_workout_exercises': [
+                {'exercise': self.squat.id},
+                {'exercise': 0},
+            ],
+        }
+        res = self.client.post(workout_plan_url(), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['create_workout_exercises'],
+            [{}, {'exercise': ['Invalid pk "0" - object does not exist.']}])
+        self.assertFalse(WorkoutPlan.objects.exists())
+
+    def test_update_workout_plan_applies_exercise_diff(self):
+        """Test updating a plan keeps unchanged workout exercises"""
+        workout_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Leg Day',
+            frequency=2, session_duration=45)
+        unchanged = WorkoutExercise.objects.create(
+            workout_plan=workout_plan, exercise=self.squat,
+            sets=5, repetitions=5)
+        changed = WorkoutExercise.objects.create(
+            workout_plan=workout_plan, exercise=self.lunge,
+            sets=3, repetitions=12)
+        removed = WorkoutExercise.objects.create(
+            workout_plan=workout_plan, exercise=self.plank,
+            sets=1, repetitions=1, duration=60)
+        payload = {
+            'user': self.user.id,
+            'title': 'Leg Day',
+            'frequency': 2,
+            'session_duration': 45,
+            'create_workout_exercises': [
+                {'exercise': self.squat.id, 'sets': 5, 'repetitions': 5},
+                {'exercise': self.lunge.id, 'sets': 4, 'repetitions': 10},
+                {'exercise': self.squat.id, 'sets': 2, 'repetitions': 20},
+            ],
+        }
+        url = workout_plan_detail_url(workout_plan.id)
+        res = self.client.put(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            WorkoutExercise.objects.filter(id=removed.id).exists())
+        unchanged_after = WorkoutExercise.objects.get(id=unchanged.id)
+        self.assertEqual(
+            (unchanged_after.sets, unchanged_after.repetitions), (5, 5))
+        changed.refresh_from_db()
+        self.assertEqual((changed.sets, changed.repetitions), (4, 10))
+        added = workout_plan.workout_exercises.exclude(
+            id__in=[unchanged.id, changed.id])
+        self.assertEqual(
+            [(we.exercise, we.sets, we.repetitions) for we in added],
+            [(self.squat, 2, 20)])
+        self.assertEqual(len(res.data['workout_exercises']), 3)
+
+    def test_update_workout_plan_resets_omitted_fields(self):
+        """Test fields left out of a replaced exercise use defaults"""
+        workout_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Core',
+            frequency=3, session_duration=20)
+        workout_exercise = WorkoutExercise.objects.create(
+            workout_plan=workout_plan, exercise=self.plank,
+            sets=3, repetitions=1, duration=60)
+        payload = {
+            'user': self.user.id,
+            'title': 'Core',
+            'frequency': 3,
+            'session_duration': 20,
+            'create_workout_exercises': [
+                {'exercise': self.plank.id, 'sets': 3},
+            ],
+        }
+        url = workout_plan_detail_url(workout_plan.id)
+        res = self.client.put(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        workout_exercise.refresh_from_db()
+        self.assertEqual(workout_exercise.repetitions, 0)
+        self.assertIsNone(workout_exercise.duration)
+
+    def test_update_workout_plan_without_exercises_keeps_them(self):
+        """Test a partial update without exercises leaves them alone"""
+        workout_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Core',
+            frequency=3, session_duration=20)
+        workout_exercise = WorkoutExercise.objects.create(
+            workout_plan=workout_plan, exercise=self.plank,
+            sets=3, repetitions=1, duration=60)
+
+        url = workout_plan_detail_url(workout_plan.id)
+        res = self.client.patch(url, {'title': 'Abs'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(workout_plan.workout_exercises.all()), [workout_exercise])
+        workout_plan.refresh_from_db()
+        self.assertEqual(workout_plan.title, 'Abs')
+
+    def test_update_many_unchanged_exercises_writes_nothing(self):
+        """Test re-sending unchanged exercises keeps every row"""
+        workout_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Volume',
+            frequency=5, session_duration=90)
+        WorkoutExercise.objects.bulk_create([
+            WorkoutExercise(workout_plan=workout_plan, exercise=self.squat,
+                            sets=3, repetitions=i)
+            for i in range(40)
+        ])
+        ids = list(workout_plan.workout_exercises.values_list('id', flat=True))
+        payload = {
+            'user': self.user.id,
+            'title': 'Volume',
+            'frequency': 5,
+            'session_duration': 90,
+            'create_workout_exercises': [
+                {'exercise': self.squat.id, 'sets': 3, 'repetitions': i}
+                for i in range(40)
+            ],
+        }
+        url = workout_plan_detail_url(workout_plan.id)
+        res = self.client.put(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(workout_plan.workout_exercises.order_by('id')
+                 .values_list('id', flat=True)),
+            sorted(ids))
+
+
+class WorkoutExerciseBulkApiTests(APITestCase):
+    """Test the workout exercise batch endpoint."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'bulk@example.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.workout_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Bulk Plan',
+            frequency=3, session_duration=60)
+        self.exercise = Exercise.objects.create(
+            name='Row', description='Row description',
+            instructions='Do a row')
+
+    def create_workout_exercise(self, workout_plan=None, **params):
+        return WorkoutExercise.objects.create(
+            workout_plan=workout_plan or self.workout_plan,
+            exercise=self.exercise, **params)
+
+    def test_login_required(self):
+        """Test the batch endpoint requires authentication"""
+        self.client.force_authenticate(None)
+        res = self.client.post(workout_exercise_bulk_url(),
+                               {'operations': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_create_update_delete(self):
+        """Test applying mixed operations returns per-item results"""
+        updated = self.create_workout_exercise(sets=3, repetitions=10)
+        deleted = self.create_workout_exercise(sets=1, repetitions=1)
+        payload = {'operations': [
+            {'op': 'create', 'workout_plan': self.workout_plan.id,
+             'exercise': self.exercise.id, 'sets': 4, 'repetitions': 8},
+            {'op': 'update', 'id': updated.id, 'sets': 5},
+            {'op': 'delete', 'id': deleted.id},
+        ]}
+        res = self.client.post(workout_exercise_bulk_url(),
+                               payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        created, update_result, delete_result = res.data['results']
+        self.assertEqual(created['op'], 'create')
+        self.assertEqual(created['workout_plan'], self.workout_plan.id)
+        self.assertEqual((created['sets'], created['repetitions']), (4, 8))
+        self.assertTrue(
+            WorkoutExercise.objects.filter(id=created['id']).exists())
+        self.assertEqual(update_result['op'], 'update')
+        self.assertEqual(update_result['sets'], 5)
+        updated.refresh_from_db()
+        self.assertEqual((updated.sets, updated.repetitions), (5, 10))
+        self.assertEqual(delete_result, {'op': 'delete', 'id': deleted.id})
+        self.assertFalse(
+            WorkoutExercise.objects.filter(id=deleted.id).exists())
+
+    def test_bulk_query_count_constant(self):
+        """Test a batch costs the same queries regardless of its size"""
+        def payload(size):
+            workout_exercises = [
+                self.create_workout_exercise(sets=1, repetitions=1)
+                for _ in range(size * 2)]
+            operations = []
+            for i in range(size):
+                operations += [
+                    {'op': 'create', 'workout_plan': self.workout_plan.id,
+                     'exercise': self.exercise.id},
+                    {'op': 'update', 'id': workout_exercises[i].id,
+                     'sets': 2},
+                    {'op': 'delete', 'id': workout_exercises[size + i].id},
+                ]
+            return {'operations': operations}
+
+        small = payload(1)
+        large = payload(20)
+        with self.assertNumQueries(10):
+            self.client.post(workout_exercise_bulk_url(),
+                             small, format='json')
+        with self.assertNumQueries(10):
+            res = self.client.post(workout_exercise_bulk_url(),
+                                   large, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 60)
+
+    def test_bulk_rejects_other_users_plans(self):
+        """Test operations on another user's plan fail and write nothing"""
+        other_user = get_user_model().objects.create_user(
+            'bulk-other@example.com', 'testpass')
+        other_plan = WorkoutPlan.objects.create(
+            user=other_user, title='Other Plan',
+            frequency=3, session_duration=60)
+        other_workout_exercise = self.create_workout_exercise(
+            workout_plan=other_plan, sets=3, repetitions=10)
+        payload = {'operations': [
+            {'op': 'create', 'workout_plan': self.workout_plan.id,
+             'exercise': self.exercise.id},
+            {'op': 'create', 'workout_plan': other_plan.id,
+             'exercise': self.exercise.id},
+            {'op': 'delete', 'id': other_workout_exercise.id},
+        ]}
+        res = self.client.post(workout_exercise_bulk_url(),
+                               payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = res.data['operations']
+        self.assertEqual(errors[0], {})
+        self.assertIn('workout_plan', errors[1])
+        self.assertIn('id', errors[2])
+        self.assertFalse(self.workout_plan.workout_exercises.exists())
+        self.assertTrue(WorkoutExercise.objects.filter(
+            id=other_workout_exercise.id).exists())
+
+    def test_bulk_missing_fields_report_errors(self):
+        """Test operations missing required fields are reported"""
+        payload = {'operations': [
+            {'op': 'create', 'workout_plan': self.workout_plan.id},
+            {'op': 'delete'},
+        ]}
+        res = self.client.post(workout_exercise_bulk_url(),
+                               payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('exercise', res.data['operations'][0])
+        self.assertIn('id', res.data['operations'][1])
+        self.assertFalse(self.workout_plan.workout_exercises.exists())
+
+    def test_bulk_invalid_references_report_errors(self):
+        """Test duplicate ids and unknown exercises are reported"""
+        workout_exercise = self.create_workout_exercise(
+            sets=3, repetitions=10)
+        payload = {'operations': [
+            {'op': 'update', 'id': workout_exercise.id, 'sets': 4},
+            {'op': 'delete', 'id': workout_exercise.id},
+            {'op': 'create', 'workout_plan': self.workout_plan.id,
+             'exercise': 0},
+        ]}
+        res = self.client.post(workout_exercise_bulk_url(),
+                               payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['operations'][0], {})
+        self.assertIn('id', res.data['operations'][1])
+        self.assertIn('exercise', res.data['operations'][2])
+        workout_exercise.refresh_from_db()
+        self.assertEqual(workout_exercise.sets, 3)
+
+
+class WorkoutPlanConditionalRequestTests(APITestCase):
+    """Test ETag handling of the workout plan endpoints."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'etag@example.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.workout_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Versioned Plan',
+            frequency=3, session_duration=60)
+        self.exercise = Exercise.objects.create(
+            name='Dip', description='Dip description',
+            instructions='Do a dip')
+
+    def test_retrieve_workout_plan_not_modified(self):
+        """Test a matching If-None-Match skips loading the exercises"""
+        url = workout_plan_detail_url(self.workout_plan.id)
+        res = self.client.get(url)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_other_users_workout_plan_not_found(self):
+        """Test If-None-Match does not reveal another user's plan"""
+        other_user = get_user_model().objects.create_user(
+            'etag-other@example.com', 'testpass')
+        workout_plan = WorkoutPlan.objects.create(
+            user=other_user, title='Other Plan',
+            frequency=3, session_duration=60)
+
+        res = self.client.get(workout_plan_detail_url(workout_plan.id),
+                              HTTP_IF_NONE_MATCH='"1"')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_workout_exercise_changes_bump_plan_version(self):
+        """Test changing a plan's exercises changes the plan's ETag"""
+        url = workout_plan_detail_url(self.workout_plan.id)
+        etag = self.client.get(url)['ETag']
+        payload = {
+            'workout_plan': self.workout_plan.id,
+            'exercise': self.exercise.id,
+            'sets': 3,
+            'repetitions': 10,
+        }
+        res = self.client.post(workout_exercise_url(), payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.data['workout_exercises']), 1)
+
+    def test_update_workout_plan_stale_if_match(self):
+        """Test concurrent updates of a plan do not overwrite each other"""
+        url = workout_plan_detail_url(self.workout_plan.id)
+        payload = {
+            'user': self.user.id,
+            'title': 'First Writer',
+            'frequency': 3,
+            'session_duration': 60,
+        }
+        res = self.client.put(url, payload, HTTP_IF_MATCH='"1"')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], '"2"')
+
+        payload['title'] = 'Second Writer'
+        res = self.client.put(url, payload, HTTP_IF_MATCH='"1"')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.workout_plan.refresh_from_db()
+        self.assertEqual(self.workout_plan.title, 'First Writer')
+
+
+class WorkoutPlanAssignmentApiTests(APITestCase):
+    """Test assigning a template workout plan to users."""
+
+    def setUp(self):
+        self.coach = get_user_model().objects.create_superuser(
+            'coach@example.com', 'testpass')
+        self.client.force_authenticate(self.coach)
+        self.template = WorkoutPlan.objects.create(
+            user=self.coach, title='Cohort Plan', frequency=4,
+            goal='Get strong', session_duration=50)
+        self.exercises = [
+            Exercise.objects.create(
+                name=f'Exercise {i}', description='Description',
+                instructions='Instructions')
+            for i in range(3)
+        ]
+        for i, exercise in enumerate(self.exercises):
+            WorkoutExercise.objects.create(
+                workout_plan=self.template, exercise=exercise,
+                sets=3, repetitions=8 + i)
+        self.users = [
+            get_user_model().objects.create_user(
+                f'client{i}@example.com', 'testpass')
+            for i in range(5)
+        ]
+
+    def test_assign_requires_staff(self):
+        """Test non-staff users cannot assign plans"""
+        user = self.users[0]
+        workout_plan = WorkoutPlan.objects.create(
+            user=user, title='Own Plan',
+            frequency=3, session_duration=30)
+        self.client.force_authenticate(user)
+
+        res = self.client.post(workout_plan_assign_url(workout_plan.id),
+                               {'users': [self.users[1].id]},
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(
+            WorkoutPlan.objects.filter(user=self.users[1]).exists())
+
+    def test_assign_copies_plan_and_exercises(self):
+        """Test each user gets a copy of the plan and its exercises"""
+        user_ids = [user.id for user in self.users]
+        res = self.client.post(workout_plan_assign_url(self.template.id),
+                               {'users': user_ids}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['assigned'], 5)
+        self.assertEqual(res.data['skipped'], 0)
+        self.assertEqual(res.data['workout_exercises'], 15)
+        self.assertIn('plans_per_second', res.data)
+        for user in self.users:
+            workout_plan = WorkoutPlan.objects.get(user=user)
+            self.assertEqual(workout_plan.template, self.template)
+            self.assertEqual(
+                (workout_plan.title, workout_plan.frequency,
+                 workout_plan.goal, workout_plan.session_duration),
+                ('Cohort Plan', 4, 'Get strong', 50))
+            self.assertEqual(
+                list(workout_plan.workout_exercises.order_by('id')
+                     .values_list('exercise', 'sets', 'repetitions')),
+                [(exercise.id, 3, 8 + i)
+                 for i, exercise in enumerate(self.exercises)])
+
+    def test_assign_is_idempotent(self):
+        """Test users with a copy or unknown ids are skipped"""
+        url = workout_plan_assign_url(self.template.id)
+        self.client.post(url, {'users': [self.users[0].id]}, format='json')
+
+        res = self.client.post(
+            url, {'users': [user.id for user in self.users] + [0]},
+            format='json')
+
+        self.assertEqual(res.data['assigned'], 4)
+        self.assertEqual(res.data['skipped'], 2)
+        self.assertEqual(
+            WorkoutPlan.objects.filter(template=self.template).count(), 5)
+        self.assertEqual(
+            WorkoutExercise.objects.filter(
+                workout_plan__template=self.template).count(), 15)
+
+    def test_assign_query_count_constant(self):
+        """Test the queries run do not grow with the number of users"""
+        url = workout_plan_assign_url(self.template.id)
+        with self.assertNumQueries(7):
+            self.client.post(url, {'users': [self.users[0].id]},
+                             format='json')
+        with self.assertNumQueries(7):
+            res = self.client.post(
+                url, {'users': [user.id for user in self.users[1:]]},
+                format='json')
+
+        self.assertEqual(res.data['assigned'], 4)
+
+
+class TrainingVolumeApiTests(APITestCase):
+    """Test the training volume analytics endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'volume@example.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.chest = MuscleGroup.objects.create(name='Chest')
+        self.triceps = MuscleGroup.objects.create(name='Triceps')
+        self.bench_press = Exercise.objects.create(
+            name='Bench Press', description='Press',
+            instructions='Press the bar')
+        self.bench_press.target_muscles.set([self.chest, self.triceps])
+        self.pushdown = Exercise.objects.create(
+            name='Pushdown', description='Pushdown',
+            instructions='Push the cable down')
+        self.pushdown.target_muscles.set([self.triceps])
+        self.stretch = Exercise.objects.create(
+            name='Stretch', description='Stretch',
+            instructions='Stretch')
+        self.push_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Push', frequency=2,
+            session_duration=60)
+        WorkoutExercise.objects.create(
+            workout_plan=self.push_plan, exercise=self.bench_press,
+            sets=4, repetitions=8, duration=10)
+        WorkoutExercise.objects.create(
+            workout_plan=self.push_plan, exercise=self.stretch,
+            sets=1, repetitions=1, duration=5)
+        arms_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Arms', frequency=1,
+            session_duration=30)
+        WorkoutExercise.objects.create(
+            workout_plan=arms_plan, exercise=self.pushdown,
+            sets=3, repetitions=12)
+
+    def test_training_volume_per_muscle_group(self):
+        """Test volume is summed per muscle and weighted by frequency"""
+        other_user = get_user_model().objects.create_user(
+            'volume-other@example.com', 'testpass')
+        other_plan = WorkoutPlan.objects.create(
+            user=other_user, title='Other', frequency=7,
+            session_duration=60)
+        WorkoutExercise.objects.create(
+            workout_plan=other_plan, exercise=self.bench_press,
+            sets=10, repetitions=10)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(workout_plan_volume_url())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'muscle_group': self.chest.id, 'name': 'Chest',
+             'weekly_sets': 8, 'weekly_repetitions': 64,
+             'weekly_duration': 20},
+            {'muscle_group': self.triceps.id, 'name': 'Triceps',
+             'weekly_sets': 11, 'weekly_repetitions': 100,
+             'weekly_duration': 20},
+        ])
+
+    def test_training_volume_cached(self):
+        """Test repeated requests are served from the cache"""
+        first = self.client.get(workout_plan_volume_url())
+
+        with self.assertNumQueries(1):
+            res = self.client.get(workout_plan_volume_url())
+
+        self.assertEqual(res.data, first.data)
+
+    def test_training_volume_invalidated_on_plan_change(self):
+        """Test the cached volume is recomputed when a plan changes"""
+        self.client.get(workout_plan_volume_url())
+        url = workout_plan_detail_url(self.push_plan.id)
+        self.client.patch(url, {'frequency': 3}, format='json')
+
+        res = self.client.get(workout_plan_volume_url())
+
+        self.assertEqual(res.data[0]['weekly_sets'], 12)
+
+    def test_training_volume_invalidated_on_exercise_change(self):
+        """Test the cached volume is recomputed when exercises change"""
+        self.client.get(workout_plan_volume_url())
+        payload = {
+            'workout_plan': self.push_plan.id,
+            'exercise': self.pushdown.id,
+            'sets': 2,
+            'repetitions': 10,
+        }
+        self.client.post(workout_exercise_url(), payload)
+
+        res = self.client.get(workout_plan_volume_url())
+
+        self.assertEqual(res.data[1]['weekly_sets'], 15)
+
+    def test_training_volume_without_plans(self):
+        """Test a user without plans gets an empty volume"""
+        user = get_user_model().objects.create_user(
+            'volume-empty@example.com', 'testpass')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(workout_plan_volume_url())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+
+class WorkoutPlanGenerateApiTests(APITestCase):
+    """Test generating personalized workout plans."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'generate@example.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.chest = MuscleGroup.objects.create(name='Chest')
+        self.back = MuscleGroup.objects.create(name='Back')
+        self.empty = MuscleGroup.objects.create(name='Neck')
+        self.chest_exercises = set()
+        self.back_exercises = set()
+        for i in range(3):
+            exercise = Exercise.objects.create(
+                name=f'Press {i}', description='Press',
+                instructions='Press')
+            exercise.target_muscles.set([self.chest])
+            self.chest_exercises.add(exercise.id)
+            exercise = Exercise.objects.create(
+                name=f'Row {i}', description='Row', instructions='Row')
+            exercise.target_muscles.set([self.back])
+            self.back_exercises.add(exercise.id)
+
+    def test_generate_workout_plan(self):
+        """Test generating a balanced plan for the requested muscles"""
+        payload = {
+            'muscle_groups': [self.chest.id, self.back.id],
+            'frequency': 3,
+            'session_duration': 40,
+            'goal': 'endurance',
+            'seed': 7,
+        }
+        res = self.client.post(workout_plan_generate_url(), payload,
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        workout_plan = WorkoutPlan.objects.get(id=res.data['id'])
+        self.assertEqual(workout_plan.user, self.user)
+        self.assertEqual(workout_plan.title, 'Generated plan: Chest, Back')
+        self.assertEqual(workout_plan.goal, 'endurance')
+        self.assertEqual(
+            (workout_plan.frequency, workout_plan.session_duration),
+            (3, 40))
+        exercises = [we['exercise'] for we in res.data['workout_exercises']]
+        self.assertEqual(len(exercises), 4)
+        self.assertEqual(len(set(exercises)), 4)
+        self.assertEqual(
+            len(self.chest_exercises.intersection(exercises)), 2)
+        self.assertEqual(
+            len(self.back_exercises.intersection(exercises)), 2)
+        for workout_exercise in res.data['workout_exercises']:
+            self.assertEqual(workout_exercise['sets'], 3)
+            self.assertEqual(workout_exercise['repetitions'], 15)
+
+    def test_generate_workout_plan_unknown_muscle_group(self):
+        """Test unknown muscle groups are rejected"""
+        payload = {
+            'muscle_groups': [self.chest.id, 0],
+            'frequency': 3,
+            'session_duration': 40,
+        }
+        res = self.client.post(workout_plan_generate_url(), payload,
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('muscle_groups', res.data)
+        self.assertFalse(WorkoutPlan.objects.exists())
+
+    def test_generate_workout_plan_without_exercises(self):
+        """Test muscle groups without exercises are rejected"""
+        payload = {
+            'muscle_groups': [self.empty.id],
+            'frequency': 3,
+            'session_duration': 40,
+        }
+        res = self.client.post(workout_plan_generate_url(), payload,
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(WorkoutPlan.objects.exists())
+
+    def test_generate_workout_plan_does_not_query_catalog(self):
+        """Test generation uses the index instead of the catalog tables"""
+        payload = {
+            'muscle_groups': [self.chest.id, self.back.id],
+            'frequency': 3,
+            'session_duration': 60,
+        }
+        self.client.post(workout_plan_generate_url(), payload,
+                         format='json')
+
+        with self.assertNumQueries(5):
+            res = self.client.post(workout_plan_generate_url(), payload,
+                                   format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['workout_exercises']), 6)
+
+
+class WorkoutPlanSparseFieldsetTests(APITestCase):
+    """Test selecting the workout plan fields to return"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'sparse@example.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.exercise = Exercise.objects.create(
+            name='Sparse Exercise', description='', instructions='')
+        self.workout_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Sparse Plan', frequency=3,
+            goal='A long goal', session_duration=60)
+        WorkoutExercise.objects.create(
+            workout_plan=self.workout_plan, exercise=self.exercise,
+            sets=3, repetitions=10)
+
+    def test_list_without_workout_exercises(self):
+        """Test unselected workout exercises are not loaded"""
+        with self.assertNumQueries(1):
+            res = self.client.get(workout_plan_url(),
+                                  {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'id': self.workout_plan.id, 'title': 'Sparse Plan'}])
+
+    def test_retrieve_without_workout_exercises(self):
+        url = workout_plan_detail_url(self.workout_plan.id)
+        with self.assertNumQueries(1):
+            res = self.client.get(url, {'omit': 'workout_exercises,goal'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data), {'id', 'user', 'title', 'frequency',
+                                         'session_duration'})
+
+    def test_retrieve_selected_workout_exercises(self):
+        url = workout_plan_detail_url(self.workout_plan.id)
+        with self.assertNumQueries(2):
+            res = self.client.get(url, {'fields': 'workout_exercises'})
+
+        self.assertEqual(list(res.data), ['workout_exercises'])
+        self.assertEqual(len(res.data['workout_exercises']), 1)
+
+    def test_write_only_fields_cannot_be_selected(self):
+        res = self.client.get(workout_plan_url(),
+                              {'fields': 'create_workout_exercises'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_workout_exercises_selected_fields(self):
+        res = self.client.get(workout_exercise_url(),
+                              {'fields': 'exercise,sets'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn({'exercise': self.exercise.id, 'sets': 3},
+                      res.data['results'])
+
+
+class WorkoutPlanExportApiTests(APITestCase):
+    """Test exporting workout plans with their workout exercises"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'export@example.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.exercise = Exercise.objects.create(
+            name='Export Exercise', description='', instructions='')
+        self.workout_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Export Plan', frequency=3,
+            goal='Strength', session_duration=60)
+        self.workout_exercises = [
+            WorkoutExercise.objects.create(
+                workout_plan=self.workout_plan, exercise=self.exercise,
+                sets=sets, repetitions=10)
+            for sets in [3, 4]
+        ]
+        self.empty_plan = WorkoutPlan.objects.create(
+            user=self.user, title='Empty Plan', frequency=1,
+            goal='Rest', session_duration=30)
+
+    def test_export_ndjson_matches_list(self):
+        res = self.client.get(workout_plan_export_url(),
+                              {'format': 'ndjson'})
+        plans = self.client.get(workout_plan_url()).json()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        lines = b''.join(res.streaming_content).splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         plans['results'])
+
+    def test_export_csv_has_a_line_per_workout_exercise(self):
+        res = self.client.get(workout_plan_export_url(),
+                              {'omit': 'user,goal,frequency',
+                               'format': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first, second = self.workout_exercises
+        plan = self.workout_plan.id
+        exercise = self.exercise.id
+        self.assertEqual(
+            b''.join(res.streaming_content).decode().splitlines(), [
+                'id,title,session_duration,workout_exercises.id,'
+                'workout_exercises.exercise,workout_exercises.sets,'
+                'workout_exercises.repetitions,workout_exercises.duration',
+                f'{plan},Export Plan,60,{first.id},{exercise},3,10,',
+                f'{plan},Export Plan,60,{second.id},{exercise},4,10,',
+                f'{self.empty_plan.id},Empty Plan,30,,,,,',
+            ])
+
+    def test_export_login_required(self):
+        self.client.force_authenticate(None)
+
+        res = self.client.get(workout_plan_export_url())
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,89 @@
+"""
+Tests for workout plan generation.
+"""
+import random
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.models import Exercise, MuscleGroup
+from workout_plans.generator import ExerciseIndex, get_exercise_index
+
+
+class ExerciseIndexTests(TestCase):
+    """Test the in-memory exercise index."""
+
+    def setUp(self):
+        self.index = ExerciseIndex(
+            [(1, 'Chest'), (2, 'Back'), (3, 'Legs')],
+            [(1, 10), (1, 11), (1, 12), (2, 20), (2, 21), (1, 30), (2, 30)],
+        )
+
+    def test_select_exercises_balanced(self):
+        """Test muscle groups take turns filling the slots."""
+        selected = self.index.select_exercises(
+            [1, 2], 4, rng=random.Random(1))
+
+        self.assertEqual(len(selected), 4)
+        self.assertEqual(len(set(selected)), 4)
+        chest = {10, 11, 12, 30}
+        back = {20, 21, 30}
+        self.assertIn(selected[0], chest)
+        self.assertIn(selected[1], back)
+        self.assertIn(selected[2], chest)
+        self.assertIn(selected[3], back)
+
+    def test_select_exercises_exhausted(self):
+        """Test selection stops once every exercise has been used."""
+        selected = self.index.select_exercises(
+            [2, 3], 10, rng=random.Random(1))
+
+        self.assertEqual(sorted(selected), [20, 21, 30])
+
+    def test_generate_uses_goal_scheme(self):
+        """Test generated exercises use the goal's sets and reps."""
+        workout_exercises = self.index.generate(
+            [1], 20, goal='strength', rng=random.Random(1))
+
+        self.assertEqual(len(workout_exercises), 2)
+        for workout_exercise in workout_exercises:
+            self.assertEqual(workout_exercise['sets'], 5)
+            self.assertEqual(workout_exercise['repetitions'], 5)
+
+
+class ExerciseIndexCacheTests(TestCase):
+    """Test the per-worker exercise index is reused and rebuilt."""
+
+    def setUp(self):
+        cache.clear()
+        self.muscle_group = MuscleGroup.objects.create(name='Calves')
+
+    def test_index_loaded_once(self):
+        """Test the index is only built when the catalog changes."""
+        index = get_exercise_index()
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_exercise_index(), index)
+
+    def test_index_rebuilt_on_catalog_change(self):
+        """Test changing an exercise's muscles rebuilds the index."""
+        get_exercise_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            exercise = Exercise.objects.create(
+                name='Calf Raise', description='Calf raise',
+                instructions='Raise your heels')
+            exercise.target_muscles.add(self.muscle_group)
+
+        index = get_exercise_index()
+
+        self.assertEqual(index.exercises_by_muscle[self.muscle_group.id],
+                         (exercise.id,))
+
+    def test_index_rebuilt_when_expired(self):
+        """Test the index is rebuilt for changes other workers made."""
+        index = get_exercise_index()
+
+        with mock.patch('workout_plans.generator.time.monotonic',
+                        return_value=index.expires):
+            self.assertIsNot(get_exercise_index(), index)
@@ -2,8 +2,11 @@
 Views for the workout_plans API.
 """
 
-from django.shortcuts import get_object_or_404
-from rest_framework import viewsets
+from django.db import transaction
+from django.db.models import F, Prefetch
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -11,19 +14,30 @@ from drf_spectacular.utils import (
     OpenApiTypes,
 )
 
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from core.filters import ExerciseSearchFilter
+from core.mixins import CatalogCacheMixin, ConditionalRequestMixin,\
+    SparseFieldsetMixin, StreamingExportMixin, ValuesListMixin
 from core.models import Exercise,\
     WorkoutPlan, WorkoutExercise
+from core.pagination import IdCursorPagination, ExerciseCursorPagination
 
 from workout_plans.serializers import \
     ExerciseSerializer, WorkoutPlanSerializer,\
-    WorkoutExerciseSerializer
+    WorkoutExerciseSerializer, WorkoutExerciseBulkSerializer,\
+    WorkoutPlanAssignmentSerializer, TrainingVolumeSerializer,\
+    WorkoutPlanGenerateSerializer
+from workout_plans.analytics import get_training_volume
+from workout_plans.assignment import assign_workout_plan
 
 
-class ExerciseViewSet(viewsets.ModelViewSet):
-    queryset = Exercise.objects.all()
+class ExerciseViewSet(CatalogCacheMixin, SparseFieldsetMixin,
+                      viewsets.ModelViewSet):
+    queryset = Exercise.objects.prefetch_related('target_muscles')
     serializer_class = ExerciseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ExerciseCursorPagination
+    filter_backends = [ExerciseSearchFilter]
 
 
 @extend_schema_view(
@@ -88,26 +102,132 @@ class ExerciseViewSet(viewsets.ModelViewSet):
         responses={200: WorkoutPlanSerializer},
     )
 )
-class WorkoutPlanViewSet(viewsets.ModelViewSet):
+class WorkoutPlanViewSet(ConditionalRequestMixin, ValuesListMixin,
+                         StreamingExportMixin, SparseFieldsetMixin,
+                         viewsets.ModelViewSet):
     queryset = WorkoutPlan.objects.all()
     serializer_class = WorkoutPlanSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
+    export_filename = 'workout-plans'
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user)
+        """Retrieve plans for the authenticated user with their
+        workout exercises and exercises loaded in a fixed number
+        of queries."""
+        workout_exercises = WorkoutExercise.objects \
+            .select_related('exercise').order_by('id')
+        return self.queryset.filter(user=self.request.user).prefetch_related(
+            Prefetch('workout_exercises', queryset=workout_exercises))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @extend_schema(
+        description="Generate a balanced workout plan for the given "
+                    "muscle groups, frequency, session duration and goal.",
+        request=WorkoutPlanGenerateSerializer,
+        responses={201: WorkoutPlanSerializer},
+    )
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """Generate a workout plan for the authenticated user."""
+        serializer = WorkoutPlanGenerateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        workout_plan = serializer.save(user=request.user)
+        return Response(WorkoutPlanSerializer(workout_plan).data,
+                        status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        description="Weekly training volume of the authenticated user "
+                    "per muscle group, weighted by plan frequency.",
+        responses={200: TrainingVolumeSerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def volume(self, request):
+        """Return the user's weekly training volume per muscle group."""
+        serializer = TrainingVolumeSerializer(
+            get_training_volume(request.user), many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        description="Copy the workout plan and its exercises to users. "
+                    "Users who already have a copy are skipped.",
+        request=WorkoutPlanAssignmentSerializer,
+        responses={200: WorkoutPlanAssignmentSerializer},
+    )
+    @action(detail=True, methods=['post'],
+            permission_classes=[IsAdminUser])
+    def assign(self, request, pk=None):
+        """Assign the workout plan to a list of users."""
+        serializer = WorkoutPlanAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = assign_workout_plan(
+            self.get_object(), serializer.validated_data['users'])
+        return Response(WorkoutPlanAssignmentSerializer(result).data,
+                        status=status.HTTP_200_OK)
 
-class WorkoutExerciseViewSet(viewsets.ModelViewSet):
+
+class WorkoutExerciseViewSet(ConditionalRequestMixin, SparseFieldsetMixin,
+                             viewsets.ModelViewSet):
     queryset = WorkoutExercise.objects.all()
     serializer_class = WorkoutExerciseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
+
+    def get_queryset(self):
+        """Retrieve the workout exercises of the user's plans."""
+        return self.queryset.filter(workout_plan__user=self.request.user)
 
     def perform_create(self, serializer):
-        workout_plan_id = self.request.data.get('workout_plan')
-        workout_plan = get_object_or_404(WorkoutPlan,
-                                         id=workout_plan_id,
-                                         user=self.request.user)
-        serializer.save(workout_plan=workout_plan)
+        # The serializer only accepts the plans of the requesting user.
+        with transaction.atomic():
+            serializer.save()
+            self.touch_workout_plans(serializer.instance.workout_plan_id)
+
+    def perform_update(self, serializer):
+        workout_plan_id = serializer.instance.workout_plan_id
+        with transaction.atomic():
+            super().perform_update(serializer)
+            self.touch_workout_plans(
+                workout_plan_id, serializer.instance.workout_plan_id)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            self.touch_workout_plans(instance.workout_plan_id)
+
+    def touch_workout_plans(self, *workout_plan_ids):
+        """Bump the version of the plans whose exercises changed."""
+        WorkoutPlan.objects.filter(id__in=workout_plan_ids).update(
+            version=F('version') + 1)
+
+    @extend_schema(
+        description="Create, update and delete workout exercises of the "
+                    "authenticated user's plans in one transaction.",
+        request=WorkoutExerciseBulkSerializer,
+        examples=[
+            OpenApiExample(
+                name="Bulk Workout Exercises Example",
+                summary="Example bulk request",
+                value={
+                    "operations": [
+                        {"op": "create", "workout_plan": 1,
+                         "exercise": 1, "sets": 3, "repetitions": 10},
+                        {"op": "update", "id": 1, "sets": 4},
+                        {"op": "delete", "id": 2},
+                    ]
+                },
+                request_only=True,
+            ),
+        ],
+        responses={200: WorkoutExerciseBulkSerializer},
+    )
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Apply a batch of workout exercise operations."""
+        serializer = WorkoutExerciseBulkSerializer(
+            data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)